@@ -1,62 +1,270 @@
+from .providers import get_provider, word_limit
+from .metrics import registry
+
+DEFAULT_MAX_TOKENS = 1024
+
+def max_tokens_for_prompt(system_prompt, default=DEFAULT_MAX_TOKENS):
+    """
+    Derive max_tokens from the word limit stated in a system prompt
+
+    Looks for phrases like "Maximum of 125 words" or "max 150 words" and allows
+    about two tokens per word plus room for the JSON keys and the title.
+    """
+    limit = word_limit(system_prompt)
+    if limit is None:
+        return default
+    return limit * 2 + 100
+
 class TextGen:
     """ Class for generating content using GPT-4o-mini model from OpenAI API """
-    def __init__(self, API_KEY, system_prompt=None, text=None):
+    def __init__(self, API_KEY, system_prompt=None, text=None, provider=None, metrics=None):
         self.API_KEY = API_KEY
         self.system_prompt = system_prompt  
         self.text = text  
+        self.provider = provider or get_provider(API_KEY=API_KEY)
+        self.metrics = metrics or registry
         
     def generate(self):  
-        from openai import OpenAI  
-        
-        client = OpenAI(api_key=self.API_KEY)  
+        client = self.provider.client()  
+        messages = [
+            {"role": "system", "content": self.system_prompt},  
+            {"role": "user", "content": self.text}  
+        ]
         
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",  
-                messages=[
-                    {"role": "system", "content": self.system_prompt},  
-                    {"role": "user", "content": self.text}  
-                ],
-                max_tokens=16384, 
-                response_format={ "type": "json_object" }  
-            )
+            with self.metrics.call("chat.generate", "gpt-4o-mini", self.provider) as call:
+                response = client.chat.completions.create(
+                    model="gpt-4o-mini",  
+                    messages=messages,
+                    max_tokens=max_tokens_for_prompt(self.system_prompt), 
+                    response_format={ "type": "json_object" }  
+                )
+                call.chat(messages, response)
             return response
         except Exception as e:
             print(f"Error en el TextGen: {str(e)}")
             raise
 
     def GenByTopic(self, topic, system_prompt):
-        from openai import OpenAI
-
-        client = OpenAI(api_key=self.API_KEY)
+        client = self.provider.client()
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": topic}
+        ]
 
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": topic}
-                ],
-                max_tokens=16384,
-                response_format={"type": "json_object"}
-            )
+            with self.metrics.call("chat.by_topic", "gpt-4o-mini", self.provider) as call:
+                response = client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=messages,
+                    max_tokens=max_tokens_for_prompt(system_prompt),
+                    response_format={"type": "json_object"}
+                )
+                call.chat(messages, response)
             return response
         except Exception as e:
             print(f"Error en el GenByTopic: {str(e)}")
             raise
 
+class _RateBucket:
+    """ Token bucket refilled continuously up to a per-minute budget """
+    def __init__(self, per_minute):
+        import asyncio
+        import time
+
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, amount=1):
+        import asyncio
+        import time
+
+        amount = min(float(amount), self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                await asyncio.sleep((amount - self.available) / self.rate)
+
+    def refund(self, amount):
+        self.available = min(self.capacity, self.available + amount)
+
+
+class BatchTextGen:
+    """ Generate scripts for many topics concurrently within the API rate limits """
+    RETRYABLE = ("RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError")
+
+    def __init__(self, API_KEY, system_prompt, model="gpt-4o-mini", max_concurrency=8, requests_per_minute=500, tokens_per_minute=200000, max_retries=5, cache_dir=None, provider=None, metrics=None):
+        """
+        Args:
+            API_KEY: OpenAI API key
+            system_prompt: System prompt shared by every topic (e.g. SYSTEM_PROMPT_BY_TOPIC)
+            model: Chat model
+            max_concurrency: Maximum requests in flight
+            requests_per_minute: Request budget per minute
+            tokens_per_minute: Token budget per minute (prompt + max_tokens, estimated)
+            max_retries: Retries for 429s, timeouts and 5xx errors
+            cache_dir: Optional directory for a persistent response cache
+            provider: Backend for the requests (default: get_provider(), OpenAI unless
+                EDITTOOLS_PROVIDER says otherwise)
+            metrics: CallMetrics registry for the requests (default: the shared registry)
+        """
+        from pathlib import Path
+
+        self.API_KEY = API_KEY
+        self.system_prompt = system_prompt
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.max_tokens = max_tokens_for_prompt(system_prompt)
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.cache = {}
+        self.provider = provider or get_provider(API_KEY=API_KEY)
+        self.metrics = metrics or registry
+
+    def cache_key(self, topic):
+        import hashlib
+
+        key = "\x00".join([self.model, self.system_prompt, topic, str(self.max_tokens)])
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def cache_get(self, key):
+        import json
+
+        if key in self.cache:
+            return self.cache[key]
+        if self.cache_dir:
+            path = self.cache_dir / f"{key}.json"
+            if path.exists():
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.cache[key] = json.load(f)["content"]
+                return self.cache[key]
+        return None
+
+    def cache_put(self, key, content):
+        import json
+        import os
+
+        self.cache[key] = content
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path = self.cache_dir / f"{key}.json"
+            temp_path = path.with_name(f"{key}.{os.getpid()}.tmp")
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"content": content}, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+
+    async def _request(self, client, topic, semaphore, requests, tokens):
+        import asyncio
+        import random
+
+        estimate = (len(self.system_prompt) + len(topic)) // 4 + self.max_tokens
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": topic}
+        ]
+        for attempt in range(self.max_retries + 1):
+            async with semaphore:
+                await requests.acquire(1)
+                await tokens.acquire(estimate)
+                try:
+                    # Cada intento se mide aparte, sin la espera de los límites de tasa
+                    with self.metrics.call("chat.batch", self.model, self.provider) as call:
+                        call.retries = 1 if attempt else 0
+                        response = await client.chat.completions.create(
+                            model=self.model,
+                            messages=messages,
+                            max_tokens=self.max_tokens,
+                            response_format={"type": "json_object"}
+                        )
+                        call.chat(messages, response)
+                    # Devolver al presupuesto lo que no se usó realmente
+                    if getattr(response, "usage", None):
+                        tokens.refund(max(0, estimate - response.usage.total_tokens))
+                    return response.choices[0].message.content
+                except Exception as e:
+                    if type(e).__name__ not in self.RETRYABLE or attempt == self.max_retries:
+                        raise
+                    retry_after = None
+                    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+                    if headers.get("retry-after"):
+                        try:
+                            retry_after = float(headers["retry-after"])
+                        except ValueError:
+                            retry_after = None
+                    delay = retry_after if retry_after is not None else min(60.0, 2 ** attempt)
+                    delay *= random.uniform(0.5, 1.5)
+                    print(f"Reintentando BatchTextGen ({type(e).__name__}) en {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def agenerate(self, topics, return_exceptions=False):
+        """
+        Generate one script per topic; identical topics are requested only once
+
+        Returns:
+            list: JSON content string per topic, in the same order as topics
+        """
+        import asyncio
+
+        client = self.provider.async_client()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        requests = _RateBucket(self.requests_per_minute)
+        tokens = _RateBucket(self.tokens_per_minute)
+        pending = {}
+
+        async def run(key, topic):
+            content = await self._request(client, topic, semaphore, requests, tokens)
+            self.cache_put(key, content)
+            return content
+
+        async def resolve(topic):
+            key = self.cache_key(topic)
+            cached = self.cache_get(key)
+            if cached is not None:
+                return cached
+            if key not in pending:
+                pending[key] = asyncio.ensure_future(run(key, topic))
+            return await pending[key]
+
+        try:
+            return await asyncio.gather(*(resolve(t) for t in topics), return_exceptions=return_exceptions)
+        finally:
+            await client.close()
+
+    def generate(self, topics, return_exceptions=False):
+        """ Blocking wrapper around agenerate """
+        import asyncio
+
+        try:
+            return asyncio.run(self.agenerate(topics, return_exceptions=return_exceptions))
+        except Exception as e:
+            print(f"Error en el BatchTextGen: {str(e)}")
+            raise
+
 class ClientTTS:
     """ Class for generating TTS using OpenAI API """
-    def __init__(self, API_KEY, text, voice_type, default_output_dir=None):
+    PCM_RATE = 24000  # Sample rate of the API "pcm" response format
+
+    def __init__(self, API_KEY, text, voice_type, default_output_dir=None, provider=None, metrics=None):
         from pathlib import Path
 
         self.API_KEY = API_KEY
+        self.provider = provider or get_provider(API_KEY=API_KEY)
+        self.metrics = metrics or registry
         self.text = text
         self.voice_type = voice_type
         self.default_output_dir = Path(default_output_dir) if default_output_dir else Path(__file__).parent
     
-    def generateTTS(self, output_path=None):
-        from openai import OpenAI
+    def generateTTS(self, output_path=None, stream=False, chunk_size=65536):
         from pathlib import Path
 
         if output_path is None:
@@ -67,22 +275,174 @@ class ClientTTS:
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
 
-        client = OpenAI(api_key=self.API_KEY)
+        client = self.provider.client()
 
         try: 
-            response = client.audio.speech.create(
-                model="tts-1",
-                voice=self.voice_type,
-                input=self.text,
-            )
-            response.stream_to_file(output_path)
-            
-            # Alternativa usando with_streaming_response si stream_to_file falla
-            #with open(output_path, 'wb') as f:
-            #    for chunk in response.with_streaming_response.iter_bytes():
-            #        f.write(chunk)
+            with self.metrics.call("tts", "tts-1", self.provider) as call:
+                call.characters = len(self.text)
+                call.bytes_sent = len(self.text.encode("utf-8"))
+                if stream:
+                    # Escribir cada bloque apenas llega, sin esperar la respuesta completa
+                    with client.audio.speech.with_streaming_response.create(
+                        model="tts-1",
+                        voice=self.voice_type,
+                        input=self.text,
+                    ) as response:
+                        with open(output_path, 'wb') as f:
+                            for chunk in response.iter_bytes(chunk_size):
+                                f.write(chunk)
+                        call.speech(output_path)
+                        # El proveedor local deja junto al audio el texto y los tiempos de cada palabra
+                        if hasattr(response, "write_sidecar"):
+                            response.write_sidecar(output_path)
+                    return output_path
+
+                response = client.audio.speech.create(
+                    model="tts-1",
+                    voice=self.voice_type,
+                    input=self.text,
+                )
+                response.stream_to_file(output_path)
+                call.speech(output_path)
                     
             return output_path        
         except Exception as e:
             print(f"Error en el ClientTTS: {str(e)}")
             raise
+
+    @staticmethod
+    def split_sentences(text, max_chars=400):
+        """ Split text into chunks of whole sentences of at most max_chars characters """
+        import re
+
+        sentences = [s for s in re.split(r'(?<=[.!?])\s+', text.strip()) if s]
+        chunks = []
+        current = ""
+        for sentence in sentences:
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                chunks.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}".strip()
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _synthesize_chunk(self, text, chunk_path, chunk_size=65536):
+        """ Stream one chunk as 24 kHz 16-bit mono PCM into a WAV file """
+        import wave
+
+        client = self.provider.client()
+        with self.metrics.call("tts.chunk", "tts-1", self.provider) as call:
+            call.characters = len(text)
+            call.bytes_sent = len(text.encode("utf-8"))
+            with client.audio.speech.with_streaming_response.create(
+                model="tts-1",
+                voice=self.voice_type,
+                input=text,
+                response_format="pcm",
+            ) as response:
+                with wave.open(str(chunk_path), 'wb') as wav:
+                    wav.setnchannels(1)
+                    wav.setsampwidth(2)
+                    wav.setframerate(self.PCM_RATE)
+                    carry = b""
+                    for block in response.iter_bytes(chunk_size):
+                        call.bytes_received += len(block)
+                        block = carry + block
+                        # Mantener las muestras completas; el byte sobrante pasa al siguiente bloque
+                        cut = len(block) - len(block) % 2
+                        wav.writeframes(block[:cut])
+                        carry = block[cut:]
+                if hasattr(response, "write_sidecar"):
+                    response.write_sidecar(chunk_path)
+            # PCM de 16 bits mono: la duración sale del tamaño
+            call.audio_seconds = call.bytes_received / 2 / self.PCM_RATE
+        return chunk_path
+
+    def generateTTS_chunked(self, output_path=None, max_chars=400, workers=4, on_chunk=None):
+        """
+        Synthesize long narrations as concurrent sentence chunks
+
+        Each chunk is streamed to its own WAV file as PCM, so the chunks can be
+        joined sample-accurately. The start/end offset of every chunk is kept in
+        self.chunks and saved next to the output as a .chunks.json.
+
+        Args:
+            output_path: Path of the joined WAV (default: speech.wav in default_output_dir)
+            max_chars: Maximum characters per chunk
+            workers: Concurrent TTS requests
+            on_chunk: Optional callback(index, chunk_path, chunk) called in order as soon
+                as each chunk and all the previous ones are ready. Chunk files are
+                removed once the joined file is written
+
+        Returns:
+            Path: Path of the joined WAV file
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        from pathlib import Path
+        import json
+        import wave
+
+        if output_path is None:
+            output_path = self.default_output_dir / "speech.wav"
+        else:
+            output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        texts = self.split_sentences(self.text, max_chars=max_chars)
+        chunk_paths = [output_path.with_name(f"{output_path.stem}_chunk{i}.wav") for i in range(len(texts))]
+
+        try:
+            self.chunks = []
+            offset = 0
+            # Tiempos por palabra del proveedor local, desplazados al audio unido
+            words = []
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self._synthesize_chunk, text, path) for text, path in zip(texts, chunk_paths)]
+                with wave.open(str(output_path), 'wb') as joined:
+                    joined.setnchannels(1)
+                    joined.setsampwidth(2)
+                    joined.setframerate(self.PCM_RATE)
+                    for i, future in enumerate(futures):
+                        chunk_path = future.result()
+                        with wave.open(str(chunk_path), 'rb') as wav:
+                            frames = wav.getnframes()
+                            joined.writeframes(wav.readframes(frames))
+
+                        sidecar = Path(f"{chunk_path}.local.json")
+                        if words is not None and sidecar.exists():
+                            with open(sidecar, 'r', encoding='utf-8') as f:
+                                for word in json.load(f)["words"]:
+                                    words.append(dict(word, start=round(word["start"] + offset / self.PCM_RATE, 3),
+                                                      end=round(word["end"] + offset / self.PCM_RATE, 3)))
+                        else:
+                            words = None
+
+                        chunk = {
+                            "text": texts[i],
+                            "start": offset / self.PCM_RATE,
+                            "end": (offset + frames) / self.PCM_RATE,
+                            "start_sample": offset,
+                            "samples": frames,
+                        }
+                        offset += frames
+                        self.chunks.append(chunk)
+                        if on_chunk:
+                            on_chunk(i, chunk_path, chunk)
+
+            with open(output_path.with_suffix('.chunks.json'), 'w', encoding='utf-8') as f:
+                json.dump({"sample_rate": self.PCM_RATE, "chunks": self.chunks}, f, ensure_ascii=False)
+            if words is not None:
+                with open(f"{output_path}.local.json", 'w', encoding='utf-8') as f:
+                    json.dump({"text": self.text, "words": words}, f, ensure_ascii=False)
+
+            return output_path
+        except Exception as e:
+            print(f"Error en el ClientTTS: {str(e)}")
+            raise
+        finally:
+            for chunk_path in chunk_paths:
+                for path in (chunk_path, Path(f"{chunk_path}.local.json")):
+                    if path.exists():
+                        path.unlink()
@@ -1 +1,3 @@
-from .GenAPI import ClientTTS, TextGen
\ No newline at end of file
+from .GenAPI import ClientTTS, TextGen, BatchTextGen
+from .providers import LocalProvider, OpenAIProvider, get_provider
+from .metrics import CallMetrics, registry
\ No newline at end of file
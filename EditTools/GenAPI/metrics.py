@@ -0,0 +1,342 @@
+""" Latency, retry, byte, token and audio accounting for the API calls of GenAPI and Subt """
+from bisect import bisect_left
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+
+# Upper bounds in seconds of the latency histogram buckets (plus +Inf)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# USD per unit of each counter, by model
+PRICES = {
+    "gpt-4o-mini": {"prompt_tokens": 0.15e-6, "completion_tokens": 0.60e-6},
+    "tts-1": {"characters": 15e-6},
+    "whisper-1": {"audio_seconds": 0.006 / 60},
+}
+
+COUNTERS = (
+    "errors", "retries", "bytes_sent", "bytes_received", "prompt_tokens",
+    "completion_tokens", "characters", "audio_seconds", "cost",
+)
+
+LABELS = ("operation", "model", "endpoint")
+
+
+def endpoint_of(provider):
+    """ Label of the server a provider talks to: its base_url, or the provider class name """
+    if provider is None:
+        return "unknown"
+    return getattr(provider, "base_url", None) or type(provider).__name__
+
+
+class _Call:
+    """ Measurements of one call, filled in by the instrumented code inside CallMetrics.call """
+    def __init__(self, operation, model, endpoint, job):
+        self.operation = operation
+        self.model = model
+        self.endpoint = endpoint
+        self.job = job
+        self.ok = True
+        self.seconds = 0.0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.characters = 0
+        self.audio_seconds = 0.0
+
+    def chat(self, messages, response):
+        """ Payload sizes and token usage of a chat completion """
+        self.bytes_sent = len(json.dumps(messages, ensure_ascii=False).encode("utf-8"))
+        content = response.choices[0].message.content or ""
+        self.bytes_received = len(content.encode("utf-8"))
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.prompt_tokens = usage.prompt_tokens or 0
+            self.completion_tokens = usage.completion_tokens or 0
+
+    def transcription(self, audio_bytes, response):
+        """ Upload size, response size and billed audio seconds of a verbose_json transcription """
+        self.bytes_sent = audio_bytes
+        self.bytes_received = len(json.dumps(response, ensure_ascii=False, default=str).encode("utf-8"))
+        duration = response.get("duration") if isinstance(response, dict) else getattr(response, "duration", None)
+        self.audio_seconds = float(duration or 0.0)
+
+    def speech(self, path):
+        """ Received bytes and audio seconds of a synthesized file (WAV header, or ffmpeg for mp3 and others) """
+        import wave
+
+        self.bytes_received = os.path.getsize(path)
+        try:
+            with wave.open(str(path), 'rb') as wav:
+                self.audio_seconds = wav.getnframes() / wav.getframerate()
+        except (wave.Error, EOFError):
+            from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+            self.audio_seconds = float(ffmpeg_parse_infos(str(path)).get("duration") or 0.0)
+
+
+class _Series:
+    """ Latency histogram and counters of one (operation, model, endpoint) """
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.seconds = 0.0
+        self.max = 0.0
+        self.totals = dict.fromkeys(COUNTERS, 0)
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def add(self, call, cost):
+        self.counts[bisect_left(self.buckets, call.seconds)] += 1
+        self.seconds += call.seconds
+        self.max = max(self.max, call.seconds)
+        self.totals["errors"] += 0 if call.ok else 1
+        for key in COUNTERS[1:-1]:
+            self.totals[key] += getattr(call, key)
+        self.totals["cost"] += cost
+
+    def merge(self, data):
+        self.counts = [a + b for a, b in zip(self.counts, data["buckets"])]
+        self.seconds += data["seconds"]["sum"]
+        self.max = max(self.max, data["seconds"]["max"])
+        for key in COUNTERS:
+            self.totals[key] += data[key]
+
+    def quantile(self, q):
+        """ Latency quantile interpolated inside its histogram bucket, like Prometheus' histogram_quantile """
+        total = self.count
+        if not total:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = min(self.buckets[i] if i < len(self.buckets) else self.max, self.max)
+                return lower + (max(upper, lower) - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.max
+
+    def to_dict(self, labels):
+        count = self.count
+        return dict(
+            zip(LABELS, labels),
+            count=count,
+            seconds={
+                "sum": round(self.seconds, 6),
+                "mean": round(self.seconds / count, 6) if count else 0.0,
+                "max": round(self.max, 6),
+                "p50": round(self.quantile(0.50), 6),
+                "p95": round(self.quantile(0.95), 6),
+                "p99": round(self.quantile(0.99), 6),
+            },
+            buckets=list(self.counts),
+            **{key: round(value, 9) if isinstance(value, float) else value for key, value in self.totals.items()}
+        )
+
+
+class CallMetrics:
+    """
+    Registry of API call measurements, per call type and per job
+
+    Every instrumented call (TextGen, BatchTextGen, ClientTTS, Subt) goes
+    through call(), which times it and records the retries, payload bytes,
+    tokens, characters and audio seconds it reports, plus an estimated cost
+    from PRICES. Latencies go into fixed histogram buckets, so percentiles
+    stay cheap to compute and registries from several worker processes can be
+    merged. The current job is a plain attribute rather than a context
+    variable so calls made from worker threads (chunked TTS and
+    transcription) are attributed too; run one job at a time per registry,
+    as the CLI workers do.
+
+    Args:
+        buckets: Upper bounds in seconds of the latency buckets
+        prices: USD per unit of each counter by model (default: PRICES)
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS, prices=None):
+        self.buckets = tuple(buckets)
+        self.prices = PRICES if prices is None else prices
+        self.lock = threading.Lock()
+        self.current_job = None
+        self.series = {}
+        self.jobs = {}
+
+    @contextmanager
+    def job(self, name):
+        """ Attribute the calls made inside the block to job `name` """
+        previous, self.current_job = self.current_job, name
+        try:
+            yield self
+        finally:
+            self.current_job = previous
+
+    @contextmanager
+    def call(self, operation, model, provider=None):
+        """
+        Time one API call and record it when the block exits, also on errors
+
+        Yields the call so the block can fill in what it knows
+        (call.retries, call.bytes_received, call.chat(messages, response), ...).
+        """
+        call = _Call(operation, model, endpoint_of(provider), self.current_job)
+        start = time.perf_counter()
+        try:
+            yield call
+        except BaseException:
+            call.ok = False
+            raise
+        finally:
+            call.seconds = time.perf_counter() - start
+            self.record(call)
+
+    def cost(self, call):
+        prices = self.prices.get(call.model, {})
+        return sum(price * getattr(call, key, 0) for key, price in prices.items())
+
+    def record(self, call):
+        labels = (call.operation, call.model, call.endpoint)
+        cost = self.cost(call)
+        with self.lock:
+            targets = [self.series]
+            if call.job is not None:
+                targets.append(self.jobs.setdefault(call.job, {}))
+            for series in targets:
+                if labels not in series:
+                    series[labels] = _Series(self.buckets)
+                series[labels].add(call, cost)
+
+    def reset(self):
+        with self.lock:
+            self.series = {}
+            self.jobs = {}
+
+    @staticmethod
+    def job_totals(series):
+        """ Calls, seconds and counters of a job, summed over its call types """
+        totals = dict.fromkeys(("count",) + COUNTERS, 0)
+        totals["seconds"] = 0.0
+        for entry in series:
+            totals["count"] += entry["count"]
+            totals["seconds"] += entry["seconds"]["sum"]
+            for key in COUNTERS:
+                totals[key] += entry[key]
+        return {key: round(value, 9) if isinstance(value, float) else value for key, value in totals.items()}
+
+    def snapshot(self, job=None):
+        """
+        Measurements as a JSON-serializable dict
+
+        Args:
+            job: Only include this job (its calls are also the top-level series)
+
+        Returns:
+            dict with "le" (bucket bounds), "series" (one entry per operation,
+            model and endpoint with count, latency sum/mean/max/p50/p95/p99,
+            bucket counts and counters) and "jobs" ({job: {"totals", "series"}})
+        """
+        with self.lock:
+            jobs = {name: self.jobs[name] for name in ([job] if job is not None else self.jobs) if name in self.jobs}
+            top = jobs.get(job, {}) if job is not None else self.series
+            dump = lambda series: [series[labels].to_dict(labels) for labels in sorted(series)]
+            snapshot = {
+                "created": time.time(),
+                "le": list(self.buckets),
+                "series": dump(top),
+                "jobs": {},
+            }
+            for name, series in jobs.items():
+                entries = dump(series)
+                snapshot["jobs"][name] = {"totals": self.job_totals(entries), "series": entries}
+        return snapshot
+
+    def merge(self, snapshot):
+        """ Add a snapshot (e.g. one per worker process or job) to this registry """
+        if list(snapshot["le"]) != list(self.buckets):
+            raise ValueError("Los buckets de latencia del snapshot no coinciden")
+
+        def add(series, entries):
+            for entry in entries:
+                labels = tuple(entry[label] for label in LABELS)
+                if labels not in series:
+                    series[labels] = _Series(self.buckets)
+                series[labels].merge(entry)
+
+        with self.lock:
+            add(self.series, snapshot["series"])
+            for name, data in snapshot["jobs"].items():
+                add(self.jobs.setdefault(name, {}), data["series"])
+        return self
+
+    def to_json(self, path=None, job=None):
+        """ snapshot() as JSON text, also written atomically to `path` if given """
+        text = json.dumps(self.snapshot(job), indent=2, ensure_ascii=False)
+        if path:
+            write_atomic(path, text)
+        return text
+
+    def to_prometheus(self, path=None):
+        """
+        Totals in the Prometheus text exposition format, also written atomically to `path` if given
+
+        Per-job numbers stay in the JSON export: a job label would make the
+        series count grow without bound.
+        """
+        with self.lock:
+            series = {labels: self.series[labels] for labels in sorted(self.series)}
+
+        def label_text(labels, **extra):
+            pairs = list(zip(LABELS, labels)) + list(extra.items())
+            escape = lambda value: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in pairs) + "}"
+
+        lines = [
+            "# HELP edittools_api_call_seconds Latency of API call attempts",
+            "# TYPE edittools_api_call_seconds histogram",
+        ]
+        for labels, entry in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), entry.counts):
+                cumulative += count
+                lines.append(f"edittools_api_call_seconds_bucket{label_text(labels, le=bound)} {cumulative}")
+            lines.append(f"edittools_api_call_seconds_sum{label_text(labels)} {entry.seconds:.6f}")
+            lines.append(f"edittools_api_call_seconds_count{label_text(labels)} {entry.count}")
+
+        names = {
+            "errors": "Calls that ended in an exception",
+            "retries": "Attempts that were retries of a failed one",
+            "bytes_sent": "Payload bytes uploaded",
+            "bytes_received": "Payload bytes downloaded",
+            "prompt_tokens": "Prompt tokens",
+            "completion_tokens": "Completion tokens",
+            "characters": "Characters sent to TTS",
+            "audio_seconds": "Seconds of audio transcribed or synthesized",
+            "cost": "Estimated cost in USD",
+        }
+        for key, help_text in names.items():
+            metric = f"edittools_api_{key}_usd_total" if key == "cost" else f"edittools_api_{key}_total"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for labels, entry in series.items():
+                lines.append(f"{metric}{label_text(labels)} {entry.totals[key]:g}")
+
+        text = "\n".join(lines) + "\n"
+        if path:
+            write_atomic(path, text)
+        return text
+
+
+def write_atomic(path, text):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+# Registry used by TextGen, BatchTextGen, ClientTTS and Subt unless they get their own
+registry = CallMetrics()
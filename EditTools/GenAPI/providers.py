@@ -0,0 +1,380 @@
+""" Backends for the chat, TTS and transcription calls used by GenAPI and Subt """
+
+def word_limit(system_prompt, default=None):
+    """ Word limit stated in a system prompt ("Maximum of 125 words", "max 150 words"), or default """
+    import re
+
+    limits = [int(n) for n in re.findall(r'max(?:imum)?(?:\s+of)?\s+(\d+)\s+words', system_prompt or "", re.IGNORECASE)]
+    return max(limits) if limits else default
+
+
+def get_provider(name=None, API_KEY=None, base_url=None, **kwargs):
+    """
+    Build a provider by name ("openai" or "local")
+
+    When name is None the EDITTOOLS_PROVIDER environment variable is used, so a
+    whole pipeline can be switched to the local backend without code changes.
+    """
+    import os
+
+    name = name or os.environ.get("EDITTOOLS_PROVIDER", "openai")
+    if name == "openai":
+        return OpenAIProvider(API_KEY, base_url=base_url)
+    if name == "local":
+        return LocalProvider(**kwargs)
+    raise ValueError(f"Proveedor desconocido: {name}. Opciones: openai, local")
+
+
+class OpenAIProvider:
+    """ Provider backed by the OpenAI API """
+    def __init__(self, API_KEY, base_url=None):
+        self.API_KEY = API_KEY
+        self.base_url = base_url
+
+    def client(self):
+        from openai import OpenAI
+        return OpenAI(api_key=self.API_KEY, base_url=self.base_url)
+
+    def async_client(self):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=self.API_KEY, base_url=self.base_url)
+
+
+class LocalProvider:
+    """
+    Offline stand-in for the OpenAI API, for load tests and benchmarks
+
+    client() and async_client() return objects with the same methods the
+    pipeline calls on the OpenAI client:
+    - chat: deterministic JSON {"title", "text"} built from the topic, as long
+      as the word limit of the system prompt
+    - TTS: a tone burst per word at a realistic speaking rate (16-bit mono WAV,
+      or raw PCM for response_format="pcm")
+    - transcription: word timings of the known TTS text, read from a
+      .local.json sidecar or from the in-memory registry. Chunks cut from a
+      known narration (Subt.transcribe_chunked) get the words of the
+      narration that fall inside their time range
+
+    Args:
+        latency: Seconds added to every call, or a dict {"chat", "tts", "transcribe"}
+        jitter: Random extra latency, as a fraction of latency
+        words_per_minute: Speaking rate of the synthetic audio
+        seed: Seed for the generated text and the jitter
+        registry_size: Narrations kept in the in-memory registry (least recently
+            used are dropped first; the .local.json sidecars still cover them)
+    """
+    SAMPLE_RATE = 24000
+    VOCABULARY = (
+        "i never thought this would happen to me but here we are and honestly the "
+        "whole thing started when my roommate found a weird box in the attic wait "
+        "until you hear what was inside because nobody believed me at first"
+    ).split()
+
+    def __init__(self, latency=0.0, jitter=0.0, words_per_minute=160, seed=0, registry_size=32):
+        from collections import OrderedDict
+        import random
+
+        self.latency = latency
+        self.jitter = jitter
+        self.words_per_minute = words_per_minute
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.registry = OrderedDict()
+        self.registry_size = registry_size
+
+    def delay(self, operation):
+        latency = self.latency.get(operation, 0.0) if isinstance(self.latency, dict) else self.latency
+        return latency * (1 + self.jitter * self.random.random())
+
+    def client(self):
+        return _LocalClient(self)
+
+    def async_client(self):
+        return _LocalAsyncClient(self)
+
+    # Chat
+
+    def chat(self, messages, max_tokens=None):
+        import hashlib
+        import json
+        import random
+
+        system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+        topic = next((m["content"] for m in messages if m["role"] == "user"), "")
+        seed = int(hashlib.sha1(f"{self.seed}|{system_prompt}|{topic}".encode("utf-8")).hexdigest()[:8], 16)
+        rng = random.Random(seed)
+
+        count = word_limit(system_prompt, default=120)
+        words = [rng.choice(self.VOCABULARY) for _ in range(count)]
+        sentences = [' '.join(words[i:i + 12]).capitalize() + '.' for i in range(0, count, 12)]
+        content = json.dumps({"title": topic.strip()[:60] or "Untitled", "text": ' '.join(sentences)})
+
+        prompt_tokens = (len(system_prompt) + len(topic)) // 4
+        completion_tokens = len(content) // 4
+        return _Namespace(
+            choices=[_Namespace(message=_Namespace(content=content, role="assistant"), finish_reason="stop")],
+            usage=_Namespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                             total_tokens=prompt_tokens + completion_tokens)
+        )
+
+    # TTS
+
+    def synthesize(self, text):
+        """ Tone burst per word; returns (16-bit PCM bytes, word timings) """
+        import numpy as np
+
+        rate = self.SAMPLE_RATE
+        seconds_per_word = 60.0 / self.words_per_minute
+        pieces = []
+        words = []
+        t = 0.0
+        for i, word in enumerate(text.split()):
+            length = seconds_per_word * min(1.6, max(0.5, len(word) / 5.0))
+            voiced = length * 0.8
+            samples = np.arange(int(voiced * rate)) / rate
+            tone = 0.3 * np.sin(2 * np.pi * (180 + 40 * (i % 5)) * samples)
+            pieces.append(tone)
+            gap = length - voiced + (0.3 if word[-1] in '.!?' else 0.0)
+            pieces.append(np.zeros(int(gap * rate)))
+            words.append({"word": word.strip('.,!?;:"'), "start": round(t, 3), "end": round(t + voiced, 3)})
+            t += len(pieces[-2]) / rate + len(pieces[-1]) / rate
+        audio = np.concatenate(pieces) if pieces else np.zeros(rate // 2)
+        return (audio * 32767).astype('<i2').tobytes(), words
+
+    def speech(self, text, response_format="mp3"):
+        """ Audio bytes for text. Formats other than "pcm" get WAV content, which ffmpeg decodes by content """
+        import hashlib
+        import io
+        import wave
+
+        pcm, words = self.synthesize(text)
+        if response_format == "pcm":
+            data = pcm
+        else:
+            buffer = io.BytesIO()
+            with wave.open(buffer, 'wb') as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(self.SAMPLE_RATE)
+                wav.writeframes(pcm)
+            data = buffer.getvalue()
+        self.remember(hashlib.sha1(data).hexdigest(), {"text": text, "words": words})
+        return data, {"text": text, "words": words}
+
+    def remember(self, digest, narration):
+        """ Adds a narration to the registry, dropping the least recently used past registry_size """
+        self.registry[digest] = narration
+        self.registry.move_to_end(digest)
+        while len(self.registry) > self.registry_size:
+            self.registry.popitem(last=False)
+
+    # Transcription
+
+    def transcribe(self, audio_file):
+        import hashlib
+        import json
+        import os
+
+        data = audio_file.read()
+        name = getattr(audio_file, "name", None)
+        digest = hashlib.sha1(data).hexdigest()
+        known = self.registry.get(digest)
+        if known is not None:
+            self.registry.move_to_end(digest)
+        if known is None and name and os.path.exists(f"{name}.local.json"):
+            with open(f"{name}.local.json", 'r', encoding='utf-8') as f:
+                known = json.load(f)
+        if known is None:
+            known = self.align_chunk(data, name)
+        if known is None:
+            print(f"[DEBUG] LocalProvider: audio sin texto conocido ({name}), se transcribe con palabras de relleno")
+            known = {"text": "", "words": self.detect_words(data)}
+
+        duration = known["words"][-1]["end"] if known["words"] else 0.0
+        return _Namespace(text=known["text"], duration=duration, language="english",
+                          words=known["words"], segments=None)
+
+    @staticmethod
+    def voiced_runs(data):
+        """ (start, end) in seconds of every voiced run of a 16-bit mono WAV, and its duration """
+        import io
+        import wave
+        import numpy as np
+
+        try:
+            with wave.open(io.BytesIO(data), 'rb') as wav:
+                rate = wav.getframerate()
+                samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2').astype(np.float32)
+        except (wave.Error, EOFError):
+            return [], 0.0
+
+        hop = max(1, rate // 100)
+        frames = len(samples) // hop
+        voiced = np.abs(samples[:frames * hop].reshape(frames, hop)).mean(axis=1) > 300
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], voiced.astype(np.int8), [0]])))
+        return [(s * hop / rate, e * hop / rate) for s, e in zip(edges[::2], edges[1::2])], len(samples) / rate
+
+    def known_narrations(self, name):
+        """
+        Known texts a chunk may have been cut from: the in-memory registry plus,
+        for a Subt chunk named <stem>.<pid>.part<i>.wav, the sidecars of <stem>.*
+        """
+        import glob
+        import json
+        import os
+        import re
+
+        narrations = list(self.registry.values())
+        match = re.fullmatch(r"(.*)\.\d+\.part\d+\.wav", os.path.basename(name or ""))
+        if match:
+            pattern = os.path.join(glob.escape(os.path.dirname(name)), f"{glob.escape(match.group(1))}.*.local.json")
+            for path in sorted(glob.glob(pattern)):
+                with open(path, 'r', encoding='utf-8') as f:
+                    narrations.append(json.load(f))
+        return narrations
+
+    def align_chunk(self, data, name=None, tolerance=0.05):
+        """
+        Words of a known narration inside the time range of a chunk cut from it
+
+        The offset of the chunk is the one that lines up the most voiced runs
+        of the chunk with word boundaries of the narration; the chunk gets the
+        words whose middle falls inside it, shifted to chunk time.
+
+        Returns:
+            dict {"text", "words"}, or None if no known narration lines up
+        """
+        import numpy as np
+
+        runs, duration = self.voiced_runs(data)
+        if not runs:
+            return None
+        run_starts = np.array([start for start, _ in runs])
+        run_ends = np.array([end for _, end in runs])
+
+        def matches(targets, values):
+            index = np.clip(np.searchsorted(targets, values), 1, len(targets) - 1)
+            nearest = np.minimum(np.abs(targets[index] - values), np.abs(targets[index - 1] - values))
+            return int(np.count_nonzero(nearest <= tolerance))
+
+        best = None
+        for narration in self.known_narrations(name):
+            words = narration["words"]
+            if len(words) < 2:
+                continue
+            starts = np.array([word["start"] for word in words])
+            ends = np.array([word["end"] for word in words])
+            for start in starts:
+                offset = start - run_starts[0]
+                score = matches(starts, run_starts + offset) + matches(ends, run_ends + offset)
+                if best is None or score > best[0]:
+                    best = (score, offset, words)
+
+        # Al menos 80% de los inicios y finales tienen que coincidir
+        if best is None or best[0] < 0.8 * 2 * len(runs):
+            return None
+        _, offset, words = best
+        inside = [
+            {"word": word["word"], "start": round(word["start"] - offset, 3), "end": round(word["end"] - offset, 3)}
+            for word in words if offset <= (word["start"] + word["end"]) / 2 < offset + duration
+        ]
+        return {"text": " ".join(word["word"] for word in inside), "words": inside}
+
+    def detect_words(self, data):
+        """ Last resort for audio with no known text: one filler word per voiced run of a 16-bit mono WAV """
+        runs, _ = self.voiced_runs(data)
+        return [
+            {"word": self.VOCABULARY[i % len(self.VOCABULARY)], "start": round(s, 3), "end": round(e, 3)}
+            for i, (s, e) in enumerate(runs)
+        ]
+
+
+class _Namespace:
+    """ Attribute bag that also supports model_dump(), like the OpenAI response models """
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+    def model_dump(self):
+        def dump(value):
+            if isinstance(value, _Namespace):
+                return value.model_dump()
+            if isinstance(value, list):
+                return [dump(v) for v in value]
+            return value
+        return {k: dump(v) for k, v in self.__dict__.items()}
+
+
+class _LocalSpeechResponse:
+    def __init__(self, data, known):
+        self.content = data
+        self.known = known
+
+    def iter_bytes(self, chunk_size=65536):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def stream_to_file(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.content)
+        self.write_sidecar(path)
+
+    def write_sidecar(self, path):
+        """ Text and word timings next to the audio, so any process can transcribe it exactly """
+        import json
+
+        with open(f"{path}.local.json", 'w', encoding='utf-8') as f:
+            json.dump(self.known, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class _LocalClient:
+    """ Synchronous client with the subset of the OpenAI client used by the pipeline """
+    def __init__(self, provider):
+        self.provider = provider
+        self.chat = _Namespace(completions=_Namespace(create=self._chat))
+        self.audio = _Namespace(
+            speech=_Namespace(create=self._speech, with_streaming_response=_Namespace(create=self._speech)),
+            transcriptions=_Namespace(create=self._transcribe)
+        )
+
+    def _chat(self, model=None, messages=None, max_tokens=None, **kwargs):
+        import time
+
+        time.sleep(self.provider.delay("chat"))
+        return self.provider.chat(messages, max_tokens)
+
+    def _speech(self, model=None, voice=None, input="", response_format="mp3", **kwargs):
+        import time
+
+        time.sleep(self.provider.delay("tts"))
+        return _LocalSpeechResponse(*self.provider.speech(input, response_format))
+
+    def _transcribe(self, file=None, **kwargs):
+        import time
+
+        time.sleep(self.provider.delay("transcribe"))
+        return self.provider.transcribe(file)
+
+    def close(self):
+        pass
+
+
+class _LocalAsyncClient(_LocalClient):
+    """ Async variant of _LocalClient (chat only, as used by BatchTextGen) """
+    def __init__(self, provider):
+        super().__init__(provider)
+        self.chat = _Namespace(completions=_Namespace(create=self._achat))
+
+    async def _achat(self, model=None, messages=None, max_tokens=None, **kwargs):
+        import asyncio
+
+        await asyncio.sleep(self.provider.delay("chat"))
+        return self.provider.chat(messages, max_tokens)
+
+    async def close(self):
+        pass
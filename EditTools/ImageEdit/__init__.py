@@ -1 +1,2 @@
-from .edit import EditImage, EditImageFaceBook, EditImageX
\ No newline at end of file
+from .edit import EditImage, EditImageFaceBook, EditImageX, render_card, card_overlay
+from .batch import render_cards
\ No newline at end of file
@@ -0,0 +1,90 @@
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+import os
+import time
+from .edit import CARD_TEMPLATES, TITLE_SIZE, current_dir, load_font, load_template, render_card
+
+FORMATS = {
+    # Nivel de compresión bajo: los PNG pesan algo más pero se escriben varias veces más rápido
+    "png": {"format": "PNG", "compress_level": 1},
+    "webp": {"format": "WEBP", "quality": 90, "method": 4},
+}
+
+
+def _warm_worker(corner_radius):
+    """ Carga cada plantilla y fuente una sola vez por proceso (quedan en las caches de edit) """
+    for layout in CARD_TEMPLATES.values():
+        load_template(os.path.join(current_dir, layout["image"]), corner_radius)
+        load_font(layout["nick_size"])
+    load_font(TITLE_SIZE)
+
+
+def _render_one(spec, output_path, save_options):
+    imagen = render_card(
+        spec.get("template", "reddit"),
+        spec["nickname"],
+        spec["title"],
+        spec.get("input_image"),
+        spec.get("corner_radius", 30),
+    )
+    imagen.save(output_path, **save_options)
+    return str(output_path)
+
+
+def render_cards(specs, output_dir="cards", workers=None, format="png", max_pending=None):
+    """
+    Genera muchas tarjetas de título en paralelo (variantes para miniaturas y pruebas A/B)
+
+    Cada proceso carga las plantillas y fuentes una sola vez y escribe sus
+    propias tarjetas, así al proceso principal solo vuelven rutas. Como
+    mucho max_pending tarjetas están en cola a la vez, por lo que la memoria
+    no crece con el número de tarjetas.
+
+    Args:
+        specs: Iterable de dicts {"nickname", "title", "template" ("reddit", "facebook" o "x"),
+            "output" (opcional), "input_image" (opcional), "corner_radius" (opcional)}
+        output_dir: Carpeta para las tarjetas sin "output"
+        workers: Procesos (None = núcleos disponibles, 0 o 1 = sin pool)
+        format: "png" o "webp"
+        max_pending: Tarjetas en cola como máximo (default: 4 por proceso)
+
+    Returns:
+        dict con "paths" (en el orden de specs), "seconds" y "cards_per_second"
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Formato no soportado: {format}. Opciones: {', '.join(FORMATS)}")
+    save_options = FORMATS[format]
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    workers = os.cpu_count() if workers is None else workers
+
+    def jobs():
+        for index, spec in enumerate(specs):
+            template = spec.get("template", "reddit")
+            if template not in CARD_TEMPLATES:
+                raise ValueError(f"Plantilla desconocida: {template}. Opciones: {', '.join(CARD_TEMPLATES)}")
+            output_path = spec.get("output") or output_dir / f"{template}_{index:05d}.{format}"
+            yield index, spec, output_path
+
+    start = time.perf_counter()
+    paths = {}
+    if workers <= 1:
+        for index, spec, output_path in jobs():
+            paths[index] = _render_one(spec, output_path, save_options)
+    else:
+        max_pending = max_pending or workers * 4
+        with ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker, initargs=(30,)) as executor:
+            pending = {}
+            for index, spec, output_path in jobs():
+                if len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        paths[pending.pop(future)] = future.result()
+                pending[executor.submit(_render_one, spec, output_path, save_options)] = index
+            for future in list(pending):
+                paths[pending.pop(future)] = future.result()
+
+    seconds = time.perf_counter() - start
+    rate = len(paths) / seconds if seconds > 0 else 0.0
+    print(f"[DEBUG] {len(paths)} tarjetas en {seconds:.2f}s ({rate:.1f} tarjetas/s)")
+    return {"paths": [paths[i] for i in sorted(paths)], "seconds": seconds, "cards_per_second": rate}
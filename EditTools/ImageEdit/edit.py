@@ -1,199 +1,205 @@
 from PIL import Image, ImageDraw, ImageFont
+from functools import lru_cache
+import numpy as np
 import os
 
-def EditImage(nickname, titulo_principal, input_image=None, output_path=None, corner_radius=30):
-    """ El Output es para especificar la ruta de salida, el input no importa mucho ya trae imagen por defecto """
-    # Abrir la imagen existente
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-
-    if input_image is None:
-        input_image = os.path.join(current_dir, 'input.png')
-    
-    if output_path is None:
-        output_path = os.path.join(current_dir, 'output.png')
-
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Diseño de cada plantilla de tarjeta
+CARD_TEMPLATES = {
+    "reddit": {
+        "image": "input.png",
+        "nick_size": 45,
+        "nick_position": (250, 55),
+        "handle_x": None,     # Posición del "@nickname" en gris (solo X)
+        "title_offset": 50,   # Desplazamiento vertical del título desde el centro
+    },
+    "facebook": {
+        "image": "facebookitem.png",
+        "nick_size": 45,
+        "nick_position": (200, 55),
+        "handle_x": None,
+        "title_offset": 15,
+    },
+    "x": {
+        "image": "xitem.png",
+        "nick_size": 33,
+        "nick_position": (200, 70),
+        "handle_x": 524,
+        "title_offset": -5,
+    },
+}
+
+TITLE_SIZE = 65
+
+
+@lru_cache(maxsize=16)
+def rounded_alpha(width, height, radius):
+    """
+    Canal alfa (alto, ancho) uint8 de un rectángulo con esquinas redondeadas
+
+    Se calcula vectorizado (distancia de cada píxel al rectángulo interior)
+    y se guarda en cache por tamaño, en lugar de dibujar una máscara 'L'
+    en cada llamada.
+    """
+    # Misma caja que rounded_rectangle([(0, 0), (ancho, alto)]) de la versión anterior
+    y, x = np.ogrid[:height, :width]
+    nearest_x = np.clip(x, radius - 0.5, width - radius + 0.5)
+    nearest_y = np.clip(y, radius - 0.5, height - radius + 0.5)
+    alpha = np.where((x - nearest_x) ** 2 + (y - nearest_y) ** 2 <= radius ** 2, 255, 0).astype(np.uint8)
+    alpha.flags.writeable = False
+    return alpha
+
+
+@lru_cache(maxsize=16)
+def _load_template(path, mtime, corner_radius):
+    imagen = np.asarray(Image.open(path).convert('RGB'))
+    alpha = rounded_alpha(imagen.shape[1], imagen.shape[0], corner_radius)
+    return Image.fromarray(np.dstack([imagen, alpha]), 'RGBA')
+
+
+def load_template(path, corner_radius=30):
+    """ Plantilla RGBA con las esquinas redondeadas, en cache por (ruta, mtime, radio). No modificar el resultado """
+    return _load_template(path, os.path.getmtime(path), corner_radius)
+
+
+@lru_cache(maxsize=8)
+def load_font(size):
     try:
-        imagen = Image.open(input_image)
-    except:
-        print("Error al cargar la imagen, usando imagen por defecto")
-        imagen = Image.open(os.path.join(current_dir, 'input.png'))
-    
-    # Crear objeto para dibujar sobre la imagen existente
-    mask = Image.new('L', imagen.size, 0)
-    mask_draw = ImageDraw.Draw(mask)
-    
-    # Dibujar un rectángulo redondeado en la máscara
-    width, height = imagen.size
-    mask_draw.rounded_rectangle([(0, 0), (width, height)], 
-                              radius=corner_radius, 
-                              fill=255)
-    
-    # Crear una nueva imagen con fondo transparente
-    output = Image.new('RGBA', imagen.size, (0, 0, 0, 0))
-    
-    # Convertir la imagen original a RGBA si no lo está
-    if imagen.mode != 'RGBA':
-        imagen = imagen.convert('RGBA')
-    
-    # Aplicar la máscara
-    output.paste(imagen, (0, 0))
-    output.putalpha(mask)
-    
-    # Actualizar la imagen para seguir trabajando con ella
-    imagen = output
-    dibujo = ImageDraw.Draw(imagen)
-    
-    try:
-        # Para el nickname (aumentado el tamaño)
-        tamano_fuente_nick = 45  # Antes era 35
-        font = os.path.join(current_dir, 'Grotesk_Bold.ttf')
-        fuente_nick = ImageFont.truetype(font, tamano_fuente_nick)
-        
-        # Para el título principal
-        tamano_fuente_titulo = 65
-        fuente_titulo = ImageFont.truetype(font, tamano_fuente_titulo)
-    except:
+        return ImageFont.truetype(os.path.join(current_dir, 'Grotesk_Bold.ttf'), size)
+    except Exception:
         print("Error al cargar la fuente, usando fuente por defecto")
-        fuente_nick = ImageFont.load_default()
-        fuente_titulo = ImageFont.load_default()
-    
-    # Agregar nickname (ajustado posición)
-    x_nick = 250  # Aumentado de 150 a 200 para moverlo más a la derecha
-    y_nick = 55   # Aumentado de 30 a 45 para bajarlo un poco
-    dibujo.text((x_nick, y_nick), nickname, font=fuente_nick, fill='black')
-    
-    # Preparar el título principal
-    palabras = titulo_principal.split()
+        return ImageFont.load_default()
+
+
+def wrap_title(dibujo, titulo, fuente, max_width):
+    """ Divide el título en líneas que no superen max_width """
     lineas = []
     linea_actual = []
-    
-    # Dividir el texto en líneas manualmente
-    for palabra in palabras:
+    for palabra in titulo.split():
         linea_actual.append(palabra)
-        linea_prueba = ' '.join(linea_actual)
-        if dibujo.textlength(linea_prueba, font=fuente_titulo) > imagen.width * 0.8:
+        if dibujo.textlength(' '.join(linea_actual), font=fuente) > max_width:
             linea_actual.pop()
             lineas.append(' '.join(linea_actual))
             linea_actual = [palabra]
     if linea_actual:
         lineas.append(' '.join(linea_actual))
+    return lineas
 
-    # Calcular altura total del texto y posición inicial
-    espacio_entre_lineas = tamano_fuente_titulo * 1.2
-    altura_total = len(lineas) * espacio_entre_lineas
-    y = (imagen.height - altura_total) // 2 + 50  # Agregado +50 para bajar más el título
-    
-    # Dibujar cada línea del título
-    for linea in lineas:
-        ancho_texto = dibujo.textlength(linea, font=fuente_titulo)
-        x = (imagen.width - ancho_texto) // 2 - 75
-        dibujo.text((x, y), linea, font=fuente_titulo, fill='black')
-        y += espacio_entre_lineas
-    
-    # Guardar la imagen editada
-    if output_path is None:
-        output_path = os.path.join(current_dir, 'output.png')
-    
-    try:
-        imagen.save(output_path, format='PNG')
-        print(f"Imagen guardada exitosamente en: {output_path}")
-    except Exception as e:
-        print(f"Error al guardar la imagen: {str(e)}")
 
+def render_card(template, nickname, titulo_principal, input_image=None, corner_radius=30):
+    """
+    Dibuja una tarjeta de título y la devuelve como imagen RGBA en memoria
 
-def EditImageFaceBook(nickname, titulo_principal, input_image=None, output_path=None, corner_radius=30):
-    """ El Output es para especificar la ruta de salida, el input no importa mucho ya trae imagen por defecto """
-    # Abrir la imagen existente
-    current_dir = os.path.dirname(os.path.abspath(__file__))
+    El resultado se guarda en cache por sus argumentos, así guardar el PNG y
+    crear el overlay del video usan el mismo render. No modificar el resultado.
+
+    Args:
+        template: Plantilla de CARD_TEMPLATES ("reddit", "facebook" o "x")
+        nickname: Nombre de usuario
+        titulo_principal: Título de la tarjeta
+        input_image: Imagen de fondo opcional (default: la de la plantilla)
+        corner_radius: Radio de las esquinas redondeadas
+    """
+    mtime = os.path.getmtime(input_image) if input_image and os.path.exists(input_image) else None
+    return _render_card(template, nickname, titulo_principal, input_image, mtime, corner_radius)
 
-    if input_image is None:
-        input_image = os.path.join(current_dir, 'facebookitem.png')
-    
-    if output_path is None:
-        output_path = os.path.join(current_dir, 'output.png')
+
+@lru_cache(maxsize=32)
+def _render_card(template, nickname, titulo_principal, input_image, mtime, corner_radius):
+    layout = CARD_TEMPLATES[template]
+    default_image = os.path.join(current_dir, layout["image"])
 
     try:
-        imagen = Image.open(input_image)
-    except:
+        imagen = load_template(input_image or default_image, corner_radius).copy()
+    except Exception:
         print("Error al cargar la imagen, usando imagen por defecto")
-        imagen = Image.open(os.path.join(current_dir, 'facebookitem.png'))
-    
-    # Crear objeto para dibujar sobre la imagen existente
-    mask = Image.new('L', imagen.size, 0)
-    mask_draw = ImageDraw.Draw(mask)
-    
-    # Dibujar un rectángulo redondeado en la máscara
-    width, height = imagen.size
-    mask_draw.rounded_rectangle([(0, 0), (width, height)], 
-                              radius=corner_radius, 
-                              fill=255)
-    
-    # Crear una nueva imagen con fondo transparente
-    output = Image.new('RGBA', imagen.size, (0, 0, 0, 0))
-    
-    # Convertir la imagen original a RGBA si no lo está
-    if imagen.mode != 'RGBA':
-        imagen = imagen.convert('RGBA')
-    
-    # Aplicar la máscara
-    output.paste(imagen, (0, 0))
-    output.putalpha(mask)
-    
-    # Actualizar la imagen para seguir trabajando con ella
-    imagen = output
+        imagen = load_template(default_image, corner_radius).copy()
+
     dibujo = ImageDraw.Draw(imagen)
-    
-    try:
-        # Para el nickname (aumentado el tamaño)
-        tamano_fuente_nick = 45  # Antes era 35
-        font = os.path.join(current_dir, 'Grotesk_Bold.ttf')
-        fuente_nick = ImageFont.truetype(font, tamano_fuente_nick)
-        
-        # Para el título principal
-        tamano_fuente_titulo = 65
-        fuente_titulo = ImageFont.truetype(font, tamano_fuente_titulo)
-    except:
-        print("Error al cargar la fuente, usando fuente por defecto")
-        fuente_nick = ImageFont.load_default()
-        fuente_titulo = ImageFont.load_default()
-    
-    # Agregar nickname (ajustado posición)
-    x_nick = 200  # Aumentado de 150 a 200 para moverlo más a la derecha
-    y_nick = 55   # Aumentado de 30 a 45 para bajarlo un poco
+    fuente_nick = load_font(layout["nick_size"])
+    fuente_titulo = load_font(TITLE_SIZE)
+
+    # Nickname
+    x_nick, y_nick = layout["nick_position"]
     dibujo.text((x_nick, y_nick), nickname, font=fuente_nick, fill='black')
-    
-    # Preparar el título principal
-    palabras = titulo_principal.split()
-    lineas = []
-    linea_actual = []
-    
-    # Dividir el texto en líneas manualmente
-    for palabra in palabras:
-        linea_actual.append(palabra)
-        linea_prueba = ' '.join(linea_actual)
-        if dibujo.textlength(linea_prueba, font=fuente_titulo) > imagen.width * 0.8:
-            linea_actual.pop()
-            lineas.append(' '.join(linea_actual))
-            linea_actual = [palabra]
-    if linea_actual:
-        lineas.append(' '.join(linea_actual))
+    if layout["handle_x"] is not None:
+        dibujo.text((layout["handle_x"], y_nick), f"@{nickname}", font=fuente_nick, fill='gray')
 
-    # Calcular altura total del texto y posición inicial
-    espacio_entre_lineas = tamano_fuente_titulo * 1.2
-    altura_total = len(lineas) * espacio_entre_lineas
-    y = (imagen.height - altura_total) // 2 + 15  # Agregado +50 para bajar más el título
-    
-    # Dibujar cada línea del título
+    # Título principal centrado
+    lineas = wrap_title(dibujo, titulo_principal, fuente_titulo, imagen.width * 0.8)
+    espacio_entre_lineas = TITLE_SIZE * 1.2
+    y = (imagen.height - len(lineas) * espacio_entre_lineas) // 2 + layout["title_offset"]
     for linea in lineas:
         ancho_texto = dibujo.textlength(linea, font=fuente_titulo)
         x = (imagen.width - ancho_texto) // 2 - 75
         dibujo.text((x, y), linea, font=fuente_titulo, fill='black')
         y += espacio_entre_lineas
-    
-    # Guardar la imagen editada
-    if output_path is None:
-        output_path = os.path.join(current_dir, 'output.png')
-    
+
+    return imagen
+
+
+def resize_premultiplied(imagen, width):
+    """
+    Escala una imagen RGBA a `width` de ancho en alfa premultiplicado
+
+    Escalar en alfa premultiplicado evita los bordes oscuros en las esquinas
+    transparentes. Devuelve un arreglo (alto, ancho, 4) uint8 premultiplicado.
+    """
+    width = int(round(width))
+    height = max(1, int(round(imagen.height * width / imagen.width)))
+    premultiplied = imagen.convert('RGBa').resize((width, height), Image.LANCZOS)
+    array = np.asarray(premultiplied)
+    array.flags.writeable = False
+    return array
+
+
+def unpremultiply(array):
+    """ Arreglo RGBA premultiplicado a RGBA normal (el formato que usa moviepy) """
+    return np.asarray(Image.fromarray(np.ascontiguousarray(array), 'RGBa').convert('RGBA'))
+
+
+@lru_cache(maxsize=32)
+def card_overlay(template, nickname, titulo_principal, width, input_image=None, corner_radius=30):
+    """
+    Tarjeta lista para el video: ya escalada a su ancho final, en alfa premultiplicado
+
+    En cache por (plantilla, nickname, título, ancho), sin pasar por un PNG.
+
+    Returns:
+        Arreglo (alto, ancho, 4) uint8 de solo lectura, RGB premultiplicado por el alfa
+    """
+    card = render_card(template, nickname, titulo_principal, input_image, corner_radius)
+    return resize_premultiplied(card, width)
+
+
+@lru_cache(maxsize=32)
+def _file_overlay(path, mtime, width):
+    return resize_premultiplied(Image.open(path).convert('RGBA'), width)
+
+
+def file_overlay(path, width):
+    """ Igual que card_overlay para una imagen ya guardada, en cache por (ruta, mtime, ancho) """
+    return _file_overlay(path, os.path.getmtime(path), int(round(width)))
+
+
+@lru_cache(maxsize=32)
+def card_raster(template, nickname, titulo_principal, width, input_image=None, corner_radius=30):
+    """ card_overlay ya convertido a RGBA normal (imagen PIL), en cache: el raster a escala 1 de OverlayClip """
+    return Image.fromarray(card_overlay(template, nickname, titulo_principal, width, input_image, corner_radius), 'RGBa').convert('RGBA')
+
+
+@lru_cache(maxsize=32)
+def _file_raster(path, mtime, width):
+    return Image.fromarray(_file_overlay(path, mtime, width), 'RGBa').convert('RGBA')
+
+
+def file_raster(path, width):
+    """ Igual que card_raster para una imagen ya guardada """
+    return _file_raster(path, os.path.getmtime(path), int(round(width)))
+
+
+def save_card(imagen, output_path):
     try:
         imagen.save(output_path, format='PNG')
         print(f"Imagen guardada exitosamente en: {output_path}")
@@ -201,113 +207,30 @@ def EditImageFaceBook(nickname, titulo_principal, input_image=None, output_path=
         print(f"Error al guardar la imagen: {str(e)}")
 
 
-def EditImageX(nickname, titulo_principal, input_image=None, output_path=None, corner_radius=30):
+def EditImage(nickname, titulo_principal, input_image=None, output_path=None, corner_radius=30):
     """ El Output es para especificar la ruta de salida, el input no importa mucho ya trae imagen por defecto """
-    # Abrir la imagen existente
-    current_dir = os.path.dirname(os.path.abspath(__file__))
+    if output_path is None:
+        output_path = os.path.join(current_dir, 'output.png')
+    save_card(render_card("reddit", nickname, titulo_principal, input_image, corner_radius), output_path)
+
 
-    if input_image is None:
-        input_image = os.path.join(current_dir, 'xitem.png')
-    
+def EditImageFaceBook(nickname, titulo_principal, input_image=None, output_path=None, corner_radius=30):
+    """ El Output es para especificar la ruta de salida, el input no importa mucho ya trae imagen por defecto """
     if output_path is None:
         output_path = os.path.join(current_dir, 'output.png')
+    save_card(render_card("facebook", nickname, titulo_principal, input_image, corner_radius), output_path)
 
-    try:
-        imagen = Image.open(input_image)
-    except:
-        print("Error al cargar la imagen, usando imagen por defecto")
-        imagen = Image.open(os.path.join(current_dir, 'xitem.png'))
-    
-    # Crear objeto para dibujar sobre la imagen existente
-    mask = Image.new('L', imagen.size, 0)
-    mask_draw = ImageDraw.Draw(mask)
-    
-    # Dibujar un rectángulo redondeado en la máscara
-    width, height = imagen.size
-    mask_draw.rounded_rectangle([(0, 0), (width, height)], 
-                              radius=corner_radius, 
-                              fill=255)
-    
-    # Crear una nueva imagen con fondo transparente
-    output = Image.new('RGBA', imagen.size, (0, 0, 0, 0))
-    
-    # Convertir la imagen original a RGBA si no lo está
-    if imagen.mode != 'RGBA':
-        imagen = imagen.convert('RGBA')
-    
-    # Aplicar la máscara
-    output.paste(imagen, (0, 0))
-    output.putalpha(mask)
-    
-    # Actualizar la imagen para seguir trabajando con ella
-    imagen = output
-    dibujo = ImageDraw.Draw(imagen)
-    
-    try:
-        # Para el nickname (aumentado el tamaño)
-        tamano_fuente_nick = 33  # Antes era 35
-        font = os.path.join(current_dir, 'Grotesk_Bold.ttf')
-        fuente_nick = ImageFont.truetype(font, tamano_fuente_nick)
-        
-        # Para el título principal
-        tamano_fuente_titulo = 65
-        fuente_titulo = ImageFont.truetype(font, tamano_fuente_titulo)
-    except:
-        print("Error al cargar la fuente, usando fuente por defecto")
-        fuente_nick = ImageFont.load_default()
-        fuente_titulo = ImageFont.load_default()
-    
-    # Agregar nickname (ajustado posición)
-    x_nick = 200  # Aumentado de 150 a 200 para moverlo más a la derecha
-    y_nick = 70   # Aumentado de 30 a 45 para bajarlo un poco
-
-    nickname_2 = f"@{nickname}"
-    x_nick_2 = 524
-    dibujo.text((x_nick, y_nick), nickname, font=fuente_nick, fill='black')
-    dibujo.text((x_nick_2, y_nick), nickname_2, font=fuente_nick, fill='gray')
-    
-    # Preparar el título principal
-    palabras = titulo_principal.split()
-    lineas = []
-    linea_actual = []
-    
-    # Dividir el texto en líneas manualmente
-    for palabra in palabras:
-        linea_actual.append(palabra)
-        linea_prueba = ' '.join(linea_actual)
-        if dibujo.textlength(linea_prueba, font=fuente_titulo) > imagen.width * 0.8:
-            linea_actual.pop()
-            lineas.append(' '.join(linea_actual))
-            linea_actual = [palabra]
-    if linea_actual:
-        lineas.append(' '.join(linea_actual))
 
-    # Calcular altura total del texto y posición inicial
-    espacio_entre_lineas = tamano_fuente_titulo * 1.2
-    altura_total = len(lineas) * espacio_entre_lineas
-    y = (imagen.height - altura_total) // 2  - 5 # Agregado +50 para bajar más el título
-    
-    # Dibujar cada línea del título
-    for linea in lineas:
-        ancho_texto = dibujo.textlength(linea, font=fuente_titulo)
-        x = (imagen.width - ancho_texto) // 2 - 75
-        dibujo.text((x, y), linea, font=fuente_titulo, fill='black')
-        y += espacio_entre_lineas
-    
-    # Guardar la imagen editada
+def EditImageX(nickname, titulo_principal, input_image=None, output_path=None, corner_radius=30):
+    """ El Output es para especificar la ruta de salida, el input no importa mucho ya trae imagen por defecto """
     if output_path is None:
         output_path = os.path.join(current_dir, 'output.png')
-    
-    try:
-        imagen.save(output_path, format='PNG')
-        print(f"Imagen guardada exitosamente en: {output_path}")
-    except Exception as e:
-        print(f"Error al guardar la imagen: {str(e)}")
+    save_card(render_card("x", nickname, titulo_principal, input_image, corner_radius), output_path)
 
 # Ejemplo de uso correcto:
 # nickname = "chicodereddit"
 # titulo = "Titulo de ejemplo que se espera"
-# EditImage(nickname=nickname, 
+# EditImage(nickname=nickname,
 #          titulo_principal=titulo,
 #          input_image="input.png",
 #          output_path="output.png")
\ No newline at end of file
@@ -1,2 +1,23 @@
-from .video import VideoEditReddit
-from .subt import Subt
\ No newline at end of file
+import importlib
+
+_LAZY_ATTRS = {
+    "VideoEditReddit": ".video",
+    "Subt": ".subt",
+    "OutputTarget": ".outputs",
+    "PreviewTap": ".preview",
+    "CueList": ".cues",
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
\ No newline at end of file
@@ -0,0 +1,168 @@
+from moviepy import VideoClip
+from PIL import Image, ImageDraw, ImageFont
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import bisect
+import json
+
+def render_caption(text, font, font_size, color="white", stroke_color="black", stroke_width=10, interline=4):
+    """
+    Rasteriza un subtítulo (texto ya partido en líneas) a un arreglo RGBA ajustado al texto
+
+    Es una función de módulo para poder ejecutarse en un pool de procesos.
+    """
+    fuente = ImageFont.truetype(font, font_size)
+    dummy = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+    left, top, right, bottom = (int(round(v)) for v in dummy.multiline_textbbox(
+        (0, 0), text, font=fuente, spacing=interline, align='center', stroke_width=stroke_width
+    ))
+    imagen = Image.new('RGBA', (max(1, right - left), max(1, bottom - top)), (0, 0, 0, 0))
+    dibujo = ImageDraw.Draw(imagen)
+    dibujo.multiline_text(
+        (-left, -top), text, font=fuente, fill=color, spacing=interline, align='center',
+        stroke_width=stroke_width, stroke_fill=stroke_color
+    )
+    return np.asarray(imagen)
+
+
+class SubtitleAtlas:
+    def __init__(self, atlas, intervals, rects):
+        """
+        Todos los subtítulos de un render pre-rasterizados en una sola imagen RGBA
+
+        Args:
+            atlas: Arreglo (alto, ancho, 4) uint8, en memoria o np.memmap
+            intervals: Lista ordenada de (inicio, fin) en segundos
+            rects: Rectángulo (x, y, ancho, alto) en el atlas de cada intervalo
+        """
+        self.atlas = atlas
+        self.intervals = intervals
+        self.rects = rects
+        self.starts = [start for start, _ in intervals]
+        self.cell_height = max([h for _, _, _, h in rects] or [1])
+
+    @classmethod
+    def build(cls, subtitles, font, font_size, color="white", stroke_color="black", stroke_width=10, interline=4, width=1080, workers=None, atlas_path=None):
+        """
+        Rasteriza todos los cues en paralelo y los empaqueta por filas en un atlas
+
+        Args:
+            subtitles: Lista [((inicio, fin), texto), ...] con el texto ya formateado.
+                Los cues vacíos o "." (ocultos) no se dibujan
+            font: Ruta a la fuente .ttf
+            font_size: Tamaño de la fuente
+            width: Ancho del atlas (normalmente el ancho del video)
+            workers: Procesos para rasterizar (None = núcleos disponibles, 0 o 1 = sin pool)
+            atlas_path: Ruta opcional .npy para guardar el atlas como archivo mapeado en memoria
+
+        Returns:
+            SubtitleAtlas
+        """
+        cues = sorted(
+            [((start, end), text) for (start, end), text in subtitles if text.strip() and text.strip() != '.'],
+            key=lambda cue: cue[0][0]
+        )
+        texts = [text for _, text in cues]
+        args = (font, font_size, color, stroke_color, stroke_width, interline)
+
+        print(f"[DEBUG] Rasterizando {len(texts)} subtítulos en el atlas")
+        if (workers is not None and workers <= 1) or len(texts) < 2:
+            images = [render_caption(text, *args) for text in texts]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                images = list(executor.map(render_caption, texts, *[[a] * len(texts) for a in args]))
+
+        # Empaquetado por filas de alto fijo, así el subtítulo no salta de posición vertical
+        cell_height = max([img.shape[0] for img in images] or [1])
+        width = max([width] + [img.shape[1] for img in images])
+        rects = []
+        x, y = 0, 0
+        for img in images:
+            h, w = img.shape[:2]
+            if x + w > width:
+                x, y = 0, y + cell_height
+            rects.append((x, y, w, cell_height))
+            x += w
+        height = max(1, y + cell_height)
+
+        if atlas_path:
+            atlas_path = Path(atlas_path)
+            atlas_path.parent.mkdir(parents=True, exist_ok=True)
+            atlas = np.lib.format.open_memmap(atlas_path, mode='w+', dtype=np.uint8, shape=(height, width, 4))
+            atlas[:] = 0
+        else:
+            atlas = np.zeros((height, width, 4), dtype=np.uint8)
+
+        for img, (x, y, w, _) in zip(images, rects):
+            h = img.shape[0]
+            top = y + (cell_height - h) // 2
+            atlas[top:top + h, x:x + w] = img
+
+        intervals = [times for times, _ in cues]
+        result = cls(atlas, intervals, rects)
+        if atlas_path:
+            atlas.flush()
+            result.save_index(atlas_path)
+        return result
+
+    def save_index(self, atlas_path):
+        index_path = Path(atlas_path).with_suffix('.json')
+        with open(index_path, 'w', encoding='utf-8') as f:
+            json.dump({"intervals": self.intervals, "rects": self.rects}, f)
+
+    @classmethod
+    def load(cls, atlas_path):
+        """ Abre un atlas guardado con atlas_path, mapeado en memoria y de solo lectura """
+        atlas = np.load(atlas_path, mmap_mode='r')
+        with open(Path(atlas_path).with_suffix('.json'), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        return cls(atlas, [tuple(i) for i in index["intervals"]], [tuple(r) for r in index["rects"]])
+
+    def lookup(self, t):
+        """ Índice del cue visible en t, o None. Búsqueda binaria sobre los inicios """
+        index = bisect.bisect_right(self.starts, t) - 1
+        if index < 0 or t >= self.intervals[index][1]:
+            return None
+        return index
+
+    def image(self, index):
+        x, y, w, h = self.rects[index]
+        return self.atlas[y:y + h, x:x + w]
+
+    @property
+    def duration(self):
+        return max([end for _, end in self.intervals] or [0])
+
+
+class AtlasSubtitlesClip(VideoClip):
+    def __init__(self, atlas):
+        """
+        Pista de subtítulos que lee cada cuadro del atlas: búsqueda binaria y un slice,
+        sin dibujar texto durante la codificación
+        """
+        VideoClip.__init__(self, has_constant_size=False)
+        self.atlas = atlas
+        self.duration = atlas.duration
+        self.end = self.duration
+        self.size = (atlas.atlas.shape[1], atlas.cell_height)
+        self.current = None
+        self.current_mask = np.zeros((1, 1))
+
+        def frame_function(t):
+            index = atlas.lookup(t)
+            if index is None:
+                return np.zeros((1, 1, 3), dtype=np.uint8)
+            return atlas.image(index)[:, :, :3]
+
+        def make_mask_frame(t):
+            index = atlas.lookup(t)
+            if index != self.current:
+                self.current = index
+                self.current_mask = np.zeros((1, 1)) if index is None else atlas.image(index)[:, :, 3] / 255.0
+            return self.current_mask
+
+        self.frame_function = frame_function
+        self.mask = VideoClip(make_mask_frame, is_mask=True, has_constant_size=False)
+        self.mask.duration = self.duration
+        self.mask.end = self.duration
@@ -0,0 +1,134 @@
+from pathlib import Path
+import numpy as np
+import hashlib
+import os
+import subprocess
+
+class AudioCache:
+    def __init__(self, cache_dir=None, fps=44100, nchannels=2):
+        """
+        Cache de audio decodificado (PCM float32) en archivos .npy mapeados en memoria
+
+        Cada archivo de audio se decodifica una sola vez por host: la clave es
+        el hash del contenido más la frecuencia de muestreo, así que distintos
+        trabajos y procesos que usan el mismo TTS o la misma música comparten
+        la misma decodificación. La duración se obtiene del encabezado del .npy
+        sin leer las muestras.
+
+        Args:
+            cache_dir: Directorio del cache (default: ~/.cache/edittools/audio)
+            fps: Frecuencia de muestreo de la decodificación
+            nchannels: Canales de la decodificación
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else Path.home() / ".cache" / "edittools" / "audio"
+        self.fps = fps
+        self.nchannels = nchannels
+        self._digests = {}
+
+    def file_hash(self, path):
+        """ Hash del contenido del archivo, memorizado por (ruta, tamaño, mtime) """
+        path = Path(path)
+        stat = path.stat()
+        memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._digests:
+            digest = hashlib.sha1()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            self._digests[memo_key] = digest.hexdigest()
+        return self._digests[memo_key]
+
+    def cache_path(self, path):
+        return self.cache_dir / f"{self.file_hash(path)}_{self.fps}_{self.nchannels}ch.npy"
+
+    def decode(self, path, cache_path):
+        """ Decodifica con ffmpeg a float32 y guarda el .npy (escritura atómica) """
+        from moviepy.config import FFMPEG_BINARY
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        raw_path = cache_path.with_name(f"{cache_path.stem}.{os.getpid()}.raw")
+        temp_path = cache_path.with_name(f"{cache_path.stem}.{os.getpid()}.tmp.npy")
+        print(f"[DEBUG] Decodificando audio a cache: {path}")
+        try:
+            cmd = [
+                FFMPEG_BINARY, "-y", "-loglevel", "error",
+                "-i", str(path), "-vn",
+                "-f", "f32le", "-acodec", "pcm_f32le",
+                "-ar", str(self.fps), "-ac", str(self.nchannels),
+                str(raw_path),
+            ]
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+            frames = os.path.getsize(raw_path) // (4 * self.nchannels)
+            raw = np.memmap(raw_path, dtype=np.float32, mode='r', shape=(frames, self.nchannels))
+            array = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.float32, shape=(frames, self.nchannels))
+            array[:] = raw
+            array.flush()
+            del raw, array
+            os.replace(temp_path, cache_path)
+        finally:
+            for temp in (raw_path, temp_path):
+                if temp.exists():
+                    os.remove(temp)
+
+    def load(self, path):
+        """
+        Devuelve las muestras decodificadas de `path` como np.memmap de solo lectura (frames, canales)
+
+        Raises:
+            FileNotFoundError: Si no existe el archivo de audio
+        """
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(f"Archivo de audio no encontrado: {path}")
+
+        cache_path = self.cache_path(path)
+        if not cache_path.exists():
+            self.decode(path, cache_path)
+        return np.load(cache_path, mmap_mode='r')
+
+    def duration(self, path):
+        """ Duración en segundos leída del encabezado del .npy """
+        return len(self.load(path)) / self.fps
+
+    def clip(self, path):
+        """ AudioArrayClip respaldado por el cache mapeado en memoria """
+        from moviepy import AudioArrayClip
+
+        samples = self.load(path)
+        # AudioArrayClip no define end; sin él CompositeAudioClip no tiene duración
+        return AudioArrayClip(samples, fps=self.fps).with_duration(len(samples) / self.fps)
+
+    def envelope(self, path, hop=0.01):
+        """
+        Envolvente RMS (mono) de `path` en ventanas de `hop` segundos, en cache junto al audio decodificado
+
+        Se calcula vectorizada por bloques sobre el .npy mapeado en memoria, así
+        que la memoria no crece con la duración del audio.
+
+        Returns:
+            np.ndarray float32 con un valor RMS por ventana
+        """
+        hop_samples = max(1, int(round(hop * self.fps)))
+        cache_path = self.cache_path(path)
+        envelope_path = cache_path.with_name(f"{cache_path.stem}.rms{hop_samples}.npy")
+        if envelope_path.exists():
+            return np.load(envelope_path)
+
+        samples = self.load(path)
+        windows = len(samples) // hop_samples
+        envelope = np.empty(windows, dtype=np.float32)
+        block = 4096  # Ventanas por bloque
+        for start in range(0, windows, block):
+            stop = min(windows, start + block)
+            chunk = np.asarray(samples[start * hop_samples:stop * hop_samples], dtype=np.float32)
+            envelope[start:stop] = np.sqrt(np.square(chunk).reshape(stop - start, -1).mean(axis=1))
+
+        temp_path = envelope_path.with_name(f"{envelope_path.stem}.{os.getpid()}.tmp.npy")
+        try:
+            np.save(temp_path, envelope)
+            os.replace(temp_path, envelope_path)
+        finally:
+            if temp_path.exists():
+                os.remove(temp_path)
+        return envelope
@@ -0,0 +1,39 @@
+from moviepy import VideoClip
+import numpy as np
+
+class CueTextClip(VideoClip):
+    def __init__(self, cues, make_textclip):
+        """
+        Pista de subtítulos que dibuja cada cue con make_textclip(texto)
+
+        Reemplaza a SubtitlesClip: busca el cue con búsqueda binaria y solo
+        guarda el TextClip del cue actual, en lugar de recorrer la lista en
+        cada cuadro y conservar todos los TextClips.
+        """
+        VideoClip.__init__(self, has_constant_size=False)
+        self.cues = cues
+        self.make_textclip = make_textclip
+        self.duration = cues.duration
+        self.end = self.duration
+        self.current = None
+        self.current_clip = None
+
+        def frame_function(t):
+            clip = self.textclip(t)
+            return clip.get_frame(t) if clip is not None else np.zeros((1, 1, 3))
+
+        def make_mask_frame(t):
+            clip = self.textclip(t)
+            return clip.mask.get_frame(t) if clip is not None and clip.mask is not None else np.zeros((1, 1))
+
+        self.frame_function = frame_function
+        self.mask = VideoClip(make_mask_frame, is_mask=True, has_constant_size=False)
+        self.mask.duration = self.duration
+        self.mask.end = self.duration
+
+    def textclip(self, t):
+        index = self.cues.lookup(t)
+        if index != self.current:
+            self.current = index
+            self.current_clip = None if index is None else self.make_textclip(self.cues[index]["text"])
+        return self.current_clip
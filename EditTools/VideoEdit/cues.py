@@ -0,0 +1,104 @@
+from pathlib import Path
+import bisect
+import json
+
+HIDDEN_TEXT = "."  # Cue que ocupa su tiempo pero no se dibuja (p. ej. mientras se ve el título)
+
+
+def format_timestamp(seconds):
+    millis = int(round(max(0.0, seconds) * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+class CueList:
+    def __init__(self, cues):
+        """
+        Lista de subtítulos en memoria, ordenada por inicio, con búsqueda por tiempo
+
+        Subt la produce y el renderizador la consume directamente; el SRT y el
+        JSON son solo formatos de exportación.
+
+        Args:
+            cues: Lista de cues {"start", "end", "text", "words": [{"word", "start", "end"}]}
+        """
+        self.cues = sorted(
+            [dict(cue, words=list(cue.get("words") or [])) for cue in cues],
+            key=lambda cue: cue["start"]
+        )
+        self.starts = [cue["start"] for cue in self.cues]
+
+    def __len__(self):
+        return len(self.cues)
+
+    def __iter__(self):
+        return iter(self.cues)
+
+    def __getitem__(self, index):
+        return self.cues[index]
+
+    @property
+    def duration(self):
+        return max([cue["end"] for cue in self.cues] or [0])
+
+    @staticmethod
+    def is_hidden(cue):
+        return cue["text"].strip() == HIDDEN_TEXT
+
+    def visible(self):
+        """ Cues que se dibujan (sin los ocultos) """
+        return [cue for cue in self.cues if not self.is_hidden(cue)]
+
+    def lookup(self, t):
+        """ Índice del cue visible en t, o None. Búsqueda binaria sobre los inicios """
+        index = bisect.bisect_right(self.starts, t) - 1
+        if index < 0 or t >= self.cues[index]["end"]:
+            return None
+        return index
+
+    def at(self, t):
+        index = self.lookup(t)
+        return None if index is None else self.cues[index]
+
+    def hide_first(self):
+        """ Copia con el primer cue oculto (el título ya está en pantalla durante ese tiempo) """
+        if not self.cues or self.is_hidden(self.cues[0]):
+            return CueList(self.cues)
+        first = dict(self.cues[0], text=HIDDEN_TEXT, words=[])
+        return CueList([first] + self.cues[1:])
+
+    def subtitles(self):
+        """ Formato de moviepy: [((inicio, fin), texto), ...] """
+        return [((cue["start"], cue["end"]), cue["text"]) for cue in self.cues]
+
+    def to_srt(self):
+        return ''.join(
+            f"{i}\n{format_timestamp(cue['start'])} --> {format_timestamp(cue['end'])}\n{cue['text']}\n\n"
+            for i, cue in enumerate(self.cues, 1)
+        )
+
+    def write_srt(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_srt())
+        return str(path)
+
+    def write_json(self, path):
+        """ Guarda los cues con el tiempo de cada palabra (el .words.json de los subtítulos karaoke) """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.cues, f, ensure_ascii=False)
+        return str(path)
+
+    @classmethod
+    def load(cls, path):
+        """ Carga cues desde un .json (write_json) o un .srt """
+        path = Path(path)
+        if path.suffix.lower() == '.json':
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls(json.load(f))
+        from moviepy.video.tools.subtitles import file_to_subtitles
+        return cls([
+            {"start": start, "end": end, "text": text, "words": []}
+            for (start, end), text in file_to_subtitles(str(path), encoding='utf-8')
+        ])
@@ -0,0 +1,52 @@
+import numpy as np
+
+
+def ducking_gain(envelope, hop, length, fps, speech_gain=0.1, gap_gain=0.3, threshold_db=-30, hold=0.25, smoothing=0.4):
+    """
+    Curva de ganancia por muestra para bajar la música mientras se habla (ducking)
+
+    Se decide por ventana de la envolvente si hay voz (por encima de
+    threshold_db respecto al pico), se mantienen las pausas cortas como voz
+    durante `hold` segundos para que la música no suba entre palabras, y la
+    curva de dos niveles se suaviza con una ventana de Hann de `smoothing`
+    segundos, así la música baja un poco antes de cada frase y sube después.
+    Todo es vectorizado; después de la envolvente queda la narración en
+    silencio (p. ej. la pantalla final) y la música vuelve a gap_gain.
+
+    Args:
+        envelope: Envolvente RMS de la narración (AudioCache.envelope)
+        hop: Segundos por valor de la envolvente
+        length: Muestras de la música a la que se aplica
+        fps: Frecuencia de muestreo de la música
+        speech_gain: Ganancia de la música bajo la voz
+        gap_gain: Ganancia de la música en las pausas
+        threshold_db: Umbral de voz en dB respecto al pico de la envolvente
+        hold: Pausas más cortas que esto (segundos) cuentan como voz
+        smoothing: Duración en segundos de la ventana de suavizado
+
+    Returns:
+        np.ndarray float32 (length,) con la ganancia de cada muestra
+    """
+    envelope = np.asarray(envelope, dtype=np.float32)
+    windows = int(np.ceil(length / fps / hop)) + 1
+    speech = np.zeros(windows, dtype=bool)
+    if len(envelope) and envelope.max() > 0:
+        threshold = envelope.max() * 10 ** (threshold_db / 20)
+        active = envelope[:windows] > threshold
+        speech[:len(active)] = active
+
+    # Mantener la voz `hold` segundos a cada lado para cubrir las pausas entre palabras
+    hold_windows = max(0, int(round(hold / hop)))
+    if hold_windows:
+        speech = np.convolve(speech, np.ones(2 * hold_windows + 1), mode="same") > 0
+
+    gain = np.where(speech, speech_gain, gap_gain).astype(np.float32)
+    smooth_windows = max(1, int(round(smoothing / hop)))
+    if smooth_windows > 1:
+        kernel = np.hanning(smooth_windows + 2)[1:-1]
+        padded = np.pad(gain, smooth_windows, mode="edge")
+        gain = np.convolve(padded, kernel / kernel.sum(), mode="same")[smooth_windows:-smooth_windows]
+
+    # Cada valor corresponde al centro de su ventana
+    times = (np.arange(windows) + 0.5) * hop
+    return np.interp(np.arange(length) / fps, times, gain).astype(np.float32)
@@ -0,0 +1,141 @@
+from moviepy import VideoClip
+from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+import bisect
+import math
+
+class KaraokeCaptionClip(VideoClip):
+    def __init__(self, cues, font, font_size, width, color="white", highlight_color="yellow", stroke_color="black", stroke_width=10, words_per_line=2, interline=4, transform=None):
+        """
+        Subtítulos con la palabra actual resaltada (estilo karaoke)
+
+        Cada cue se dibuja una sola vez en dos rásters del mismo tamaño: todas
+        las palabras en el color normal y todas en el color de resaltado. En
+        cada cuadro solo se copia el rectángulo de la palabra que cambió, en
+        lugar de crear un TextClip por cada estado de palabra.
+
+        Args:
+            cues: Lista de cues {"start", "end", "text", "words": [{"word", "start", "end"}]}
+                (ver Subt.group_words)
+            font: Ruta a la fuente .ttf
+            font_size: Tamaño de la fuente
+            width: Ancho del clip (normalmente el ancho del video)
+            color: Color normal del texto
+            highlight_color: Color de la palabra que se está diciendo
+            stroke_color: Color del contorno
+            stroke_width: Grosor del contorno
+            words_per_line: Palabras por línea
+            interline: Espacio extra entre líneas
+            transform: Función opcional que recibe la lista de palabras y
+                devuelve la lista a mostrar (mayúsculas, minúsculas, etc.)
+        """
+        self.cues = sorted(cues, key=lambda cue: cue["start"])
+        self.font = ImageFont.truetype(font, font_size)
+        self.color = color
+        self.highlight_color = highlight_color
+        self.stroke_color = stroke_color
+        self.stroke_width = stroke_width
+        self.words_per_line = words_per_line
+        self.transform = transform
+
+        ascent, descent = self.font.getmetrics()
+        self.line_height = ascent + descent + 2 * stroke_width
+        self.line_step = self.line_height + interline
+        max_lines = max([math.ceil(len(self.cue_words(cue)) / words_per_line) for cue in self.cues] or [1])
+        height = max(1, max_lines) * self.line_step
+
+        VideoClip.__init__(self)
+        self.size = (int(width), int(height))
+        self.duration = max([cue["end"] for cue in self.cues] or [0])
+        self.end = self.duration
+
+        self.starts = [cue["start"] for cue in self.cues]
+        self.rasters = {}
+        self.blank = np.zeros((self.size[1], self.size[0], 4), dtype=np.uint8)
+        self.current_cue = None
+        self.current_word = None
+        self.buffer = self.blank
+        self.mask_buffer = None
+
+        self.frame_function = lambda t: self.update(t)[:, :, :3]
+        self.mask = VideoClip(self.make_mask_frame, is_mask=True)
+        self.mask.size = self.size
+        self.mask.duration = self.duration
+        self.mask.end = self.duration
+
+    def cue_words(self, cue):
+        words = [w["word"] for w in cue.get("words", [])] or cue.get("text", "").split()
+        return self.transform(words) if self.transform else words
+
+    def render_cue(self, cue):
+        """ Dibuja el cue en color normal y resaltado, y devuelve la caja de cada palabra """
+        words = self.cue_words(cue)
+        width, height = self.size
+        normal = Image.new('RGBA', self.size, (0, 0, 0, 0))
+        highlight = Image.new('RGBA', self.size, (0, 0, 0, 0))
+        draw_normal = ImageDraw.Draw(normal)
+        draw_highlight = ImageDraw.Draw(highlight)
+
+        lines = [words[i:i + self.words_per_line] for i in range(0, len(words), self.words_per_line)]
+        space = draw_normal.textlength(' ', font=self.font)
+        y = (height - len(lines) * self.line_step) // 2 + self.stroke_width
+
+        boxes = []
+        for line in lines:
+            line_width = sum(draw_normal.textlength(w, font=self.font) for w in line) + space * (len(line) - 1)
+            x = (width - line_width) / 2
+            for word in line:
+                for draw, fill in ((draw_normal, self.color), (draw_highlight, self.highlight_color)):
+                    draw.text((x, y), word, font=self.font, fill=fill,
+                              stroke_width=self.stroke_width, stroke_fill=self.stroke_color)
+                # Solo el relleno cambia de color; el contorno es igual en ambos rásters
+                left, top, right, bottom = draw_normal.textbbox((x, y), word, font=self.font)
+                boxes.append((max(0, int(top)), min(height, math.ceil(bottom)),
+                              max(0, int(left)), min(width, math.ceil(right))))
+                x += draw_normal.textlength(word, font=self.font) + space
+            y += self.line_step
+
+        starts = [w["start"] for w in cue.get("words", [])]
+        return np.asarray(normal), np.asarray(highlight), boxes, starts
+
+    def raster(self, index):
+        if index not in self.rasters:
+            self.rasters[index] = self.render_cue(self.cues[index])
+        return self.rasters[index]
+
+    def update(self, t):
+        """ Actualiza el buffer para el tiempo t re-dibujando solo la palabra que cambió """
+        index = bisect.bisect_right(self.starts, t) - 1
+        if index < 0 or t >= self.cues[index]["end"]:
+            if self.current_cue is not None:
+                self.current_cue = None
+                self.buffer = self.blank
+                self.mask_buffer = None
+            return self.buffer
+
+        normal, highlight, boxes, word_starts = self.raster(index)
+        if index != self.current_cue:
+            self.current_cue = index
+            self.current_word = None
+            self.buffer = normal.copy()
+            self.mask_buffer = None
+
+        word = bisect.bisect_right(word_starts, t) - 1
+        if word < 0 or word >= len(boxes):
+            word = None
+        if word != self.current_word:
+            if self.current_word is not None:
+                top, bottom, left, right = boxes[self.current_word]
+                self.buffer[top:bottom, left:right] = normal[top:bottom, left:right]
+            if word is not None:
+                top, bottom, left, right = boxes[word]
+                self.buffer[top:bottom, left:right] = highlight[top:bottom, left:right]
+            self.current_word = word
+
+        return self.buffer
+
+    def make_mask_frame(self, t):
+        buffer = self.update(t)
+        if self.mask_buffer is None:
+            self.mask_buffer = buffer[:, :, 3] / 255.0
+        return self.mask_buffer
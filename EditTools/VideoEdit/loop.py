@@ -0,0 +1,207 @@
+from moviepy import VideoFileClip
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.fx import MakeLoopable
+from pathlib import Path
+import hashlib
+import math
+import os
+import re
+import subprocess
+
+class LoopTile:
+    def __init__(self, cache_dir, output_size, fps=24, crossfade=0.5, variant=None, max_cache_bytes=2 * 2**30):
+        """
+        Cache de "tiles" de loop para fondos más cortos que la narración
+
+        El tile es el fondo ya recortado y redimensionado al tamaño de salida,
+        con el final mezclado sobre el inicio para que el corte no se note.
+        Se codifica una sola vez y luego se repite a nivel de contenedor
+        (concat demuxer de ffmpeg con -c copy), sin volver a decodificar
+        ni a redimensionar el fondo en cada vuelta.
+
+        Por tile se guarda una sola concatenación, la más larga pedida hasta
+        ahora: las duraciones menores la reutilizan recortada. El cache entero
+        se limita a max_cache_bytes borrando los archivos usados hace más tiempo.
+
+        Args:
+            cache_dir: Directorio donde se guardan los tiles
+            output_size: Tamaño (ancho, alto) del video final
+            fps: Cuadros por segundo del tile
+            crossfade: Duración en segundos del fundido entre final e inicio
+            variant: Identificador opcional del recorte aplicado al fondo (p. ej. la
+                trayectoria del recorte inteligente), para no mezclar tiles de distintos recortes
+            max_cache_bytes: Tamaño máximo del cache en bytes (None = sin límite)
+        """
+        self.cache_dir = Path(cache_dir)
+        self.output_size = tuple(output_size)
+        self.fps = fps
+        self.crossfade = crossfade
+        self.variant = variant
+        self.max_cache_bytes = max_cache_bytes
+
+    def cache_key(self, source):
+        """ Clave del tile: archivo de origen (ruta, tamaño, mtime) y parámetros de normalización """
+        source = Path(source)
+        stat = source.stat()
+        key = "|".join(str(part) for part in (
+            source.resolve(), stat.st_size, stat.st_mtime_ns,
+            self.output_size, self.fps, self.crossfade
+        ) + ((self.variant,) if self.variant else ()))
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+    def tile_path(self, source):
+        return self.cache_dir / f"{self.cache_key(source)}.mp4"
+
+    def build_tile(self, clip, source):
+        """
+        Codifica el tile normalizado si no está en cache
+
+        Args:
+            clip: Clip de fondo ya recortado y redimensionado a output_size
+            source: Ruta del video original (para la clave del cache)
+
+        Returns:
+            Path: Ruta del tile codificado
+        """
+        tile_path = self.tile_path(source)
+        if tile_path.exists():
+            print(f"[DEBUG] Usando tile de loop en cache: {tile_path}")
+            self.touch(tile_path)
+            return tile_path
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        tile = clip.without_audio()
+        if self.crossfade and tile.duration > 2 * self.crossfade:
+            tile = MakeLoopable(self.crossfade).apply(tile)
+
+        # Escribir a un archivo temporal y renombrar, por si otro proceso genera el mismo tile
+        temp_path = tile_path.with_name(f"{tile_path.stem}.{os.getpid()}.tmp.mp4")
+        print(f"[DEBUG] Generando tile de loop en: {tile_path}")
+        try:
+            tile.write_videofile(
+                str(temp_path),
+                fps=self.fps,
+                codec='libx264',
+                audio=False,
+                logger=None,
+            )
+            os.replace(temp_path, tile_path)
+        finally:
+            if temp_path.exists():
+                os.remove(temp_path)
+
+        return tile_path
+
+    def touch(self, path):
+        """ Marca el archivo como usado ahora (la expulsión LRU se guía por el mtime) """
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def concats(self, tile_path):
+        """ Concatenaciones existentes del tile: {copias: ruta} """
+        pattern = re.compile(rf"{re.escape(tile_path.stem)}_x(\d+)\.mp4")
+        found = {}
+        for path in tile_path.parent.glob(f"{tile_path.stem}_x*.mp4"):
+            match = pattern.fullmatch(path.name)
+            if match:
+                found[int(match.group(1))] = path
+        return found
+
+    def evict(self, keep=()):
+        """ Borra los archivos usados hace más tiempo hasta que el cache entre en max_cache_bytes """
+        if self.max_cache_bytes is None or not self.cache_dir.exists():
+            return
+        keep = {Path(path) for path in keep}
+        entries = []
+        for path in self.cache_dir.glob("*.mp4"):
+            if ".tmp" in path.suffixes:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_cache_bytes:
+                break
+            if path in keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+                print(f"[DEBUG] Expulsado del cache de loops: {path}")
+            except OSError:
+                pass
+
+    def concat(self, tile_path, duration):
+        """
+        Repite el tile a nivel de contenedor hasta cubrir la duración
+
+        Args:
+            tile_path: Ruta del tile codificado
+            duration: Duración total requerida en segundos
+
+        Returns:
+            Path: Ruta del video concatenado
+        """
+        tile_path = Path(tile_path)
+        with VideoFileClip(str(tile_path)) as tile:
+            tile_duration = tile.duration
+
+        copies = max(1, math.ceil(duration / tile_duration))
+        existing = self.concats(tile_path)
+        longer = [count for count in existing if count >= copies]
+        if longer:
+            # Una concatenación más larga sirve recortada (ver loop)
+            output_path = existing[min(longer)]
+            self.touch(output_path)
+            return output_path
+
+        output_path = tile_path.with_name(f"{tile_path.stem}_x{copies}.mp4")
+
+        list_path = tile_path.with_name(f"{tile_path.stem}_x{copies}.{os.getpid()}.txt")
+        temp_path = output_path.with_name(f"{output_path.stem}.{os.getpid()}.tmp.mp4")
+        try:
+            with open(list_path, 'w', encoding='utf-8') as f:
+                f.write(f"file '{tile_path.name}'\n" * copies)
+
+            cmd = [
+                FFMPEG_BINARY, "-y", "-loglevel", "error",
+                "-f", "concat", "-safe", "0",
+                "-i", str(list_path),
+                "-c", "copy",
+                str(temp_path),
+            ]
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            os.replace(temp_path, output_path)
+        finally:
+            for path in (list_path, temp_path):
+                if path.exists():
+                    os.remove(path)
+
+        # La nueva concatenación cubre a las más cortas del mismo tile
+        for path in existing.values():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.evict(keep=(tile_path, output_path))
+        return output_path
+
+    def loop(self, clip, source, duration):
+        """
+        Devuelve un clip de fondo de exactamente `duration` segundos
+
+        Args:
+            clip: Clip de fondo ya recortado y redimensionado a output_size
+            source: Ruta del video original
+            duration: Duración total requerida en segundos
+        """
+        tile_path = self.build_tile(clip, source)
+        looped_path = self.concat(tile_path, duration)
+        return VideoFileClip(str(looped_path), audio=False).with_duration(duration)
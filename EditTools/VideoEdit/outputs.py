@@ -0,0 +1,405 @@
+from moviepy.config import FFMPEG_BINARY
+from pathlib import Path
+import os
+import subprocess
+import threading
+
+# Presets por plataforma, se pueden sobreescribir con kwargs en OutputTarget.for_platform
+PLATFORM_TARGETS = {
+    "tiktok": {"size": (1080, 1920), "fps": 30, "bitrate": "6000k"},
+    "reels": {"size": (1080, 1920), "fps": 30, "bitrate": "5000k"},
+    "shorts": {"size": (1080, 1920), "fps": 30, "bitrate": "8000k"},
+    "x": {"size": (720, 1280), "fps": 30, "bitrate": "2500k"},
+}
+
+OUTPUT_MODES = ("file", "fmp4", "hls")
+
+class OutputTarget:
+    def __init__(self, path, size=(1080, 1920), fps=24, bitrate=None, codec="libx264", audio_codec="aac", audio_bitrate="192k", container=None, watermark=None, watermark_position=("right", "bottom"), preset="medium", sink=None, fragment_duration=2.0, mode="file", segment_type="fmp4"):
+        """
+        Un entregable del render: archivo de salida y sus parámetros de codificación
+
+        Args:
+            path: Ruta del archivo de salida
+            size: Resolución (ancho, alto). Si no coincide con el aspecto del
+                render se escala y se rellena con negro
+            fps: Cuadros por segundo de la salida
+            bitrate: Bitrate de video (ej. "6000k"), None para el default de ffmpeg
+            codec: Codec de video
+            audio_codec: Codec de audio
+            audio_bitrate: Bitrate de audio
+            container: Formato de ffmpeg (ej. "mp4", "mov"), None para deducirlo de la extensión
+            watermark: Ruta opcional a una imagen (PNG con alpha) a superponer
+            watermark_position: Posición de la marca de agua ("left"/"right", "top"/"bottom")
+            preset: Preset de x264
+            sink: Destino opcional (LocalFileSink, S3Sink) que recibe el video como MP4
+                fragmentado mientras se codifica, en lugar de escribirlo en `path`
+            fragment_duration: Segundos por fragmento del MP4 fragmentado (se fuerza un
+                keyframe al inicio de cada uno, así cada fragmento sale en cuanto se codifica)
+            mode: "file" (MP4 normal, se puede ver al terminar), "fmp4" (MP4 fragmentado,
+                reproducible mientras se escribe) o "hls" (`path` es el .m3u8; segmentos de
+                fragment_duration segundos y una playlist que crece durante el render)
+            segment_type: Segmentos del HLS: "fmp4" (.m4s con un init .mp4) o "mpegts" (.ts)
+        """
+        if mode not in OUTPUT_MODES:
+            raise ValueError(f"Modo de salida no soportado: {mode}. Opciones: {', '.join(OUTPUT_MODES)}")
+        if segment_type not in ("fmp4", "mpegts"):
+            raise ValueError(f"Tipo de segmento no soportado: {segment_type}. Opciones: fmp4, mpegts")
+        if mode == "hls" and sink is not None:
+            raise ValueError("El modo hls escribe varios archivos y no admite sink")
+        self.path = Path(path)
+        self.size = tuple(size)
+        self.fps = fps
+        self.bitrate = bitrate
+        self.codec = codec
+        self.audio_codec = audio_codec
+        self.audio_bitrate = audio_bitrate
+        self.container = container
+        self.watermark = watermark
+        self.watermark_position = watermark_position
+        self.preset = preset
+        self.sink = sink
+        self.fragment_duration = fragment_duration
+        self.mode = mode
+        self.segment_type = segment_type
+
+    @property
+    def location(self):
+        """ Dónde queda el entregable: la ruta o la ubicación del sink """
+        return self.sink.location if self.sink else str(self.path)
+
+    @classmethod
+    def for_platform(cls, platform, path, **overrides):
+        """ Crea un OutputTarget con los valores por defecto de una plataforma (tiktok, reels, shorts, x) """
+        if platform not in PLATFORM_TARGETS:
+            raise ValueError(f"Plataforma desconocida: {platform}. Opciones: {list(PLATFORM_TARGETS)}")
+        params = dict(PLATFORM_TARGETS[platform])
+        params.update(overrides)
+        return cls(path, **params)
+
+    def video_filter(self, label_in, label_out, watermark_input=None):
+        """ Filtro de ffmpeg que lleva el stream compuesto a la resolución y fps del target """
+        width, height = self.size
+        chain = (
+            f"[{label_in}]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,fps={self.fps}"
+        )
+        if watermark_input is None:
+            return f"{chain}[{label_out}]"
+
+        x = "20" if self.watermark_position[0] == "left" else "W-w-20"
+        y = "20" if self.watermark_position[1] == "top" else "H-h-20"
+        return (
+            f"{chain}[{label_out}_base];"
+            f"[{label_out}_base][{watermark_input}:v]overlay={x}:{y}[{label_out}]"
+        )
+
+    def output_args(self, video_label, audio_input=None, pipe_fd=None):
+        """
+        Argumentos de salida de ffmpeg para este target
+
+        Con pipe_fd la salida va a ese descriptor como MP4 fragmentado (el moov
+        vacío al inicio y un fragmento cada fragment_duration segundos), que no
+        necesita volver atrás en el archivo y se puede enviar al sink a medida
+        que sale.
+        """
+        args = ["-map", f"[{video_label}]"]
+        if audio_input is not None:
+            args += ["-map", f"{audio_input}:a", "-c:a", self.audio_codec, "-b:a", self.audio_bitrate]
+        args += ["-c:v", self.codec, "-preset", self.preset, "-pix_fmt", "yuv420p"]
+        if self.bitrate:
+            args += ["-b:v", self.bitrate]
+        if pipe_fd is not None or self.mode != "file":
+            # Keyframe forzado en cada múltiplo de fragment_duration: los fragmentos y
+            # segmentos empiezan siempre en los mismos tiempos y se decodifican solos
+            args += ["-force_key_frames", f"expr:gte(t,n_forced*{self.fragment_duration})"]
+        if self.mode == "hls":
+            return args + self.hls_args()
+        if pipe_fd is not None or self.mode == "fmp4":
+            args += [
+                "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+                "-f", self.container or "mp4",
+            ]
+            return args + [f"pipe:{pipe_fd}" if pipe_fd is not None else str(self.path)]
+        if self.container:
+            args += ["-f", self.container]
+        return args + [str(self.path)]
+
+    def hls_args(self):
+        """ Muxer hls: playlist tipo "event" (se puede abrir mientras crece) con segmentos numerados """
+        stem = self.path.stem
+        extension = "m4s" if self.segment_type == "fmp4" else "ts"
+        args = [
+            "-f", "hls",
+            "-hls_time", str(self.fragment_duration),
+            "-hls_playlist_type", "event",
+            "-hls_segment_type", self.segment_type,
+            # temp_file: la playlist se reemplaza de forma atómica y nunca se lee a medias
+            "-hls_flags", "independent_segments+temp_file",
+            "-hls_segment_filename", str(self.path.with_name(f"{stem}_%05d.{extension}")),
+        ]
+        if self.segment_type == "fmp4":
+            args += ["-hls_fmp4_init_filename", f"{stem}_init.mp4"]
+        return args + [str(self.path)]
+
+
+def hls_segments(playlist_path):
+    """
+    Segmentos de una playlist HLS escrita por OutputTarget(mode="hls")
+
+    Como cada segmento empieza en un keyframe forzado a un múltiplo fijo de
+    fragment_duration, un re-render parcial con los mismos ajustes produce
+    segmentos con los mismos límites: se pueden guardar en cache por
+    (índice, hash) y reemplazar solo los que cambian.
+
+    Returns:
+        Lista de dicts {"index", "start", "duration", "path"}
+    """
+    playlist_path = Path(playlist_path)
+    segments = []
+    start = 0.0
+    duration = None
+    with open(playlist_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:"):].split(",")[0])
+            elif line and not line.startswith("#") and duration is not None:
+                segments.append({
+                    "index": len(segments),
+                    "start": round(start, 6),
+                    "duration": duration,
+                    "path": str(playlist_path.parent / line),
+                })
+                start += duration
+                duration = None
+    return segments
+
+
+def remux_hls(playlist_path, output_path):
+    """ Une los segmentos de una playlist HLS en un MP4 sin recodificar (-c copy) """
+    output_path = Path(output_path)
+    temp_path = output_path.with_name(f"{output_path.stem}.{os.getpid()}.tmp{output_path.suffix}")
+    try:
+        cmd = [
+            FFMPEG_BINARY, "-y", "-loglevel", "error",
+            "-i", str(playlist_path),
+            "-c", "copy", "-movflags", "+faststart",
+            str(temp_path),
+        ]
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        os.replace(temp_path, output_path)
+    finally:
+        if temp_path.exists():
+            os.remove(temp_path)
+    return str(output_path)
+
+
+class MultiOutputWriter:
+    def __init__(self, targets, size, fps, audiofile=None, threads=None):
+        """
+        Escribe un único stream de cuadros compuestos a varios entregables
+
+        Abre un solo proceso de ffmpeg que recibe los cuadros por stdin y los
+        reparte con un filtro `split` a cada target, así N salidas cuestan una
+        sola composición. Los targets con sink reciben su salida por un pipe
+        propio que un hilo lee y entrega al sink mientras ffmpeg codifica.
+
+        Args:
+            targets: Lista de OutputTarget
+            size: Tamaño (ancho, alto) de los cuadros compuestos
+            fps: Cuadros por segundo del stream compuesto
+            audiofile: Ruta opcional al audio ya mezclado
+            threads: Hilos de ffmpeg para cada encoder de salida
+        """
+        if not targets:
+            raise ValueError("Se requiere al menos un OutputTarget")
+
+        self.targets = targets
+        self.size = tuple(size)
+        self.fps = fps
+        self.audiofile = audiofile
+        self.threads = threads
+        self.proc = None
+        self.pipes = {}
+        self.readers = []
+        self.reader_errors = []
+
+    def build_command(self):
+        width, height = self.size
+        cmd = [
+            FFMPEG_BINARY, "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-vcodec", "rawvideo",
+            "-s", f"{width}x{height}", "-pix_fmt", "rgb24",
+            "-r", f"{self.fps:.02f}",
+            "-i", "-",
+        ]
+
+        next_input = 1
+        audio_input = None
+        if self.audiofile:
+            cmd += ["-i", str(self.audiofile)]
+            audio_input = next_input
+            next_input += 1
+
+        watermark_inputs = {}
+        for i, target in enumerate(self.targets):
+            if target.watermark:
+                cmd += ["-i", str(target.watermark)]
+                watermark_inputs[i] = next_input
+                next_input += 1
+
+        count = len(self.targets)
+        filters = [f"[0:v]split={count}" + "".join(f"[s{i}]" for i in range(count))]
+        for i, target in enumerate(self.targets):
+            filters.append(target.video_filter(f"s{i}", f"v{i}", watermark_inputs.get(i)))
+        cmd += ["-filter_complex", ";".join(filters)]
+
+        for i, target in enumerate(self.targets):
+            # -threads es una opción de salida: cada encoder necesita la suya
+            if self.threads is not None:
+                cmd += ["-threads", str(self.threads)]
+            pipe_fd = self.pipes[i][1] if i in self.pipes else None
+            cmd += target.output_args(f"v{i}", audio_input, pipe_fd)
+
+        return cmd
+
+    def drain(self, read_fd, sink):
+        """ Hilo lector: pasa al sink todo lo que ffmpeg escribe en el pipe """
+        failed = False
+        with os.fdopen(read_fd, 'rb') as pipe:
+            for chunk in iter(lambda: pipe.read(1 << 20), b""):
+                if failed:
+                    continue  # Seguir leyendo para que ffmpeg no se bloquee
+                try:
+                    sink.write(chunk)
+                except Exception as e:
+                    self.reader_errors.append(e)
+                    failed = True
+
+    def open(self):
+        for i, target in enumerate(self.targets):
+            if target.sink:
+                target.sink.open()
+                self.pipes[i] = os.pipe()
+            else:
+                target.path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self.proc = subprocess.Popen(
+                self.build_command(),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                pass_fds=[write_fd for _, write_fd in self.pipes.values()],
+            )
+        finally:
+            # El extremo de escritura solo queda abierto en ffmpeg, así el lector ve EOF al terminar
+            for _, write_fd in self.pipes.values():
+                os.close(write_fd)
+        for i, (read_fd, _) in self.pipes.items():
+            reader = threading.Thread(target=self.drain, args=(read_fd, self.targets[i].sink), daemon=True)
+            reader.start()
+            self.readers.append(reader)
+        return self
+
+    def finish_sinks(self, ok):
+        """ Espera a los lectores y cierra los sinks (o los aborta si el render falló) """
+        for reader in self.readers:
+            reader.join()
+        self.readers = []
+        ok = ok and not self.reader_errors
+        for i in self.pipes:
+            sink = self.targets[i].sink
+            if ok:
+                try:
+                    sink.close()
+                except Exception as e:
+                    self.reader_errors.append(e)
+                    ok = False
+            else:
+                sink.abort()
+        self.pipes = {}
+        if self.reader_errors:
+            raise IOError(f"Error en el envío al sink: {self.reader_errors[0]}")
+
+    def write_frame(self, frame):
+        try:
+            self.proc.stdin.write(frame.tobytes())
+        except IOError:
+            error = self.proc.stderr.read().decode(errors="ignore")
+            raise IOError(f"ffmpeg falló escribiendo las salidas: {error}")
+
+    def close(self):
+        if self.proc is None:
+            return
+        self.proc.stdin.close()
+        error = self.proc.stderr.read().decode(errors="ignore")
+        self.proc.stderr.close()
+        returncode = self.proc.wait()
+        self.proc = None
+        self.finish_sinks(returncode == 0)
+        if returncode != 0:
+            raise IOError(f"ffmpeg terminó con código {returncode}: {error}")
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None and self.proc is not None:
+            self.proc.kill()
+            self.proc.wait()
+            self.proc = None
+            try:
+                self.finish_sinks(False)
+            except IOError:
+                pass  # Se propaga la excepción original
+            return False
+        self.close()
+        return False
+
+
+def write_outputs(clip, targets, fps=None, threads=None, temp_dir=None, logger="bar", previews=None):
+    """
+    Compone `clip` una sola vez y lo escribe en todos los targets
+
+    Args:
+        clip: Clip final (video compuesto con audio)
+        targets: Lista de OutputTarget
+        fps: Cuadros por segundo de la composición (default: el mayor de los targets)
+        threads: Hilos para ffmpeg
+        temp_dir: Directorio para el audio temporal (default: el del primer target)
+        logger: Logger de proglog para la barra de progreso
+        previews: Lista opcional de PreviewTap que reciben los cuadros compuestos mientras
+            se codifican (miniaturas y hoja de contactos sin volver a decodificar)
+
+    Returns:
+        list: Rutas de los archivos escritos (o ubicaciones de los sinks)
+    """
+    fps = fps or max(target.fps for target in targets)
+    temp_dir = Path(temp_dir) if temp_dir else targets[0].path.parent
+    temp_dir.mkdir(parents=True, exist_ok=True)
+
+    audiofile = None
+    if clip.audio is not None:
+        # El audio se mezcla una sola vez a PCM y cada target lo codifica con su codec
+        audiofile = temp_dir / f"{targets[0].path.stem}TEMP_MPY_multi_snd.wav"
+        clip.audio.write_audiofile(str(audiofile), fps=44100, nbytes=2, codec="pcm_s16le", logger=logger)
+
+    previews = previews or []
+    for preview in previews:
+        preview.start(targets[0].path, clip.size, clip.duration, fps)
+
+    try:
+        print(f"[DEBUG] Escribiendo {len(targets)} salidas desde una sola composición")
+        with MultiOutputWriter(targets, clip.size, fps, audiofile=audiofile, threads=threads) as writer:
+            for index, frame in enumerate(clip.iter_frames(fps=fps, dtype="uint8", logger=logger)):
+                writer.write_frame(frame)
+                for preview in previews:
+                    preview.write_frame(index, frame)
+        for preview in previews:
+            preview.close()
+    finally:
+        if audiofile is not None and os.path.exists(audiofile):
+            os.remove(audiofile)
+
+    return [target.location for target in targets]
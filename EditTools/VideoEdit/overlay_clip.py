@@ -0,0 +1,149 @@
+from moviepy import VideoClip
+from PIL import Image
+import numpy as np
+import math
+
+TRANSITIONS = ("none", "fade", "slide", "pop")
+
+
+def ease(progress):
+    """ Curva suave (smoothstep) de 0 a 1 """
+    return progress * progress * (3 - 2 * progress)
+
+
+def ease_back(progress, overshoot=1.70158):
+    """ Curva que se pasa un poco de 1 antes de asentarse (el rebote del "pop") """
+    p = progress - 1
+    return 1 + p * p * ((overshoot + 1) * p + overshoot)
+
+
+class OverlayClip(VideoClip):
+    def __init__(self, overlay, position, duration, fps=24, transition="fade", transition_duration=0.5, slide_distance=150, scale_step=0.02, raster=None):
+        """
+        Overlay (tarjeta de título) con transición de entrada y salida
+
+        Las transiciones no usan efectos de moviepy: al crear el clip se
+        precalcula una tabla por cuadro con la opacidad, el desplazamiento y
+        la escala, y en cada cuadro solo se mezcla la caja del overlay sobre
+        el fondo con un alfa escalar, partiendo de un único raster en alfa
+        premultiplicado. Las versiones escaladas del "pop" se guardan en cache
+        por escala (cuantizada a scale_step), así que una tarjeta animada
+        cuesta casi lo mismo que una estática, y menos que el ImageClip de
+        moviepy, que compone un lienzo del tamaño del cuadro.
+
+        Args:
+            overlay: Arreglo (alto, ancho, 4) uint8 RGBA premultiplicado (ver ImageEdit.edit.card_overlay)
+            position: Esquina superior izquierda (x, y) del overlay a escala 1, en pixeles
+            duration: Duración en segundos
+            fps: Cuadros por segundo de las tablas
+            transition: "none", "fade", "slide" (entra desde abajo) o "pop" (crece con rebote)
+            transition_duration: Duración en segundos de la entrada y de la salida
+            slide_distance: Recorrido en pixeles del "slide"
+            scale_step: Paso de cuantización de la escala del "pop"
+            raster: El mismo overlay ya convertido a RGBA normal (imagen PIL), si está en
+                cache (ver ImageEdit.edit.card_raster); evita convertirlo en cada render
+        """
+        if transition not in TRANSITIONS:
+            raise ValueError(f"Transición no soportada: {transition}. Opciones: {', '.join(TRANSITIONS)}")
+
+        VideoClip.__init__(self, has_constant_size=False)
+        self.overlay = overlay
+        self.origin = tuple(int(v) for v in position)
+        self.duration = duration
+        self.end = duration
+        self.table_fps = fps
+        self.size = (overlay.shape[1], overlay.shape[0])
+        self.rasters = {} if raster is None else {1.0: raster}
+        self.build_tables(transition, transition_duration, slide_distance, scale_step)
+
+        def frame_function(t):
+            return np.asarray(self.raster(self.scales[self.frame_index(t)]))[..., :3]
+
+        def make_mask_frame(t):
+            index = self.frame_index(t)
+            return np.asarray(self.raster(self.scales[index]))[..., 3] * (self.levels[index] / 65025.0)
+
+        self.frame_function = frame_function
+        self.mask = VideoClip(make_mask_frame, is_mask=True, has_constant_size=False)
+        self.mask.duration = self.duration
+        self.mask.end = self.duration
+        self.pos = self.position_at
+        self.mask.pos = self.position_at
+
+    def build_tables(self, transition, transition_duration, slide_distance, scale_step):
+        """ Tablas por cuadro de opacidad, desplazamiento vertical y escala """
+        count = int(math.ceil(self.duration * self.table_fps)) + 1
+        times = np.arange(count) / self.table_fps
+        if transition == "none" or transition_duration <= 0:
+            progress = np.ones(count)
+        else:
+            # Entrada desde t=0 y salida hacia el final, lo que ocurra primero
+            progress = np.clip(np.minimum(times, self.duration - times) / transition_duration, 0, 1)
+
+        self.alphas = np.ones(count) if transition == "none" else ease(progress)
+        self.offsets = np.zeros(count, dtype=int)
+        scales = np.ones(count)
+        if transition == "slide":
+            self.offsets = np.round((1 - ease(progress)) * slide_distance).astype(int)
+        elif transition == "pop":
+            scales = np.maximum(scale_step, ease_back(progress))
+            self.alphas = np.clip(progress * 2, 0, 1)
+        self.scales = [round(round(s / scale_step) * scale_step, 4) for s in scales]
+        # Opacidad como nivel 0-255, para escalar el canal alfa con una tabla de consulta
+        self.levels = np.round(self.alphas * 255).astype(int)
+
+    def frame_index(self, t):
+        return min(len(self.alphas) - 1, max(0, int(round(t * self.table_fps))))
+
+    def raster(self, scale):
+        """ Overlay RGBA a la escala dada, en cache. Se escala en alfa premultiplicado """
+        if scale not in self.rasters:
+            image = Image.fromarray(self.overlay, 'RGBa')
+            if scale != 1.0:
+                width = max(1, int(round(self.size[0] * scale)))
+                height = max(1, int(round(self.size[1] * scale)))
+                image = image.resize((width, height), Image.BILINEAR)
+            self.rasters[scale] = image.convert('RGBA')
+        return self.rasters[scale]
+
+    def position_at(self, t):
+        """ Esquina superior izquierda en t, manteniendo el centro del overlay al escalar """
+        index = self.frame_index(t)
+        raster = self.raster(self.scales[index])
+        x = self.origin[0] + (self.size[0] - raster.width) // 2
+        y = self.origin[1] + (self.size[1] - raster.height) // 2 + self.offsets[index]
+        return (int(x), int(y))
+
+    def compose_on(self, background, t):
+        """
+        Mezcla el overlay sobre `background` (imagen PIL) solo dentro de su caja
+
+        Reemplaza la composición de moviepy, que pega el clip en un lienzo
+        transparente del tamaño del cuadro y compone el cuadro completo.
+        """
+        ct = t - self.start
+        index = self.frame_index(ct)
+        level = self.levels[index]
+        if level <= 0:
+            return background
+
+        raster = self.raster(self.scales[index])
+        x, y = self.position_at(ct)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1 = min(x + raster.width, background.width)
+        y1 = min(y + raster.height, background.height)
+        if x1 <= x0 or y1 <= y0:
+            return background
+
+        if (x0, y0, x1, y1) != (x, y, x + raster.width, y + raster.height):
+            raster = raster.crop((x0 - x, y0 - y, x1 - x, y1 - y))
+        if level < 255:
+            alpha = raster.getchannel('A').point([v * level // 255 for v in range(256)])
+            raster = raster.copy()
+            raster.putalpha(alpha)
+
+        if background.mode == 'RGBA':
+            background.alpha_composite(raster, dest=(x0, y0))
+        else:
+            background.paste(raster, (x0, y0), mask=raster)
+        return background
@@ -0,0 +1,115 @@
+from PIL import Image
+from pathlib import Path
+
+FORMATS = {
+    "jpg": {"format": "JPEG", "quality": 90},
+    "png": {"format": "PNG", "compress_level": 1},
+    "webp": {"format": "WEBP", "quality": 90},
+}
+
+class PreviewTap:
+    def __init__(self, output_dir=None, times=(), columns=4, rows=4, cell_width=270, thumbnail_width=None, format="jpg"):
+        """
+        Miniaturas y hoja de contactos tomadas del stream de cuadros mientras se codifica
+
+        En lugar de decodificar el video terminado otra vez, write_outputs le
+        pasa cada cuadro compuesto y solo se procesan los cuadros planificados:
+        uno por cada tiempo de `times` (miniaturas) y columns x rows repartidos
+        a lo largo del video, reducidos a cell_width y pegados en una grilla.
+
+        Args:
+            output_dir: Carpeta de las imágenes (default: la del video)
+            times: Segundos de las miniaturas, p. ej. (0.5, 3, 10)
+            columns: Columnas de la hoja de contactos (0 = sin hoja)
+            rows: Filas de la hoja de contactos
+            cell_width: Ancho en pixeles de cada cuadro de la hoja
+            thumbnail_width: Ancho de las miniaturas (default: el del video)
+            format: "jpg", "png" o "webp"
+        """
+        if format not in FORMATS:
+            raise ValueError(f"Formato no soportado: {format}. Opciones: {', '.join(FORMATS)}")
+        self.output_dir = Path(output_dir) if output_dir else None
+        self.times = sorted(float(t) for t in times)
+        self.columns = columns
+        self.rows = rows
+        self.cell_width = cell_width
+        self.thumbnail_width = thumbnail_width
+        self.format = format
+        self.plan = {}
+        self.sheet = None
+        self.paths = []
+
+    def params(self):
+        """ Ajustes que cambian las imágenes (para la clave de la etapa de render) """
+        return {
+            "times": self.times,
+            "columns": self.columns,
+            "rows": self.rows,
+            "cell_width": self.cell_width,
+            "thumbnail_width": self.thumbnail_width,
+            "format": self.format,
+        }
+
+    def start(self, video_path, size, duration, fps):
+        """
+        Planifica qué cuadro produce cada imagen, antes de empezar el stream
+
+        Args:
+            video_path: Ruta del video (nombra las imágenes y da la carpeta por defecto)
+            size: Tamaño (ancho, alto) de los cuadros
+            duration: Duración del stream en segundos
+            fps: Cuadros por segundo del stream
+        """
+        video_path = Path(video_path)
+        self.directory = self.output_dir or video_path.parent
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.stem = video_path.stem
+        self.paths = []
+        self.plan = {}
+        last = max(0, int(round(duration * fps)) - 1)
+
+        for t in self.times:
+            self.plan.setdefault(min(last, int(round(t * fps))), []).append(("thumbnail", t))
+
+        cells = self.columns * self.rows
+        if cells:
+            width, height = size
+            self.cell_size = (self.cell_width, max(1, int(round(height * self.cell_width / width))))
+            self.sheet = Image.new("RGB", (self.cell_size[0] * self.columns, self.cell_size[1] * self.rows))
+            for cell in range(cells):
+                # Centro de cada tramo, así la hoja no empieza en el cuadro negro inicial
+                t = (cell + 0.5) * duration / cells
+                self.plan.setdefault(min(last, int(t * fps)), []).append(("cell", cell))
+        return self
+
+    def write_frame(self, index, frame):
+        """ Procesa el cuadro número `index` del stream si alguna imagen lo usa """
+        actions = self.plan.get(index)
+        if not actions:
+            return
+        image = Image.fromarray(frame)
+        for kind, value in actions:
+            if kind == "thumbnail":
+                thumbnail = image
+                if self.thumbnail_width:
+                    height = max(1, int(round(image.height * self.thumbnail_width / image.width)))
+                    thumbnail = image.resize((self.thumbnail_width, height), Image.LANCZOS)
+                path = self.directory / f"{self.stem}_t{value:.2f}.{self.format}"
+                thumbnail.save(path, **FORMATS[self.format])
+                self.paths.append(str(path))
+            else:
+                row, column = divmod(value, self.columns)
+                cell = image.reduce(max(1, image.width // self.cell_size[0]))
+                if cell.size != self.cell_size:
+                    cell = cell.resize(self.cell_size, Image.BILINEAR)
+                self.sheet.paste(cell, (column * self.cell_size[0], row * self.cell_size[1]))
+
+    def close(self):
+        """ Guarda la hoja de contactos. Devuelve las rutas de todas las imágenes """
+        if self.sheet is not None:
+            path = self.directory / f"{self.stem}_sheet.{self.format}"
+            self.sheet.save(path, **FORMATS[self.format])
+            self.paths.append(str(path))
+            self.sheet = None
+        print(f"[DEBUG] {len(self.paths)} imágenes de vista previa en: {self.directory}")
+        return self.paths
@@ -0,0 +1,239 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+import hashlib
+import os
+import threading
+
+MIN_PART_SIZE = 5 * 2**20  # Mínimo de S3 para todas las partes salvo la última
+
+
+class LocalFileSink:
+    def __init__(self, path):
+        """
+        Destino que escribe el stream en un archivo local a medida que llega
+
+        Se escribe a un temporal y se renombra al cerrar, así un render
+        fallido no deja un archivo a medias con el nombre final.
+
+        Args:
+            path: Ruta del archivo final
+        """
+        self.path = Path(path)
+        self.file = None
+        self.temp_path = None
+        self.bytes_written = 0
+
+    @property
+    def location(self):
+        return str(self.path)
+
+    def open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.temp_path = self.path.with_name(f"{self.path.stem}.{os.getpid()}.tmp{self.path.suffix}")
+        self.file = open(self.temp_path, 'wb')
+        self.bytes_written = 0
+        return self
+
+    def write(self, data):
+        self.file.write(data)
+        self.bytes_written += len(data)
+
+    def close(self):
+        """ Cierra y publica el archivo. Devuelve su ubicación """
+        self.file.close()
+        self.file = None
+        os.replace(self.temp_path, self.path)
+        return self.location
+
+    def abort(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.temp_path is not None and self.temp_path.exists():
+            os.remove(self.temp_path)
+
+
+class S3Sink:
+    def __init__(self, bucket, key, endpoint_url=None, part_size=8 * 2**20, max_concurrency=4, client=None, content_type="video/mp4", **client_kwargs):
+        """
+        Destino que sube el stream a un almacenamiento compatible con S3 mientras se codifica
+
+        Los bytes se acumulan hasta part_size y cada parte se sube con
+        multipart upload en un pool de hilos mientras ffmpeg sigue
+        codificando; al terminar solo falta la última parte y completar la
+        subida. Si el render falla, la subida se aborta.
+
+        Args:
+            bucket: Bucket de destino
+            key: Clave del objeto
+            endpoint_url: Endpoint compatible con S3 (MinIO, R2, etc.; default: AWS)
+            part_size: Tamaño de cada parte en bytes (mínimo 5 MiB)
+            max_concurrency: Partes subiéndose a la vez como máximo
+            client: Cliente con la API de boto3 (create_multipart_upload, upload_part,
+                complete_multipart_upload, abort_multipart_upload), p. ej. LocalObjectStore
+                para pruebas sin red (default: boto3.client("s3"))
+            content_type: Content-Type del objeto
+            **client_kwargs: Argumentos extra de boto3.client (credenciales, región)
+        """
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size debe ser al menos {MIN_PART_SIZE} bytes")
+        self.bucket = bucket
+        self.key = key
+        self.endpoint_url = endpoint_url
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+        self.client = client
+        self.content_type = content_type
+        self.client_kwargs = client_kwargs
+        self.upload_id = None
+        self.bytes_written = 0
+
+    @property
+    def location(self):
+        return f"s3://{self.bucket}/{self.key}"
+
+    def open(self):
+        if self.client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise ImportError("S3Sink requiere boto3: pip install boto3")
+            self.client = boto3.client("s3", endpoint_url=self.endpoint_url, **self.client_kwargs)
+
+        response = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key, ContentType=self.content_type)
+        self.upload_id = response["UploadId"]
+        self.buffer = bytearray()
+        self.parts = []
+        self.pending = set()
+        self.bytes_written = 0
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        return self
+
+    def upload_part(self, number, data):
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            PartNumber=number, Body=data
+        )
+        return {"PartNumber": number, "ETag": response["ETag"]}
+
+    def submit(self, data):
+        # Como mucho max_concurrency partes en memoria esperando subida
+        while len(self.pending) >= self.max_concurrency:
+            done, self.pending = wait(self.pending, return_when=FIRST_COMPLETED)
+            self.parts.extend(future.result() for future in done)
+        number = len(self.parts) + len(self.pending) + 1
+        self.pending.add(self.executor.submit(self.upload_part, number, bytes(data)))
+
+    def write(self, data):
+        self.buffer += data
+        self.bytes_written += len(data)
+        while len(self.buffer) >= self.part_size:
+            self.submit(self.buffer[:self.part_size])
+            del self.buffer[:self.part_size]
+
+    def close(self):
+        """ Sube la última parte y completa la subida. Devuelve la ubicación del objeto """
+        try:
+            if self.buffer or not (self.parts or self.pending):
+                self.submit(self.buffer)
+            self.buffer = bytearray()
+            done, _ = wait(self.pending)
+            self.parts.extend(future.result() for future in done)
+            self.pending = set()
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                MultipartUpload={"Parts": sorted(self.parts, key=lambda part: part["PartNumber"])}
+            )
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self.executor.shutdown(wait=True)
+        print(f"[DEBUG] Subida completa: {self.location} ({len(self.parts)} partes, {self.bytes_written / 2**20:.1f} MB)")
+        return self.location
+
+    def abort(self):
+        if self.upload_id is None:
+            return
+        for future in self.pending:
+            future.cancel()
+        self.executor.shutdown(wait=True)
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        except Exception as e:
+            print(f"Error abortando la subida {self.location}: {str(e)}")
+        self.upload_id = None
+
+
+class LocalObjectStore:
+    def __init__(self, root):
+        """
+        Almacenamiento de objetos local con la parte de la API de S3 que usa S3Sink
+
+        Sustituto sin red (como un MinIO) para pruebas y benchmarks: cada parte
+        se guarda como archivo y al completar se concatenan en <root>/<bucket>/<key>.
+        Aplica las mismas reglas que S3: partes de al menos 5 MiB salvo la
+        última y ETags que deben coincidir al completar.
+
+        Args:
+            root: Carpeta raíz de los buckets
+        """
+        self.root = Path(root)
+        self.lock = threading.Lock()
+        self.uploads = {}
+        self.calls = []
+
+    def object_path(self, bucket, key):
+        return self.root / bucket / key
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        with self.lock:
+            upload_id = hashlib.sha1(f"{Bucket}/{Key}/{len(self.calls)}/{os.getpid()}".encode("utf-8")).hexdigest()
+            self.uploads[upload_id] = self.root / ".uploads" / upload_id
+            self.calls.append(("create_multipart_upload", Key))
+        self.uploads[upload_id].mkdir(parents=True, exist_ok=True)
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        data = bytes(Body)
+        (self.uploads[UploadId] / f"{PartNumber:05d}").write_bytes(data)
+        with self.lock:
+            self.calls.append(("upload_part", PartNumber, len(data)))
+        return {"ETag": hashlib.md5(data).hexdigest()}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = MultipartUpload["Parts"]
+        upload_dir = self.uploads.pop(UploadId)
+        for i, part in enumerate(parts):
+            data = (upload_dir / f"{part['PartNumber']:05d}").read_bytes()
+            if hashlib.md5(data).hexdigest() != part["ETag"]:
+                raise ValueError(f"ETag no coincide en la parte {part['PartNumber']}")
+            if i < len(parts) - 1 and len(data) < MIN_PART_SIZE:
+                raise ValueError(f"La parte {part['PartNumber']} es menor que 5 MiB")
+
+        path = self.object_path(Bucket, Key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as f:
+            for part in parts:
+                part_path = upload_dir / f"{part['PartNumber']:05d}"
+                f.write(part_path.read_bytes())
+                os.remove(part_path)
+        upload_dir.rmdir()
+        with self.lock:
+            self.calls.append(("complete_multipart_upload", Key, len(parts)))
+        return {"Location": str(path), "Bucket": Bucket, "Key": Key}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        upload_dir = self.uploads.pop(UploadId, None)
+        if upload_dir is not None and upload_dir.exists():
+            for part_path in upload_dir.iterdir():
+                os.remove(part_path)
+            upload_dir.rmdir()
+        with self.lock:
+            self.calls.append(("abort_multipart_upload", Key))
+        return {}
+
+    def summary(self):
+        """ Llamadas recibidas, para verificar las subidas en pruebas """
+        with self.lock:
+            return list(self.calls)
@@ -0,0 +1,195 @@
+from pathlib import Path
+import numpy as np
+import hashlib
+import json
+import os
+import subprocess
+
+class CropTrack:
+    def __init__(self, cache_dir, aspect=0.5625, sample_fps=4, analysis_width=160, motion_weight=2.0, center_bias=0.15, smoothing=1.0, max_speed=0.25):
+        """
+        Trayectoria precalculada del centro de recorte horizontal para fondos apaisados
+
+        En lugar de recortar siempre el centro del video, un análisis previo
+        decodifica cuadros a baja resolución en escala de grises, mide la
+        energía de movimiento (diferencia entre cuadros) y de bordes (gradiente)
+        por columna, y elige en cada muestra la ventana 9:16 con más energía.
+        La trayectoria se suaviza y se limita en velocidad para que la cámara
+        no salte, y se guarda en cache junto al fondo. Al renderizar solo se
+        interpola el centro y se recorta el cuadro, el mismo costo que un
+        recorte fijo.
+
+        Args:
+            cache_dir: Directorio donde se guardan las trayectorias
+            aspect: Relación ancho/alto del recorte (default: 9:16)
+            sample_fps: Cuadros por segundo analizados
+            analysis_width: Ancho en pixeles de los cuadros analizados
+            motion_weight: Peso del movimiento frente a los bordes
+            center_bias: Preferencia por el centro cuando la energía es pareja (0 = ninguna)
+            smoothing: Sigma en segundos del suavizado gaussiano de la trayectoria
+            max_speed: Desplazamiento máximo del centro, en anchos del video por segundo
+        """
+        self.cache_dir = Path(cache_dir)
+        self.aspect = aspect
+        self.sample_fps = sample_fps
+        self.analysis_width = analysis_width
+        self.motion_weight = motion_weight
+        self.center_bias = center_bias
+        self.smoothing = smoothing
+        self.max_speed = max_speed
+        self.times = None
+        self.centers = None
+
+    def cache_key(self, source):
+        """ Clave de la trayectoria: archivo de origen (ruta, tamaño, mtime) y parámetros del análisis """
+        source = Path(source)
+        stat = source.stat()
+        key = "|".join(str(part) for part in (
+            source.resolve(), stat.st_size, stat.st_mtime_ns,
+            self.aspect, self.sample_fps, self.analysis_width,
+            self.motion_weight, self.center_bias, self.smoothing, self.max_speed
+        ))
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+    def track_path(self, source):
+        return self.cache_dir / f"{self.cache_key(source)}.json"
+
+    def read_frames(self, source, size):
+        """ Cuadros muestreados a baja resolución en escala de grises, arreglo (n, alto, ancho) float32 """
+        from moviepy.config import FFMPEG_BINARY
+
+        width = self.analysis_width
+        height = max(2, int(round(width * size[1] / size[0] / 2)) * 2)
+        cmd = [
+            FFMPEG_BINARY, "-loglevel", "error",
+            "-i", str(source), "-an",
+            "-vf", f"fps={self.sample_fps},scale={width}:{height}:flags=area,format=gray",
+            "-f", "rawvideo", "-",
+        ]
+        raw = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout
+        frames = np.frombuffer(raw, dtype=np.uint8)
+        return frames[:len(frames) // (width * height) * width * height].reshape(-1, height, width).astype(np.float32)
+
+    def analyze_frames(self, frames, crop_fraction):
+        """
+        Centro del recorte en cada cuadro, como fracción del ancho (0-1)
+
+        Args:
+            frames: Arreglo (n, alto, ancho) de cuadros en escala de grises
+            crop_fraction: Ancho del recorte como fracción del ancho del video
+        """
+        count, _, width = frames.shape
+        window = min(width, max(1, int(round(crop_fraction * width))))
+
+        # Energía por columna: bordes de cada cuadro más movimiento respecto al anterior
+        edges = np.zeros(frames.shape[::2], dtype=np.float32)
+        edges[:, 1:] = np.abs(np.diff(frames, axis=2)).sum(axis=1)
+        edges[:, 1:] += np.abs(np.diff(frames, axis=1)).sum(axis=1)[:, 1:]
+        motion = np.zeros_like(edges)
+        if count > 1:
+            motion[1:] = np.abs(np.diff(frames, axis=0)).sum(axis=1)
+            motion[0] = motion[1]
+        # Normalizar cada término por cuadro para que ninguno domine por escala
+        energy = edges / (edges.mean(axis=1, keepdims=True) + 1e-6)
+        energy += self.motion_weight * motion / (motion.mean(axis=1, keepdims=True) + 1e-6)
+
+        # Suma de la energía en cada ventana posible (sumas acumuladas)
+        cumulative = np.concatenate([np.zeros((count, 1), np.float32), np.cumsum(energy, axis=1)], axis=1)
+        scores = cumulative[:, window:] - cumulative[:, :-window]
+        scores /= scores.mean(axis=1, keepdims=True) + 1e-6
+        centers = (np.arange(scores.shape[1]) + window / 2) / width
+        scores -= self.center_bias * np.abs(centers - 0.5) / 0.5
+        return centers[np.argmax(scores, axis=1)]
+
+    def smooth(self, centers, crop_fraction):
+        """ Suavizado gaussiano y límite de velocidad de la trayectoria, dentro de los bordes del video """
+        centers = np.asarray(centers, dtype=np.float64)
+        sigma = self.smoothing * self.sample_fps
+        if sigma > 0 and len(centers) > 1:
+            radius = int(3 * sigma)
+            kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+            padded = np.pad(centers, radius, mode="edge")
+            centers = np.convolve(padded, kernel / kernel.sum(), mode="valid")
+
+        step = self.max_speed / self.sample_fps
+        if step > 0:
+            for i in range(1, len(centers)):
+                centers[i] = np.clip(centers[i], centers[i - 1] - step, centers[i - 1] + step)
+
+        half = crop_fraction / 2
+        return np.clip(centers, half, 1 - half)
+
+    def analyze(self, source, size):
+        """
+        Calcula la trayectoria de `source` y la guarda en cache (escritura atómica)
+
+        Args:
+            source: Ruta del video de fondo
+            size: Tamaño (ancho, alto) del video
+
+        Returns:
+            Path: Ruta de la trayectoria en cache
+        """
+        track_path = self.track_path(source)
+        if track_path.exists():
+            print(f"[DEBUG] Usando trayectoria de recorte en cache: {track_path}")
+            return track_path
+
+        crop_fraction = min(1.0, self.aspect * size[1] / size[0])
+        print(f"[DEBUG] Analizando fondo para el recorte inteligente: {source}")
+        frames = self.read_frames(source, size)
+        if len(frames):
+            centers = self.smooth(self.analyze_frames(frames, crop_fraction), crop_fraction)
+        else:
+            centers = np.array([0.5])
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = track_path.with_name(f"{track_path.stem}.{os.getpid()}.tmp.json")
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "size": list(size),
+                    "sample_fps": self.sample_fps,
+                    "centers": [round(float(c), 5) for c in centers],
+                }, f)
+            os.replace(temp_path, track_path)
+        finally:
+            if temp_path.exists():
+                os.remove(temp_path)
+        return track_path
+
+    def load(self, source, size):
+        """ Carga la trayectoria de `source`, analizándolo antes si no está en cache """
+        with open(self.analyze(source, size), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.centers = np.asarray(data["centers"], dtype=np.float64)
+        # Cada muestra representa el centro de su intervalo de 1/sample_fps
+        self.times = (np.arange(len(self.centers)) + 0.5) / data["sample_fps"]
+        return self
+
+    def center_at(self, t):
+        """ Centro del recorte en el tiempo t, como fracción del ancho """
+        return float(np.interp(t, self.times, self.centers))
+
+    def apply(self, clip, source):
+        """
+        Recorta el clip a la relación de aspecto siguiendo la trayectoria
+
+        Args:
+            clip: Clip de fondo apaisado (más ancho que el recorte)
+            source: Ruta del video original (para la clave del cache)
+
+        Returns:
+            Clip recortado a (round(aspect * alto), alto)
+        """
+        if self.centers is None:
+            self.load(source, clip.size)
+        width = min(clip.w, round(self.aspect * clip.h))
+        max_x = clip.w - width
+
+        def crop_frame(get_frame, t):
+            x = int(round(self.center_at(t) * clip.w - width / 2))
+            x = min(max(x, 0), max_x)
+            return get_frame(t)[:, x:x + width]
+
+        return clip.transform(crop_frame, apply_to=["mask"])
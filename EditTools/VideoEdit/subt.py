@@ -1,9 +1,19 @@
-from openai import OpenAI
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from .audio_cache import AudioCache
+from .cues import CueList
+from ..GenAPI.providers import get_provider
+from ..GenAPI.metrics import registry
+import numpy as np
 import json
+import os
+import wave
+
+# Límite de subida de la API de transcripción
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
 
 class Subt:
-    def __init__(self, api_key, Final_screen=False, Text_final=None):
+    def __init__(self, api_key, Final_screen=False, Text_final=None, base_url=None, provider=None, metrics=None, audio_cache_dir=None):
         """
         Inicializa el generador de subtítulos
         
@@ -11,193 +21,296 @@ class Subt:
             api_key: OpenAI API key
             Final_screen: Si True, agrega un texto final
             Text_final: Texto a mostrar en la pantalla final
+            base_url: URL opcional de un servidor compatible con la API de OpenAI
+            provider: Backend de transcripción (default: get_provider(), OpenAI salvo
+                que EDITTOOLS_PROVIDER indique otro)
+            metrics: Registro CallMetrics de las llamadas a Whisper (default: el compartido)
+            audio_cache_dir: Directorio del cache de audio decodificado que usa la
+                transcripción fragmentada (default: el de AudioCache)
         """
         self.api_key = api_key
         self.Final_screen = Final_screen
         self.Text_final = Text_final
+        self.base_url = base_url
+        self.provider = provider or get_provider(API_KEY=api_key, base_url=base_url)
+        self.metrics = metrics or registry
+        self.audio_cache_dir = audio_cache_dir
+
+    def transcribe(self, audio_path):
+        """
+        Transcribe un archivo con Whisper y devuelve la respuesta como diccionario
+        
+        Args:
+            audio_path: Ruta al archivo de audio
+            
+        Returns:
+            dict: Respuesta verbose_json con la lista 'words'
+        """
+        client = self.provider.client()
+        with self.metrics.call("transcribe", "whisper-1", self.provider) as call:
+            with open(audio_path, "rb") as audio_file:
+                transcription = client.audio.transcriptions.create(
+                    file=audio_file,
+                    model="whisper-1",
+                    response_format="verbose_json",
+                    timestamp_granularities=["word"]
+                )
+            if hasattr(transcription, 'model_dump'):
+                transcription = transcription.model_dump()
+            call.transcription(os.path.getsize(audio_path), transcription)
+        return transcription
+
+    def split_at_silence(self, samples, fps, chunk_seconds=120, search_seconds=5.0):
+        """
+        Calcula puntos de corte en silencios cerca de cada múltiplo de chunk_seconds
+        
+        Args:
+            samples: Arreglo de muestras (frames, canales)
+            fps: Frecuencia de muestreo
+            chunk_seconds: Duración objetivo de cada fragmento
+            search_seconds: Ventana antes del objetivo donde se busca el silencio
+            
+        Returns:
+            list: Pares (inicio, fin) en muestras
+        """
+        mono = np.asarray(samples, dtype=np.float32).mean(axis=1)
+        hop = max(1, fps // 100)  # energía en ventanas de 10 ms
+        frames = len(mono) // hop
+        energy = (mono[:frames * hop].reshape(frames, hop) ** 2).mean(axis=1)
+
+        chunk_len = int(chunk_seconds * fps)
+        search = int(min(search_seconds, chunk_seconds / 4) * fps)
+        bounds = []
+        start = 0
+        while len(mono) - start > chunk_len:
+            target = start + chunk_len
+            lo, hi = (target - search) // hop, target // hop
+            cut = (lo + int(np.argmin(energy[lo:hi]))) * hop if hi > lo else target
+            bounds.append((start, cut))
+            start = cut
+        bounds.append((start, len(mono)))
+        return bounds
+
+    def transcribe_chunked(self, audio_path, chunk_seconds=120, workers=4, sample_rate=16000):
+        """
+        Transcribe audio largo en fragmentos cortados en silencios, en paralelo
+        
+        Cada fragmento se sube como WAV mono de 16 kHz; los tiempos de sus
+        palabras se desplazan por el inicio del fragmento y se unen en una sola
+        lista, lista para group_words.
+        
+        Args:
+            audio_path: Ruta al archivo de audio
+            chunk_seconds: Duración objetivo de cada fragmento
+            workers: Solicitudes concurrentes
+            sample_rate: Frecuencia de muestreo de los fragmentos
+            
+        Returns:
+            dict: {'text', 'duration', 'words'} con tiempos absolutos
+        """
+        audio_path = Path(audio_path)
+        samples = AudioCache(self.audio_cache_dir, fps=sample_rate, nchannels=1).load(audio_path)
+        bounds = self.split_at_silence(samples, sample_rate, chunk_seconds=chunk_seconds)
+        print(f"[DEBUG] Transcribiendo {len(bounds)} fragmentos en paralelo")
+
+        chunk_paths = []
+        try:
+            for i, (start, end) in enumerate(bounds):
+                chunk_path = audio_path.with_name(f"{audio_path.stem}.{os.getpid()}.part{i}.wav")
+                pcm = np.clip(samples[start:end, 0], -1.0, 1.0)
+                with wave.open(str(chunk_path), 'wb') as wav:
+                    wav.setnchannels(1)
+                    wav.setsampwidth(2)
+                    wav.setframerate(sample_rate)
+                    wav.writeframes((pcm * 32767).astype('<i2').tobytes())
+                chunk_paths.append(chunk_path)
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                responses = list(executor.map(self.transcribe, chunk_paths))
+        finally:
+            for chunk_path in chunk_paths:
+                if chunk_path.exists():
+                    chunk_path.unlink()
+
+        words = []
+        texts = []
+        for (start, _), response in zip(bounds, responses):
+            offset = start / sample_rate
+            texts.append(response.get('text', '').strip())
+            for word in response.get('words', []) or []:
+                word = dict(word)
+                word['start'] = float(word['start']) + offset
+                word['end'] = float(word['end']) + offset
+                words.append(word)
+
+        return {
+            'text': ' '.join(t for t in texts if t),
+            'duration': len(samples) / sample_rate,
+            'words': words
+        }
     
     def convert_whisper_to_srt(self, whisper_response, words_per_subtitle=4, min_duration=None):
         """
         Convierte la respuesta de Whisper a formato SRT con precisión de milisegundos
         
+        Atajo de group_words + extend_cues + CueList.to_srt, los mismos cues que
+        usa el renderizador.
+        
         Args:
             whisper_response: Respuesta de la API de Whisper
             words_per_subtitle: Número de palabras por subtítulo (default: 4)
             min_duration: Duración mínima en segundos (default: None para usar duración exacta)
             
         Returns:
-            str: Contenido SRT formateado o string vacío en caso de error
+            str: Contenido SRT formateado
         """
-        def format_timestamp(seconds):
-            try:
-                hours = int(seconds // 3600)
-                minutes = int((seconds % 3600) // 60)
-                secs = int(seconds % 60)
-                millis = round((seconds - int(seconds)) * 1000)
-                return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
-            except Exception as e:
-                print(f"[ERROR] Error formateando timestamp {seconds}: {str(e)}")
-                return "00:00:00,000"
-
-        def clean_text(text):
-            try:
-                text = text.strip()
-                text = text.capitalize()
-                text = ' '.join(text.split())
-                return text
-            except Exception as e:
-                print(f"[ERROR] Error limpiando texto: {str(e)}")
-                return text
-
-        def get_last_end_time(srt_content):
-            try:
-                if not srt_content:
-                    return 0.0
-                last_entry = srt_content[-1]
-                time_str = last_entry.split('\n')[1].split(' --> ')[1].replace(',', '.')
-                hours, minutes, seconds = time_str.split(':')
-                total_seconds = float(hours) * 3600 + float(minutes) * 60 + float(seconds)
-                return total_seconds
-            except Exception as e:
-                print(f"[ERROR] Error obteniendo último tiempo: {str(e)}")
-                return 0.0
+        cues = self.group_words(whisper_response, words_per_subtitle)
+        return CueList(self.extend_cues(cues, min_duration)).to_srt()
 
-        try:
-            print("[DEBUG] Procesando respuesta de Whisper")
-            
-            # Convertir la respuesta a diccionario
-            if hasattr(whisper_response, 'model_dump'):
-                response_dict = whisper_response.model_dump()
-            else:
-                response_dict = whisper_response
-
-            # Validar y extraer palabras
-            words = response_dict.get('words', [])
-            if not words:
-                print("[WARNING] No se encontraron palabras en la respuesta")
-                if self.Final_screen and self.Text_final:
-                    return (
-                        f"1\n"
-                        f"{format_timestamp(0.5)} --> {format_timestamp(5.0)}\n"
-                        f"{self.Text_final}\n\n"
-                    )
-                return ""
-
-            print(f"[DEBUG] Encontradas {len(words)} palabras")
-
-            # Inicializar variables
-            srt_content = []
-            subtitle_index = 1
-            current_segment = []
-            current_start = None
-            current_end = None
+    def group_words(self, whisper_response, words_per_subtitle=4):
+        """
+        Agrupa las palabras de Whisper en cues conservando el tiempo de cada palabra
+        
+        Corta al llegar a words_per_subtitle palabras o tras una puntuación, y
+        separa cada cue del anterior para que no se superpongan.
+        
+        Args:
+            whisper_response: Respuesta de la API de Whisper
+            words_per_subtitle: Número de palabras por subtítulo (default: 4)
             
-            # Validar estructura de palabras
-            for word in words:
-                if 'start' not in word or 'end' not in word:
-                    print(f"[WARNING] Palabra sin timestamps completos: {word}")
-                    continue
-
-                if current_start is None:
-                    current_start = float(word.get('start', 0))
-                    current_end = float(word.get('end', 0))
-
-                word_text = word.get('word', '').strip()
-                if not word_text:
-                    continue
-
-                current_segment.append(word_text)
-                current_end = float(word.get('end', 0))
-
-                # Determinar si crear nuevo segmento
-                should_split = (
-                    len(current_segment) >= words_per_subtitle or
-                    any(punct in word_text for punct in '.!?,') or
-                    word == words[-1]
-                )
+        Returns:
+            list: Cues de la forma {"start", "end", "text", "words": [{"word", "start", "end"}]}
+        """
+        if hasattr(whisper_response, 'model_dump'):
+            response_dict = whisper_response.model_dump()
+        else:
+            response_dict = whisper_response
 
-                if should_split and current_segment:
-                    # Validar y ajustar tiempos
-                    if current_end <= current_start:
-                        current_end = current_start + 1.0
-
-                    duration = current_end - current_start
-                    if min_duration and duration < min_duration:
-                        current_end = current_start + min_duration
-
-                    subtitle_text = clean_text(' '.join(current_segment))
-
-                    # Evitar superposición con subtítulo anterior
-                    last_end = get_last_end_time(srt_content)
-                    if current_start <= last_end:
-                        current_start = last_end + 0.1
-                        current_end = max(current_end, current_start + 0.5)
-
-                    srt_entry = (
-                        f"{subtitle_index}\n"
-                        f"{format_timestamp(current_start)} --> {format_timestamp(current_end)}\n"
-                        f"{subtitle_text}\n\n"
-                    )
-                    
-                    srt_content.append(srt_entry)
-                    subtitle_index += 1
-                    current_segment = []
-                    current_start = None
-                    current_end = None
-
-            # Agregar texto final si corresponde
-            if self.Final_screen and self.Text_final and srt_content:
-                try:
-                    last_end = get_last_end_time(srt_content)
-                    if last_end > 0:
-                        final_start = last_end + 0.5
-                        final_end = final_start + 4.5
-                        
-                        final_entry = (
-                            f"{subtitle_index}\n"
-                            f"{format_timestamp(final_start)} --> {format_timestamp(final_end)}\n"
-                            f"{self.Text_final}\n\n"
-                        )
-                        
-                        srt_content.append(final_entry)
-                except Exception as e:
-                    print(f"[WARNING] Error agregando texto final: {str(e)}")
-
-            if not srt_content and self.Final_screen and self.Text_final:
-                return (
-                    f"1\n"
-                    f"{format_timestamp(0.5)} --> {format_timestamp(5.0)}\n"
-                    f"{self.Text_final}\n\n"
-                )
-            
-            print(f"[DEBUG] Generados {len(srt_content)} subtítulos")
+        words = [w for w in response_dict.get('words', []) if 'start' in w and 'end' in w]
+        cues = []
+        current = []
 
-            print("[DEBUG] Lista de subtítulos generados:")
-            for i, subtitle in enumerate(srt_content, 1):
-                print(f"[DEBUG] Subtítulo #{i}:\n{subtitle}")
+        for i, word in enumerate(words):
+            word_text = word.get('word', '').strip()
+            if word_text:
+                current.append({
+                    "word": word_text,
+                    "start": float(word['start']),
+                    "end": float(word['end'])
+                })
 
-            return ''.join(srt_content)
+            should_split = current and (
+                len(current) >= words_per_subtitle or
+                any(punct in word_text for punct in '.!?,') or
+                i == len(words) - 1
+            )
+            if should_split:
+                start = current[0]["start"]
+                end = current[-1]["end"]
+                if end <= start:
+                    end = start + 1.0
 
-        except Exception as e:
-            print(f"[ERROR] Error al convertir respuesta Whisper a SRT: {str(e)}")
-            print(f"[DEBUG] Estructura de la respuesta: {whisper_response}")
-            if self.Final_screen and self.Text_final:
-                return (
-                    f"1\n"
-                    f"{format_timestamp(0.5)} --> {format_timestamp(5.0)}\n"
-                    f"{self.Text_final}\n\n"
-                )
-            return ""
+                # Evitar superposición con el cue anterior
+                if cues and start <= cues[-1]["end"]:
+                    start = cues[-1]["end"] + 0.1
+                    end = max(end, start + 0.5)
+
+                cues.append({
+                    "start": start,
+                    "end": end,
+                    "text": ' '.join(w["word"] for w in current).capitalize(),
+                    "words": current
+                })
+                current = []
+
+        if self.Final_screen and self.Text_final:
+            final_start = cues[-1]["end"] + 0.5 if cues else 0.5
+            cues.append({
+                "start": final_start,
+                "end": final_start + 4.5,
+                "text": self.Text_final,
+                "words": []
+            })
+
+        return cues
+
+    @staticmethod
+    def extend_cues(cues, min_duration=None):
+        """
+        Alarga cada cue hasta min_duration segundos, sin pasar del inicio del siguiente
 
-    def generate_subtitles_whisper(self, audio_path, words_per_subtitle=4, min_duration=None, output_path=None):
+        Returns:
+            list: Los mismos cues, modificados en su lugar
+        """
+        if min_duration:
+            for cue, following in zip(cues, cues[1:] + [None]):
+                end = cue["start"] + min_duration
+                if following is not None:
+                    end = min(end, following["start"])
+                cue["end"] = max(cue["end"], end)
+        return cues
+
+    def transcribe_audio(self, audio_path, chunk_seconds=None, workers=4):
+        """
+        Transcribe el audio en una sola solicitud o, si chunk_seconds se indica o el
+        archivo supera el límite de subida, en fragmentos paralelos
+
+        Raises:
+            FileNotFoundError: Si no se encuentra el archivo de audio
+        """
+        audio_path = Path(audio_path)
+        if not audio_path.exists():
+            raise FileNotFoundError(f"Archivo de audio no encontrado: {audio_path}")
+
+        if chunk_seconds is None and audio_path.stat().st_size > MAX_UPLOAD_BYTES:
+            chunk_seconds = 120
+        if chunk_seconds:
+            return self.transcribe_chunked(audio_path, chunk_seconds=chunk_seconds, workers=workers)
+        print(f"[DEBUG] Enviando solicitud a Whisper API...")
+        return self.transcribe(audio_path)
+
+    def generate_cues(self, audio_path, words_per_subtitle=4, min_duration=None, chunk_seconds=None, workers=4):
         """
-        Genera subtítulos usando la API de Whisper
+        Genera los subtítulos en memoria, sin escribir ningún archivo
+        
+        Args:
+            audio_path: Ruta al archivo de audio
+            words_per_subtitle: Número de palabras por subtítulo
+            min_duration: Duración mínima en segundos de cada subtítulo
+            chunk_seconds: Transcribir en fragmentos de ~chunk_seconds en paralelo
+            workers: Solicitudes concurrentes en modo fragmentado
+            
+        Returns:
+            CueList: Cues con el tiempo de cada palabra (incluye el texto final si Final_screen)
+            
+        Raises:
+            FileNotFoundError: Si no se encuentra el archivo de audio
+            ValueError: Si la transcripción no produjo subtítulos
+        """
+        print(f"[DEBUG] Iniciando generación de subtítulos para {audio_path}")
+        transcription = self.transcribe_audio(audio_path, chunk_seconds=chunk_seconds, workers=workers)
+
+        cues = self.extend_cues(self.group_words(transcription, words_per_subtitle), min_duration)
+        if not cues:
+            raise ValueError("No se generaron subtítulos")
+
+        print(f"[DEBUG] Generados {len(cues)} subtítulos")
+        return CueList(cues)
+
+    def generate_subtitles_whisper(self, audio_path, words_per_subtitle=4, min_duration=None, output_path=None, save_words=False, chunk_seconds=None, workers=4):
+        """
+        Genera subtítulos usando la API de Whisper y los exporta a SRT
         
         Args:
             audio_path: Ruta al archivo de audio
             words_per_subtitle: Número de palabras por subtítulo
             min_duration: Duración mínima en segundos
             output_path: Ruta de salida para el archivo SRT
+            save_words: Si True, guarda también los cues con el tiempo de cada
+                palabra en un .words.json junto al SRT (para subtítulos karaoke)
+            chunk_seconds: Si se indica, transcribe en fragmentos de ~chunk_seconds en
+                paralelo. Archivos mayores al límite de subida siempre se fragmentan
+            workers: Solicitudes concurrentes en modo fragmentado
             
         Returns:
             str: Ruta al archivo de subtítulos generado
@@ -207,54 +320,29 @@ class Subt:
             ValueError: Si no se puede generar el contenido SRT
         """
         try:
-            print(f"[DEBUG] Iniciando generación de subtítulos para {audio_path}")
-            client = OpenAI(api_key=self.api_key)
-            
-            # Validar archivo de entrada
             audio_path = Path(audio_path)
-            if not audio_path.exists():
-                raise FileNotFoundError(f"Archivo de audio no encontrado: {audio_path}")
-
-            # Preparar ruta de salida
-            if output_path is None:
-                output_path = audio_path.with_suffix('.srt')
-            else:
-                output_path = Path(output_path)
-                output_path.parent.mkdir(parents=True, exist_ok=True)
-
-            # Generar transcripción
-            print(f"[DEBUG] Enviando solicitud a Whisper API...")
-            with open(audio_path, "rb") as audio_file:
-                transcription = client.audio.transcriptions.create(
-                    file=audio_file,
-                    model="whisper-1",
-                    response_format="verbose_json",
-                    timestamp_granularities=["word"]
-                )
-            
-            # Convertir a SRT
-            print("[DEBUG] Convirtiendo transcripción a formato SRT")
-            srt_content = self.convert_whisper_to_srt(
-                transcription, 
+            output_path = Path(output_path) if output_path else audio_path.with_suffix('.srt')
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+
+            cues = self.generate_cues(
+                audio_path,
                 words_per_subtitle=words_per_subtitle,
-                min_duration=min_duration
+                min_duration=min_duration,
+                chunk_seconds=chunk_seconds,
+                workers=workers
             )
-            
-            # Validar contenido SRT
-            if not srt_content and not (self.Final_screen and self.Text_final):
-                raise ValueError("No se generó contenido SRT")
 
-            # Guardar archivo
             print(f"[DEBUG] Guardando subtítulos en {output_path}")
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(srt_content)
+            cues.write_srt(output_path)
 
-            if not output_path.exists():
-                raise FileNotFoundError(f"No se pudo crear el archivo de subtítulos en {output_path}")
+            if save_words:
+                words_path = output_path.with_suffix('.words.json')
+                print(f"[DEBUG] Guardando tiempos por palabra en {words_path}")
+                cues.write_json(words_path)
 
             print(f"[DEBUG] Subtítulos generados exitosamente")
             return str(output_path)
 
         except Exception as e:
             print(f"[ERROR] Error en generate_subtitles_whisper: {str(e)}")
-            raise
\ No newline at end of file
+            raise
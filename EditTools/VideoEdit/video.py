@@ -1,15 +1,39 @@
 from moviepy import *
-from moviepy.video.tools.subtitles import SubtitlesClip
 from moviepy.video.fx import Crop
-from moviepy.video.fx import CrossFadeIn, CrossFadeOut, Loop
+from moviepy.video.fx import Loop
 import os
 from pathlib import Path
 from .subt import Subt
+from .loop import LoopTile
+from .smart_crop import CropTrack
+from .outputs import OutputTarget, write_outputs
+from .preview import PreviewTap
+from .karaoke import KaraokeCaptionClip
+from .atlas import SubtitleAtlas, AtlasSubtitlesClip
+from .audio_cache import AudioCache
+from .ducking import ducking_gain
+from .cues import CueList
+from .cue_clip import CueTextClip
+from .overlay_clip import OverlayClip
+from ..workdir import JobDir
+from ..ImageEdit.edit import card_overlay, card_raster, file_overlay, file_raster
+import ctypes
 import gc
-import psutil
+import hashlib
+import numpy as np
+import json
+import sys
+
+def release_heap():
+    """ malloc_trim(0) de glibc: sin esto el RSS no baja aunque Python libere la memoria """
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
 
 class VideoEditReddit:
-    def __init__(self, video_background, tts_audio, font, title=None, text_size="medium", text_location="bottom", font_color="white", words=4,upper=False, lower=False, Final_screen=False, Text_final=None, music_audio=None, image_overlay=None, subtitles_path=None, overlay_duration=3, openai_api_key=None):
+    def __init__(self, video_background, tts_audio, font, title=None, text_size="medium", text_location="bottom", font_color="white", words=4,upper=False, lower=False, Final_screen=False, Text_final=None, music_audio=None, image_overlay=None, subtitles_path=None, overlay_duration=3, openai_api_key=None, background_loop="loop", loop_cache_dir=None, karaoke=False, highlight_color="yellow", subtitle_atlas=False, atlas_workers=None, audio_cache_dir=None, provider=None, workdir=None, card=None, threads=64, smart_crop=False, crop_cache_dir=None, overlay_transition="fade", music_volume=0.1, ducking=True, music_gap_volume=0.3):
         """
         Initialize VideoEdit with necessary components
         
@@ -17,9 +41,43 @@ class VideoEditReddit:
             video_background (str): Path to background video
             tts_audio (str): Path to TTS audio file
             music_audio (str, optional): Path to background music
-            image_overlay (str, optional): Path to image overlay
+            image_overlay (str or ndarray, optional): Path to image overlay, or an RGBA array with
+                premultiplied alpha already at its on-video width (see ImageEdit.edit.card_overlay)
             subtitles_path (str, optional): Path to .srt subtitle file
             overlay_duration (int, optional): Duration in seconds for the overlay to appear (default: 3)
+            background_loop (str, optional): How to extend a background shorter than the audio.
+                "loop" re-reads the source on every pass, "tile" encodes one crossfaded
+                loop tile once and repeats it at the container level (default: "loop")
+            loop_cache_dir (str, optional): Directory for cached loop tiles
+                (default: "loop_cache" next to the background video)
+            karaoke (bool, optional): Highlight each word as it is spoken (default: False)
+            highlight_color (str, optional): Color of the highlighted word (default: "yellow")
+            subtitle_atlas (bool, optional): Pre-render every subtitle into one RGBA atlas
+                before encoding instead of drawing TextClips during the render (default: False)
+            atlas_workers (int, optional): Processes used to rasterize the atlas (default: CPU count)
+            audio_cache_dir (str, optional): Directory of the decoded audio cache shared by all
+                jobs on the host (default: ~/.cache/edittools/audio)
+            provider (optional): Transcription backend passed to Subt, e.g. a LocalProvider
+                for offline benchmarks (default: OpenAI with openai_api_key)
+            workdir (str, optional): Per-job working directory. Subtitles are written there and
+                the subtitle and render stages are recorded in its stage manifest, so a rerun
+                of create_video skips every stage whose inputs haven't changed
+            card (tuple, optional): (template, nickname, title) of a title card drawn directly at its
+                on-video size, without saving and reloading a PNG. Used instead of image_overlay
+            threads (int, optional): ffmpeg encoding threads (default: 64). Lower it when several
+                renders share the host (see scheduler.RenderScheduler)
+            smart_crop (bool, optional): Follow the action when cropping a landscape background
+                to 9:16, using a crop-center track computed once per background and cached,
+                instead of always cropping the center (default: False)
+            crop_cache_dir (str, optional): Directory for cached crop tracks
+                (default: "crop_cache" next to the background video)
+            overlay_transition (str, optional): Entrance and exit of the overlay: "fade", "slide",
+                "pop" or "none" (default: "fade"). Lasts fade_duration seconds each way
+            music_volume (float, optional): Gain of the background music under the narration (default: 0.1)
+            ducking (bool, optional): Lower the music only while the TTS speaks, following its
+                cached RMS envelope, instead of a flat music_volume for the whole video (default: True)
+            music_gap_volume (float, optional): Gain of the music in the pauses and after the
+                narration when ducking (default: 0.3)
         """
         self.video_background = video_background
         self.tts_audio = tts_audio
@@ -27,6 +85,8 @@ class VideoEditReddit:
         self.image_overlay = image_overlay
         self.subtitles_path = str(Path(subtitles_path)) if subtitles_path else None
         self.output_size = (1080, 1920)  # Default to vertical video format
+        self.overlay_width = int(self.output_size[0] * 0.8)
+        self.fps = 24
         self.overlay_duration = overlay_duration
         self.fade_duration = 0.5  # Duration of fade in/out effect in seconds
         self.openai_api_key = openai_api_key
@@ -40,6 +100,25 @@ class VideoEditReddit:
         self.title = title
         self.Final_screen = Final_screen
         self.Text_final = Text_final
+        self.background_loop = background_loop
+        self.loop_cache_dir = loop_cache_dir
+        self.karaoke = karaoke
+        self.highlight_color = highlight_color
+        self.subtitle_atlas = subtitle_atlas
+        self.atlas_workers = atlas_workers
+        self.audio_cache = AudioCache(audio_cache_dir)
+        self.provider = provider
+        self.jobdir = JobDir(workdir) if workdir else None
+        self.card = tuple(card) if card else None
+        self.threads = threads
+        self.smart_crop = smart_crop
+        self.crop_cache_dir = crop_cache_dir
+        self.overlay_transition = overlay_transition
+        self.music_volume = music_volume
+        self.ducking = ducking
+        self.music_gap_volume = music_gap_volume
+        self.words_path = str(Path(subtitles_path).with_suffix('.words.json')) if karaoke and subtitles_path else None
+        self.cues = None
 
     def text_size(self, text_size):
         """ Return the font size based on the text size """
@@ -78,6 +157,8 @@ class VideoEditReddit:
                 y_center=clip.h/2
             )
             clip = crop_effect.apply(clip)
+        elif self.smart_crop and round((clip.w/clip.h), 4) > 0.5625:
+            clip = self.crop_track().apply(clip, self.video_background)
         else:
             crop_effect = Crop(
                 width=round(0.5625*clip.h),
@@ -93,8 +174,10 @@ class VideoEditReddit:
         total_duration = duration + (5 if self.Final_screen else 0)
         
         # Loop or trim video to match audio duration
-        if clip.duration < duration:
-            loop_effect = Loop(duration=duration)
+        if clip.duration < total_duration:
+            if self.background_loop == "tile":
+                return self.loop_background_tile(clip, total_duration)
+            loop_effect = Loop(duration=total_duration)
             final_clip = loop_effect.apply(clip)
             return final_clip
         else:
@@ -102,39 +185,117 @@ class VideoEditReddit:
             
         return clip
 
+    def crop_track(self):
+        """ CropTrack of the smart crop, with its cache next to the background by default """
+        cache_dir = self.crop_cache_dir or Path(self.video_background).parent / "crop_cache"
+        return CropTrack(cache_dir=cache_dir)
+
+    def loop_background_tile(self, clip, total_duration):
+        """
+        Extend a short background by repeating a cached, pre-rendered loop tile
+
+        Args:
+            clip: Background clip already cropped and resized to output_size
+            total_duration: Target duration in seconds
+        """
+        cache_dir = self.loop_cache_dir or Path(self.video_background).parent / "loop_cache"
+        loop_tile = LoopTile(
+            cache_dir=cache_dir,
+            output_size=self.output_size,
+            fps=self.fps,
+            crossfade=self.fade_duration,
+            variant="smart_crop" if self.smart_crop else None
+        )
+        looped = loop_tile.loop(clip, self.video_background, total_duration)
+        clip.close()
+        return looped
+
     def create_overlay(self, duration):
         """Create overlay clip with transitions"""
-        if not self.image_overlay:
+        overlay = self.overlay_array()
+        if overlay is None:
             return None
 
-        img = ImageClip(self.image_overlay)
-        img = img.resized(width=self.output_size[0] * 0.8)
-        img = img.with_position(("center", 500))
-        img = img.with_duration(min(self.overlay_duration, duration))
-    
-        # Aplicar los efectos de crossfade
-        #effects = [
-        #    CrossFadeIn(duration=self.fade_duration),
-        #    CrossFadeOut(duration=self.fade_duration)
-        #]
-        #img = img.with_effects(effects)
-            
-        return img
+        # Ya viene escalado y premultiplicado; la transición se precalcula por cuadro
+        position = ((self.output_size[0] - overlay.shape[1]) // 2, 500)
+        return OverlayClip(
+            overlay,
+            position=position,
+            duration=min(self.overlay_duration, duration),
+            fps=self.fps,
+            transition=self.overlay_transition,
+            transition_duration=self.fade_duration,
+            raster=self.overlay_raster()
+        )
 
 
-    def create_subtitle_clips(self, duration=None):
-        print(f"Generando subtítulos desde: {self.subtitles_path}")
-    
-    # Verificar que existe el directorio fonts y el archivo de fuente
-        #print(f"[DEBUG] Buscando fuente en: {font_path}")
-    
-        #if not os.path.exists(font_path):
-        #    print(f"[ERROR] No se encontró el archivo de fuente en: {font_path}")
-        #    return None
+    def overlay_array(self):
+        """ Overlay at its on-video width as a premultiplied RGBA array (cached), or None """
+        if self.card:
+            return card_overlay(*self.card, width=self.overlay_width)
+        if isinstance(self.image_overlay, np.ndarray):
+            return self.image_overlay
+        if self.image_overlay:
+            return file_overlay(self.image_overlay, self.overlay_width)
+        return None
 
-        #print(f"[DEBUG] Archivo de fuente encontrado, tamaño: {os.path.getsize(font_path)} bytes")
+    def overlay_raster(self):
+        """ The same overlay as a straight-alpha RGBA image (cached), or None for an in-memory array """
+        if self.card:
+            return card_raster(*self.card, width=self.overlay_width)
+        if self.image_overlay and not isinstance(self.image_overlay, np.ndarray):
+            return file_raster(self.image_overlay, self.overlay_width)
+        return None
+
+    def case_words(self, words):
+        """ Apply the upper/lower/capitalize rules to a list of subtitle words """
+        if not words:
+            return []
+
+        # Primero manejar el caso especial del punto
+        if words[0] == '.':
+            if len(words) > 1:
+                return ['.'] + [words[1].capitalize()] + [w.lower() for w in words[2:]]
+            return ['.']
+        # Luego manejar las transformaciones de caso
+        elif self.upper:
+            return [w.upper() for w in words]
+        elif self.lower:
+            return [w.lower() for w in words]
+        # Por defecto, primera palabra capitalizada, resto en minúsculas
+        return [words[0].capitalize()] + [w.lower() for w in words[1:]]
+
+    def create_karaoke_clips(self, duration=None):
+        """
+        Create word-highlighted subtitles from the per-word timings saved by Subt
+
+        Args:
+            duration: Optional duration of the subtitle track
+        """
+        try:
+            subtitles = KaraokeCaptionClip(
+                self.load_cues().visible(),
+                font=self.font,
+                font_size=self.text_size(self.font_size),
+                width=self.output_size[0],
+                color=self.font_color,
+                highlight_color=self.highlight_color,
+                transform=self.case_words
+            )
+            if duration is not None:
+                subtitles = subtitles.with_duration(duration)
+
+            return subtitles.with_position(('center', self.output_size[1] - 700 - subtitles.h))
+
+        except Exception as e:
+            print(f"Error al crear subtítulos karaoke: {str(e)}")
+            return None
+
+    def create_subtitle_clips(self, duration=None):
+        print(f"Generando subtítulos desde: {self.subtitles_path or 'memoria'}")
     
         try:
+            cues = self.load_cues()
 
             def split_text(text):
                 words = text.split()
@@ -143,24 +304,25 @@ class VideoEditReddit:
                 if not words:
                     return ''
         
-                # Primero manejar el caso especial del punto
-                if words[0] == '.':
-                    if len(words) > 1:
-                        processed_words = ['.'] + [words[1].capitalize()] + [w.lower() for w in words[2:]]
-                    else:
-                        processed_words = ['.']
-                # Luego manejar las transformaciones de caso
-                elif self.upper:
-                    processed_words = [w.upper() for w in words]
-                elif self.lower:
-                    processed_words = [w.lower() for w in words]
-                else:
-                # Por defecto, primera palabra capitalizada, resto en minúsculas
-                    processed_words = [words[0].capitalize()] + [w.lower() for w in words[1:]]
+                processed_words = self.case_words(words)
     
                 # Unir palabras en grupos de 2 con salto de línea
                 return '\n'.join(' '.join(processed_words[i:i+2]) for i in range(0, len(processed_words), 2))
 
+            if self.subtitle_atlas:
+                atlas = SubtitleAtlas.build(
+                    [(times, split_text(text)) for times, text in cues.subtitles()],
+                    font=self.font,
+                    font_size=self.text_size(self.font_size),
+                    color=self.font_color,
+                    width=self.output_size[0],
+                    workers=self.atlas_workers
+                )
+                subtitles = AtlasSubtitlesClip(atlas)
+                if duration is not None:
+                    subtitles = subtitles.with_duration(duration)
+                return subtitles.with_position(('center', self.output_size[1] - 700 - atlas.cell_height))
+
             generator = lambda text: TextClip(font=self.font, text=split_text(text),
                                         font_size=self.text_size(self.font_size), color=(255,255,255,0) if text.strip() == '.' else self.font_color, text_align='center',      
                                         horizontal_align='center', 
@@ -170,11 +332,7 @@ class VideoEditReddit:
                                         stroke_color='black' if text.strip() != '.' else (0,0,0,0),  # Color del contorno
                                         stroke_width=10)   
                         
-            subtitles = SubtitlesClip(
-                    self.subtitles_path,
-                    make_textclip=generator,
-                    encoding='utf-8'  # Importante para caracteres especiales
-                )
+            subtitles = CueTextClip(cues, make_textclip=generator)
         
             if duration is not None:
                 subtitles = subtitles.with_duration(duration)
@@ -188,12 +346,50 @@ class VideoEditReddit:
             print(traceback.format_exc())
             return None
 
-    def generate_subtitles(self, output_path=None):
-        """Generate subtitles with more robust path handling"""
-        if not self.openai_api_key:
+    def load_cues(self):
+        """
+        Cues to render: the ones generated in memory, or loaded once from the
+        .words.json (karaoke) or the .srt given as subtitles_path
+        """
+        if self.cues is None:
+            if self.words_path and os.path.exists(self.words_path):
+                self.cues = CueList.load(self.words_path)
+            elif self.subtitles_path and os.path.exists(self.subtitles_path):
+                self.cues = CueList.load(self.subtitles_path)
+            else:
+                return None
+            # El primer cue se oculta cuando el título ya está en pantalla
+            if self.title:
+                self.cues = self.cues.hide_first()
+        return self.cues
+
+    def generate_subtitles(self, output_path=None, export=True):
+        """
+        Generate the subtitle cues in memory, with the title edit applied
+
+        Args:
+            output_path (str, optional): Path of the exported .srt (default: subtitles/<tts>.srt
+                next to the background video). With karaoke or a workdir, the cues with word
+                timings are also exported to a .words.json next to it
+            export (bool): Write the .srt (and .words.json) export files
+
+        Returns:
+            str: Path of the exported .srt, or None when export is False
+        """
+        if not self.openai_api_key and not self.provider:
             raise ValueError("Se requiere OpenAI API key para generar subtítulos")
         
         try:
+            subt = Subt(api_key=self.openai_api_key, Final_screen=self.Final_screen, Text_final=self.Text_final, provider=self.provider,
+                        audio_cache_dir=self.audio_cache.cache_dir)
+            cues = subt.generate_cues(self.tts_audio, words_per_subtitle=self.words)
+
+            # Si tenemos título, el primer subtítulo se oculta mientras se ve el título
+            self.cues = cues.hide_first() if self.title else cues
+
+            if not export:
+                return None
+
             # Determinar la ruta de salida
             if output_path is None:
                 # Crear un directorio de subtítulos en el mismo directorio que el video
@@ -206,53 +402,9 @@ class VideoEditReddit:
                 output_path.parent.mkdir(parents=True, exist_ok=True)
 
             print(f"Generando subtítulos en: {output_path}")
-            
-            # Generar subtítulos
-            subt = Subt(api_key=self.openai_api_key, Final_screen=self.Final_screen, Text_final=self.Text_final)
-            self.subtitles_path = subt.generate_subtitles_whisper(
-                audio_path=self.tts_audio,
-                words_per_subtitle=self.words,
-                output_path=str(output_path)
-            )
-
-        # Si tenemos título, modificar el primer subtítulo
-            if self.title:
-                try:
-                    with open(self.subtitles_path, 'r', encoding='utf-8') as f:
-                        srt_lines = f.readlines()
-                
-                    modified_lines = []
-                    i = 0
-                    first_subtitle = True
-                
-                    while i < len(srt_lines):
-                        if srt_lines[i].strip().isdigit():  # Número de subtítulo
-                            modified_lines.append(srt_lines[i])  # Número
-                            modified_lines.append(srt_lines[i + 1])  # Timestamp
-                        
-                            if first_subtitle:
-                            # Para el primer subtítulo, reemplazar con un punto
-                                modified_lines.append(".\n")
-                                first_subtitle = False
-                            else:
-                                modified_lines.append(srt_lines[i + 2])  # Texto normal
-                            
-                            modified_lines.append(srt_lines[i + 3])  # Línea en blanco
-                            i += 4
-                        else:
-                            i += 1
-
-                # Escribir el archivo modificado
-                    with open(self.subtitles_path, 'w', encoding='utf-8') as f:
-                        f.writelines(modified_lines)
-            
-            # Verificar que el archivo se creó
-
-                except Exception as e:
-                    print(f"Error modificando subtítulos para el título: {str(e)}")
-            
-            if not os.path.exists(self.subtitles_path):
-                raise FileNotFoundError(f"No se pudo generar el archivo de subtítulos en {self.subtitles_path}")
+            self.subtitles_path = self.cues.write_srt(output_path)
+            if self.karaoke or self.jobdir:
+                self.words_path = self.cues.write_json(output_path.with_suffix('.words.json'))
                 
             return self.subtitles_path
             
@@ -262,15 +414,16 @@ class VideoEditReddit:
 
     def __del__(self):
         """Destructor de la clase para limpieza de memoria"""
-        self.cleanup()
+        # Sin gc.collect(): __del__ puede ejecutarse en medio de una recolección
+        self.cleanup(collect=False)
 
-    def cleanup(self):
+    def cleanup(self, collect=True):
         """Método para limpiar recursos y liberar memoria"""
         try:
             # Limpieza de atributos grandes
             attributes_to_clean = [
                 'video_background', 'tts_audio', 'music_audio', 
-                'image_overlay', 'subtitles_path', 'font'
+                'image_overlay', 'subtitles_path', 'font', 'cues'
             ]
             
             for attr in attributes_to_clean:
@@ -278,12 +431,12 @@ class VideoEditReddit:
                     setattr(self, attr, None)
 
             # Forzar recolección de basura
-            gc.collect()
+            if collect:
+                gc.collect()
 
-            # Liberar memoria del sistema (opcional)
-            if psutil.POSIX:  # Solo en sistemas POSIX (Linux/Unix)
-                import resource
-                resource.setrlimit(resource.RLIMIT_AS, (resource.RLIM_CUR, resource.RLIM_MAX))
+            # Devolver al sistema la memoria libre del heap (glibc); solo en Linux
+            if sys.platform.startswith("linux"):
+                release_heap()
 
         except Exception as e:
             print(f"Error durante la limpieza: {str(e)}")
@@ -295,24 +448,11 @@ class VideoEditReddit:
             Args:
                 tts_duration: Duration of the TTS audio in seconds
         """
-        tts_audio = AudioFileClip(self.tts_audio)
+        tts_audio = self.audio_cache.clip(self.tts_audio)
         target_duration = tts_duration + (5 if self.Final_screen else 0)
 
         if self.music_audio:
-            bg_music = AudioFileClip(self.music_audio)
-        # Create a custom frame function that multiplies the original audio by 0.3
-            original_frame_func = bg_music.frame_function
-            bg_music.frame_function = lambda t: original_frame_func(t) * 0.1
-        
-        # Loop background music if shorter than target duration
-            if bg_music.duration < target_duration:
-                original_bg_func = bg_music.frame_function
-                bg_music.frame_function = lambda t: original_bg_func(t % bg_music.duration)
-                bg_music.duration = target_duration
-                bg_music.end = target_duration
-            else:
-            # Trim background music if longer than target duration
-                bg_music = bg_music.with_duration(target_duration)
+            bg_music = self.music_clip(target_duration)
 
         # Extend TTS audio with silence only for the portion after TTS ends
             if self.Final_screen:
@@ -339,79 +479,272 @@ class VideoEditReddit:
     
         return final_audio
 
-    def create_video(self, output_path="output.mp4", generate_subs=True):
+    def music_clip(self, target_duration):
+        """
+        Background music looped or trimmed to target_duration, with its gain applied
+
+        With ducking, the gain follows the cached RMS envelope of the TTS: music_volume
+        under speech, music_gap_volume in the pauses and after the narration. The whole
+        gain curve is applied to the music buffer in a single array multiply.
+
+        Args:
+            target_duration: Duration of the final audio in seconds
+        """
+        fps = self.audio_cache.fps
+        samples = self.audio_cache.load(self.music_audio)
+        length = int(round(target_duration * fps))
+        # np.resize repite la música desde el inicio si es más corta
+        music = np.resize(np.asarray(samples, dtype=np.float32), (length, samples.shape[1]))
+
+        if self.ducking:
+            envelope = self.audio_cache.envelope(self.tts_audio, hop=0.01)
+            gain = ducking_gain(envelope, 0.01, length, fps, speech_gain=self.music_volume, gap_gain=self.music_gap_volume)
+            music *= gain[:, None]
+        else:
+            music *= self.music_volume
+
+        return AudioArrayClip(music, fps=fps).with_duration(length / fps)
+
+    def subtitle_params(self):
+        """ Settings that change the generated subtitles (stage key of the workdir manifest) """
+        return {
+            "words": self.words,
+            "title": self.title,
+            "Final_screen": self.Final_screen,
+            "Text_final": self.Text_final,
+            "karaoke": self.karaoke,
+            "provider": type(self.provider).__name__ if self.provider else "OpenAIProvider",
+        }
+
+    def render_inputs(self):
+        """ Files read by the render (stage inputs of the workdir manifest) """
+        return {
+            "background": self.video_background,
+            "tts": self.tts_audio,
+            "music": self.music_audio,
+            "overlay": self.image_overlay if isinstance(self.image_overlay, (str, Path)) else None,
+            "font": self.font,
+            "subtitles": self.subtitles_path,
+            "words": self.words_path,
+        }
+
+    def render_params(self, output_path, outputs=None):
+        """ Settings that change the rendered video (stage key of the workdir manifest) """
+        return {
+            "output_path": str(output_path),
+            "outputs": [dict(vars(t), sink=t.location) if isinstance(t, OutputTarget) else t for t in outputs or []],
+            "card": self.card,
+            "cues": hashlib.sha1(json.dumps(self.load_cues().cues).encode("utf-8")).hexdigest() if self.load_cues() else None,
+            "overlay_array": hashlib.sha1(self.image_overlay.tobytes()).hexdigest() if isinstance(self.image_overlay, np.ndarray) else None,
+            "output_size": self.output_size,
+            "fps": self.fps,
+            "overlay_duration": self.overlay_duration,
+            "fade_duration": self.fade_duration,
+            "overlay_transition": self.overlay_transition,
+            "font_color": self.font_color,
+            "font_size": self.font_size,
+            "font_location": self.font_location,
+            "upper": self.upper,
+            "lower": self.lower,
+            "title": self.title,
+            "Final_screen": self.Final_screen,
+            "background_loop": self.background_loop,
+            "smart_crop": self.smart_crop,
+            "karaoke": self.karaoke,
+            "highlight_color": self.highlight_color,
+            "subtitle_atlas": self.subtitle_atlas,
+            "music_volume": self.music_volume,
+            "ducking": self.ducking,
+            "music_gap_volume": self.music_gap_volume,
+        }
+
+    def create_video(self, output_path="output.mp4", generate_subs=True, outputs=None, export_subtitles=True, preview=None, sink=None, output_mode="file"):
+        """
+        Compose and render the final video
+
+        With a workdir, the subtitle and render stages are skipped when their
+        inputs and settings match the last successful run.
+
+        Args:
+            output_path (str): Path of the rendered video (also names the .srt without a workdir)
+            generate_subs (bool): Generate subtitles with Whisper before rendering
+            outputs (list, optional): OutputTarget objects (or dicts of OutputTarget
+                arguments). When given, the video is composited once and encoded to
+                every target instead of output_path
+            export_subtitles (bool): Also write the generated subtitles as .srt next to the
+                video. They are rendered from memory either way (always written with a workdir)
+            preview (PreviewTap or dict, optional): Thumbnails and contact sheet taken from the
+                composited frames while they are encoded, instead of decoding the output again.
+                The image paths are left in preview.paths, also when a workdir reuses the render
+            sink (optional): Destination that receives the video as fragmented MP4 while it is
+                encoded, e.g. an S3Sink streaming a multipart upload, or a LocalFileSink.
+                Without outputs it replaces writing output_path
+            output_mode (str): "file", "fmp4" (fragmented MP4, playable while it is written) or
+                "hls" (segments plus an .m3u8 playlist next to output_path, playable during the
+                render). Used when outputs is not given; OutputTargets take their own mode
+
+        Returns:
+            list: Paths of the written video files
+        """
         try:
             print("[DEBUG] Iniciando creación de video...")
             output_path = Path(output_path)
-            output_dir = output_path.parent
-            output_dir.mkdir(parents=True, exist_ok=True)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            if isinstance(preview, dict):
+                preview = PreviewTap(**preview)
+            if output_mode == "hls":
+                output_path = output_path.with_suffix('.m3u8')
 
             if generate_subs:
                 print("[DEBUG] Intentando generar subtítulos...")
-                srt_path = output_path.with_suffix('.srt')
-                self.generate_subtitles(output_path=srt_path)
-    
-            print("[DEBUG] Procesando audio TTS...")
-            tts_audio = AudioFileClip(self.tts_audio)
-            tts_duration = tts_audio.duration
-            total_duration = tts_duration + (5 if self.Final_screen else 0)
-    
+                if self.jobdir:
+                    srt_path = self.jobdir.path("subtitles.srt")
+                    self.jobdir.run(
+                        "subtitles",
+                        lambda: self.generate_subtitles(output_path=srt_path),
+                        inputs={"tts": self.tts_audio},
+                        params=self.subtitle_params(),
+                        outputs=lambda path: [path, Path(path).with_suffix('.words.json')]
+                    )
+                    self.subtitles_path = str(srt_path)
+                    self.words_path = str(srt_path.with_suffix('.words.json'))
+                else:
+                    self.generate_subtitles(output_path=output_path.with_suffix('.srt'), export=export_subtitles)
+
+            if self.jobdir:
+                # Las vistas previas son salidas del render: al saltar la etapa se recuperan del manifiesto
+                def render():
+                    written = self.render(output_path, outputs, preview, sink, output_mode)
+                    return {"videos": written, "previews": list(preview.paths) if preview else []}
+
+                result = self.jobdir.run(
+                    "render",
+                    render,
+                    inputs=self.render_inputs(),
+                    params=dict(self.render_params(output_path, outputs), preview=preview.params() if preview else None,
+                               sink=sink.location if sink else None, output_mode=output_mode),
+                    outputs=lambda result: result["videos"] + result["previews"]
+                )
+                if not isinstance(result, dict):
+                    result = {"videos": result, "previews": []}  # Manifiesto anterior a las vistas previas
+                written = result["videos"]
+                if preview:
+                    preview.paths = result["previews"]
+            else:
+                written = self.render(output_path, outputs, preview, sink, output_mode)
+
+            return written
+        
+        except Exception as e:
+            print(f"Error creating video: {str(e)}")
+            raise
+
+        finally:
+            self.cleanup()
+
+    def render(self, output_path, outputs=None, preview=None, sink=None, output_mode="file"):
+        """
+        Composite the background, overlay, subtitles and audio, and encode them
+
+        Args:
+            output_path (Path): Path of the rendered video
+            outputs (list, optional): OutputTarget objects or dicts (see create_video)
+            preview (PreviewTap, optional): Tap for thumbnails and the contact sheet
+            sink (optional): Streaming destination of the video (see create_video)
+            output_mode (str): "file", "fmp4" or "hls" (see create_video)
+
+        Returns:
+            list: Paths of the written video files
+        """
+        output_dir = output_path.parent
+        targets = []
+
+        print("[DEBUG] Procesando audio TTS...")
+        tts_duration = self.audio_cache.duration(self.tts_audio)
+        total_duration = tts_duration + (5 if self.Final_screen else 0)
+
+        # Todo lo que se abre se cierra al final, también si el render falla
+        # (cada VideoFileClip mantiene un proceso de ffmpeg abierto)
+        clips = []
+        try:
             print("[DEBUG] Procesando video de fondo...")
-            video = VideoFileClip(self.video_background)
-            video = self.process_background(video, tts_duration)  # process_background ya maneja la duración total
-    
+            source = VideoFileClip(self.video_background)
+            clips.append(source)
+            video = self.process_background(source, tts_duration)  # process_background ya maneja la duración total
+            clips.append(video)
+
             video_components = [video]
-    
+
             overlay = self.create_overlay(total_duration)
             if overlay:
                 print("[DEBUG] Añadiendo overlay...")
                 video_components.append(overlay)
-    
-            if self.subtitles_path and os.path.exists(self.subtitles_path):
+
+            cues = self.load_cues()
+            if self.karaoke and cues:
+                print("[DEBUG] Creando subtítulos karaoke...")
+                subtitles = self.create_karaoke_clips(duration=total_duration)
+                if subtitles:
+                    video_components.append(subtitles)
+            elif cues:
                 print("[DEBUG] Creando clips de subtítulos...")
                 subtitles = self.create_subtitle_clips(duration=total_duration)
                 if subtitles:
                     print("[DEBUG] Añadiendo subtítulos al video...")
-                    subtitles = subtitles.with_position(('center', 'bottom'))
+                    if not self.subtitle_atlas:
+                        subtitles = subtitles.with_position(('center', 'bottom'))
                     video_components.append(subtitles)
-    
+            clips.extend(video_components[1:])
+
             print("[DEBUG] Componiendo video final...")
             final_video = CompositeVideoClip(video_components, size=self.output_size)
             final_video = final_video.with_duration(total_duration)
-    
+            clips.append(final_video)
+
             print("[DEBUG] Mezclando audio...")
             final_audio = self.mix_audio(tts_duration)
+            clips.append(final_audio)
             final_video = final_video.with_audio(final_audio)
-    
-            print(f"[DEBUG] Escribiendo video final en: {output_path}")
-            final_video.write_videofile(
-                str(output_path),
-                fps=24,
-                threads=64,
-                codec='libx264',
-                audio_codec='aac',
-            )
-    
-        # Cleanup
-            final_video.close()
-            video.close()
-            tts_audio.close()
-            if self.music_audio:
-                final_audio.close()
-
-            self.cleanup_temp_files(output_path)
-            self.cleanup()
-        
-        except Exception as e:
-            print(f"Error creating video: {str(e)}")
-            raise
 
-    def cleanup_temp_files(self, output_path):
-        """Limpia archivos temporales generados durante el proceso"""
+            previews = [preview] if preview else None
+            if outputs:
+                targets = [t if isinstance(t, OutputTarget) else OutputTarget(**t) for t in outputs]
+                written = write_outputs(final_video, targets, threads=self.threads, temp_dir=output_dir, previews=previews)
+            elif preview or sink or output_mode != "file":
+                # Mismo x264/aac que write_videofile, pero por el stream que alimenta las miniaturas y el sink
+                target = OutputTarget(output_path, size=self.output_size, fps=self.fps, sink=sink, mode=output_mode)
+                written = write_outputs(final_video, [target], threads=self.threads, temp_dir=output_dir, previews=previews)
+            else:
+                print(f"[DEBUG] Escribiendo video final en: {output_path}")
+                final_video.write_videofile(
+                    str(output_path),
+                    fps=self.fps,
+                    threads=self.threads,
+                    codec='libx264',
+                    audio_codec='aac',
+                )
+                written = [str(output_path)]
+
+        finally:
+            # Cleanup
+            for clip in reversed(clips):
+                try:
+                    clip.close()
+                except Exception as e:
+                    print(f"Error cerrando clip: {str(e)}")
+            self.cleanup_temp_files(output_path, keep=[target.path for target in targets])
+
+        return written
+
+    def cleanup_temp_files(self, output_path, keep=()):
+        """Limpia archivos temporales generados durante el proceso, sin tocar las salidas (output_path y keep)"""
         try:
-            # Limpieza de archivos temporales de moviepy
+            output_path = Path(output_path)
+            keep = {os.path.abspath(path) for path in [output_path, *keep]}
+            # Audio temporal de moviepy; con otra extensión (p. ej. .m3u8) el nombre sigue siendo distinto al de la salida
+            temp_audio = output_path.with_name(f"{output_path.stem}TEMP_MPY_wvf_snd{output_path.suffix}")
             temp_files_patterns = [
-                str(output_path).replace('.mp4', 'TEMP_MPY_wvf_snd.mp4'),
+                str(temp_audio),
                 '*.mpy',
                 '*.mp4_temp',
                 '*.mp4.temp'
@@ -422,11 +755,11 @@ class VideoEditReddit:
                     # Buscar archivos que coincidan con el patrón
                     import glob
                     for temp_file in glob.glob(pattern):
-                        if os.path.exists(temp_file):
+                        if os.path.exists(temp_file) and os.path.abspath(temp_file) not in keep:
                             os.remove(temp_file)
                 else:
                     # Eliminar archivo específico
-                    if os.path.exists(pattern):
+                    if os.path.exists(pattern) and os.path.abspath(pattern) not in keep:
                         os.remove(pattern)
 
         except Exception as e:
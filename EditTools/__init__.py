@@ -1,4 +1,65 @@
-from .GenAPI import *
-from .ImageEdit import *
-from .VideoEdit.video import *
-from .prompts import *
\ No newline at end of file
+"""
+EditTools: generación de texto, TTS, tarjetas y edición de videos
+
+Los nombres públicos se cargan al primer acceso (PEP 562), así `import EditTools`
+no importa moviepy, numpy ni el cliente de OpenAI hasta que se usan.
+"""
+import importlib
+
+_LAZY_ATTRS = {
+    # GenAPI
+    "TextGen": ".GenAPI.GenAPI",
+    "ClientTTS": ".GenAPI.GenAPI",
+    "BatchTextGen": ".GenAPI.GenAPI",
+    "LocalProvider": ".GenAPI.providers",
+    "OpenAIProvider": ".GenAPI.providers",
+    "get_provider": ".GenAPI.providers",
+    "CallMetrics": ".GenAPI.metrics",
+    # ImageEdit
+    "EditImage": ".ImageEdit.edit",
+    "EditImageFaceBook": ".ImageEdit.edit",
+    "EditImageX": ".ImageEdit.edit",
+    "render_card": ".ImageEdit.edit",
+    "card_overlay": ".ImageEdit.edit",
+    "render_cards": ".ImageEdit.batch",
+    # VideoEdit
+    "VideoEditReddit": ".VideoEdit.video",
+    "Subt": ".VideoEdit.subt",
+    "OutputTarget": ".VideoEdit.outputs",
+    "write_outputs": ".VideoEdit.outputs",
+    "hls_segments": ".VideoEdit.outputs",
+    "remux_hls": ".VideoEdit.outputs",
+    "PreviewTap": ".VideoEdit.preview",
+    "LocalFileSink": ".VideoEdit.sinks",
+    "S3Sink": ".VideoEdit.sinks",
+    "LocalObjectStore": ".VideoEdit.sinks",
+    "LoopTile": ".VideoEdit.loop",
+    "CropTrack": ".VideoEdit.smart_crop",
+    "KaraokeCaptionClip": ".VideoEdit.karaoke",
+    "SubtitleAtlas": ".VideoEdit.atlas",
+    "AtlasSubtitlesClip": ".VideoEdit.atlas",
+    "OverlayClip": ".VideoEdit.overlay_clip",
+    "AudioCache": ".VideoEdit.audio_cache",
+    "CueList": ".VideoEdit.cues",
+    # Prompts
+    "SYSTEM_PROMPT_REDDIT": ".prompts",
+    "SYSTEM_PROMPT_BY_TOPIC": ".prompts",
+}
+
+_SUBMODULES = ("GenAPI", "ImageEdit", "VideoEdit", "prompts", "bench", "soak")
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+        globals()[name] = value
+        return value
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS) | set(_SUBMODULES))
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+Benchmark del tiempo de importación de EditTools
+
+Cada caso se mide en un intérprete nuevo (sin módulos en caché), con el
+tiempo total de pared y el desglose de `python -X importtime`.
+
+Uso:
+    python -m EditTools.bench
+    python -m EditTools.bench --repeat 10 --top 15
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+IMPORT_CASES = {
+    "package": "import EditTools",
+    "prompts": "from EditTools import SYSTEM_PROMPT_REDDIT",
+    "genapi": "from EditTools import TextGen",
+    "imageedit": "from EditTools import EditImage",
+    "subt": "from EditTools import Subt",
+    "video": "from EditTools import VideoEditReddit",
+}
+
+
+def time_import(statement, repeat=5, python=None):
+    """
+    Mide la importación en intérpretes nuevos
+
+    Args:
+        statement: Código a ejecutar, p. ej. "import EditTools"
+        repeat: Número de intérpretes a lanzar
+        python: Ejecutable de Python (default: el actual)
+
+    Returns:
+        dict con "median", "min" y "max" en segundos, y "baseline" (intérprete vacío)
+    """
+    python = python or sys.executable
+
+    def run(code):
+        start = time.perf_counter()
+        subprocess.run([python, "-c", code], check=True)
+        return time.perf_counter() - start
+
+    baseline = statistics.median(run("pass") for _ in range(repeat))
+    samples = [run(statement) - baseline for _ in range(repeat)]
+    return {"median": statistics.median(samples), "min": min(samples), "max": max(samples), "baseline": baseline}
+
+
+def import_profile(statement, python=None):
+    """
+    Desglose de `python -X importtime`, sin los módulos que ya carga el intérprete vacío
+
+    Returns:
+        Lista de (acumulado_us, propio_us, módulo) ordenada de mayor a menor acumulado
+    """
+    python = python or sys.executable
+
+    def run(code):
+        result = subprocess.run([python, "-X", "importtime", "-c", code],
+                                check=True, capture_output=True, text=True)
+        rows = []
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            own, cumulative, module = line[len("import time:"):].split("|")
+            rows.append((int(cumulative), int(own), module.strip()))
+        return rows
+
+    startup = {module for _, _, module in run("pass")}
+    return sorted((row for row in run(statement) if row[2] not in startup), reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tiempo de importación de EditTools")
+    parser.add_argument("--repeat", type=int, default=5, help="Intérpretes por caso")
+    parser.add_argument("--top", type=int, default=10, help="Módulos más lentos a mostrar por caso (0 = ninguno)")
+    parser.add_argument("cases", nargs="*", help=f"Casos a medir: {', '.join(IMPORT_CASES)}")
+    args = parser.parse_args(argv)
+
+    for name in args.cases or IMPORT_CASES:
+        statement = IMPORT_CASES.get(name, name)
+        stats = time_import(statement, repeat=args.repeat)
+        print(f"{name:<10} {stats['median'] * 1000:8.1f} ms  (min {stats['min'] * 1000:.1f}, max {stats['max'] * 1000:.1f})  {statement}")
+        if args.top:
+            for cumulative, _, module in import_profile(statement)[:args.top]:
+                print(f"    {cumulative / 1000:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
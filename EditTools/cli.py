@@ -0,0 +1,453 @@
+"""
+Línea de comandos para producir videos en lote a partir de un manifiesto
+
+Cada fila del manifiesto (JSONL o CSV) es un video:
+
+    {"id": "gatos", "topic": "mi gato habla", "background": "fondos/mc.mp4", "voice": "nova"}
+    {"id": "tio", "title": "Mi tío...", "text": "Todo empezó...", "background": "fondos/gta.mp4", "karaoke": true}
+
+Campos:
+    id: Nombre del trabajo (default: número de fila)
+    topic: Tema para SYSTEM_PROMPT_BY_TOPIC
+    source: Texto a reescribir con SYSTEM_PROMPT_REDDIT
+    title, text: Guion ya preparado (no se llama a la API de texto)
+    background: Video de fondo (obligatorio)
+    voice: Voz del TTS (default: alloy)
+    music: Música de fondo opcional
+    font: Fuente .ttf (default: --font)
+    nickname: Nickname de la tarjeta (default: chicodereddit)
+    card: Estilo de la tarjeta: reddit, facebook, x o none (default: reddit)
+    output: Ruta del video (default: <out-dir>/<id>.mp4)
+    Estilo: text_size, text_location, font_color, words, upper, lower, karaoke,
+        highlight_color, background_loop, smart_crop, subtitle_atlas, overlay_duration,
+        overlay_transition, music_volume, ducking, music_gap_volume
+
+Las rutas relativas de las entradas se resuelven desde la carpeta del manifiesto.
+
+Uso:
+    edittools manifiesto.jsonl --out-dir Videos --workers 4 --resume
+    edittools manifiesto.jsonl --workers auto --target-cpu 0.9 --memory-ceiling 0.8
+    edittools manifiesto.jsonl --metrics Videos/api_metrics.json
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+STYLE_FIELDS = {
+    "text_size": str,
+    "text_location": str,
+    "font_color": str,
+    "words": int,
+    "upper": "bool",
+    "lower": "bool",
+    "karaoke": "bool",
+    "highlight_color": str,
+    "background_loop": str,
+    "smart_crop": "bool",
+    "subtitle_atlas": "bool",
+    "overlay_duration": float,
+    "overlay_transition": str,
+    "music_volume": float,
+    "ducking": "bool",
+    "music_gap_volume": float,
+}
+
+INPUT_FIELDS = ("background", "music", "font")
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "si", "sí", "y")
+
+
+def read_manifest(path):
+    """
+    Lee el manifiesto (.jsonl o .csv) y devuelve la lista de filas como dicts
+
+    Raises:
+        ValueError: Si la extensión no es .jsonl, .json o .csv, o una fila no es válida
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in (".jsonl", ".json"):
+        rows = []
+        with open(path, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{number}: JSON inválido: {e}") from e
+        return rows
+    if suffix == ".csv":
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            return [{k: v for k, v in row.items() if v not in (None, "")} for row in csv.DictReader(f)]
+    raise ValueError(f"Formato de manifiesto no soportado: {path.suffix} (usa .jsonl o .csv)")
+
+
+def build_jobs(rows, manifest_path, out_dir, font=None):
+    """
+    Normaliza las filas del manifiesto a trabajos con rutas absolutas
+
+    Raises:
+        ValueError: Si una fila no tiene fondo, o no tiene ni tema ni guion
+    """
+    base = Path(manifest_path).resolve().parent
+    out_dir = Path(out_dir).resolve()
+    jobs = []
+    seen = set()
+    for index, row in enumerate(rows):
+        job_id = str(row.get("id", index))
+        if job_id in seen:
+            raise ValueError(f"id repetido en el manifiesto: {job_id}")
+        seen.add(job_id)
+
+        if not row.get("background"):
+            raise ValueError(f"Trabajo {job_id}: falta 'background'")
+        if not (row.get("topic") or row.get("source") or (row.get("title") and row.get("text"))):
+            raise ValueError(f"Trabajo {job_id}: se necesita 'topic', 'source' o 'title' + 'text'")
+
+        job = {
+            "id": job_id,
+            "topic": row.get("topic"),
+            "source": row.get("source"),
+            "title": row.get("title"),
+            "text": row.get("text"),
+            "voice": row.get("voice", "alloy"),
+            "nickname": row.get("nickname", "chicodereddit"),
+            "card": row.get("card", "reddit"),
+            "style": {},
+        }
+        for field in INPUT_FIELDS:
+            value = row.get(field, font if field == "font" else None)
+            job[field] = str((base / value).resolve()) if value else None
+        for field, kind in STYLE_FIELDS.items():
+            if field in row:
+                job["style"][field] = parse_bool(row[field]) if kind == "bool" else kind(row[field])
+
+        output = Path(row["output"]) if row.get("output") else Path(f"{job_id}.mp4")
+        job["output"] = str(output if output.is_absolute() else out_dir / output)
+        job["workdir"] = str(out_dir / "work" / job_id)
+        jobs.append(job)
+    return jobs
+
+
+def job_hash(job):
+    """ Hash de la definición del trabajo (sin las rutas de trabajo) """
+    definition = {k: v for k, v in job.items() if k not in ("workdir",)}
+    return hashlib.sha1(json.dumps(definition, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def record_path(job):
+    return Path(f"{job['output']}.job.json")
+
+
+def is_up_to_date(job):
+    """
+    True si el video existe, fue producido por esta misma definición del
+    trabajo y es más nuevo que todos sus archivos de entrada
+    """
+    output = Path(job["output"])
+    record = record_path(job)
+    if not output.exists() or not record.exists():
+        return False
+    try:
+        with open(record, "r", encoding="utf-8") as f:
+            if json.load(f).get("hash") != job_hash(job):
+                return False
+    except (OSError, json.JSONDecodeError):
+        return False
+    output_mtime = output.stat().st_mtime
+    for field in INPUT_FIELDS:
+        if job[field] and os.path.exists(job[field]) and os.path.getmtime(job[field]) > output_mtime:
+            return False
+    return True
+
+
+def write_record(job, timings):
+    record = record_path(job)
+    temp = record.with_name(f"{record.name}.{os.getpid()}.tmp")
+    with open(temp, "w", encoding="utf-8") as f:
+        json.dump({"hash": job_hash(job), "timings": timings, "finished": time.time()}, f, indent=2)
+    os.replace(temp, record)
+
+
+def generate_script(job, api_key, provider):
+    """ Devuelve (título, texto) del trabajo, llamando a la API de texto si hace falta """
+    from .GenAPI.GenAPI import TextGen
+    from .prompts import SYSTEM_PROMPT_BY_TOPIC, SYSTEM_PROMPT_REDDIT
+
+    if job["title"] and job["text"]:
+        return job["title"], job["text"]
+
+    gen = TextGen(api_key, SYSTEM_PROMPT_REDDIT, job["source"], provider=provider)
+    if job["topic"]:
+        response = gen.GenByTopic(job["topic"], SYSTEM_PROMPT_BY_TOPIC)
+    else:
+        response = gen.generate()
+    content = json.loads(response.choices[0].message.content)
+    return content["title"], content["text"]
+
+
+def write_script(script, path):
+    """ Guarda el guion generado en la carpeta de trabajo y lo devuelve """
+    title, text = script
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"title": title, "text": text}, f, ensure_ascii=False, indent=2)
+    return [title, text]
+
+
+def render_card(job, title, card_path):
+    from .ImageEdit.edit import EditImage, EditImageFaceBook, EditImageX
+
+    cards = {"reddit": EditImage, "facebook": EditImageFaceBook, "x": EditImageX}
+    if job["card"] not in cards:
+        raise ValueError(f"Trabajo {job['id']}: estilo de tarjeta desconocido: {job['card']}")
+    cards[job["card"]](job["nickname"], title, output_path=str(card_path))
+    return str(card_path)
+
+
+def estimate_duration(job):
+    """ Duración estimada del video en segundos (a ~150 palabras por minuto; 60s sin guion) """
+    if job["text"]:
+        return max(5.0, len(job["text"].split()) / 2.5)
+    return 60.0
+
+
+def job_cost(job):
+    """ Argumentos de RenderScheduler.estimate para un trabajo """
+    return {"duration": estimate_duration(job), "size": (1080, 1920), "fps": 24}
+
+
+def run_job(job, api_key=None, provider_name=None, profile=False, threads=64):
+    """
+    Ejecuta el pipeline completo de un trabajo: guion, tarjeta, TTS y video
+
+    Es una función de módulo para poder ejecutarse en un pool de procesos.
+    Cada etapa queda registrada en el manifiesto de la carpeta de trabajo
+    (ver JobDir), así al reintentar un trabajo fallido solo se repiten las
+    etapas cuyas entradas cambiaron o que no llegaron a terminar.
+
+    Returns:
+        dict con los tiempos de cada etapa en segundos
+    """
+    from .GenAPI.GenAPI import ClientTTS
+    from .GenAPI.metrics import registry
+    from .GenAPI.providers import get_provider
+    from .VideoEdit.video import VideoEditReddit
+    from .workdir import JobDir
+
+    profiler = None
+    if profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    # Las llamadas a las APIs de este trabajo se guardan aparte (ver write_metrics)
+    previous_job, registry.current_job = registry.current_job, job["id"]
+    timings = {}
+
+    def stage(name, function, *args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        timings[name] = time.perf_counter() - start
+        return result
+
+    try:
+        jobdir = JobDir(job["workdir"])
+        Path(job["output"]).parent.mkdir(parents=True, exist_ok=True)
+        provider = get_provider(provider_name, API_KEY=api_key)
+        backend = type(provider).__name__
+
+        script_path = jobdir.path("script.json")
+        script_params = {k: job[k] for k in ("topic", "source", "title", "text")}
+        title, text = stage(
+            "script", jobdir.run, "script",
+            lambda: write_script(generate_script(job, api_key, provider), script_path),
+            params=dict(script_params, provider=backend), outputs=[script_path]
+        )
+
+        card = None
+        if job["card"] != "none":
+            card_path = jobdir.path("card.png")
+            card = stage(
+                "card", jobdir.run, "card", lambda: render_card(job, title, card_path),
+                params={"card": job["card"], "nickname": job["nickname"], "title": title}, outputs=[card_path]
+            )
+
+        tts = ClientTTS(api_key, text, job["voice"], provider=provider)
+        tts_path = jobdir.path("tts.mp3")
+        stage(
+            "tts", jobdir.run, "tts", lambda: str(tts.generateTTS(tts_path, stream=True)),
+            params={"text": text, "voice": job["voice"], "provider": backend}, outputs=[tts_path]
+        )
+
+        editor = VideoEditReddit(
+            video_background=job["background"],
+            tts_audio=str(tts_path),
+            font=job["font"],
+            title=title if card else None,
+            music_audio=job["music"],
+            image_overlay=card,
+            openai_api_key=api_key,
+            provider=provider,
+            workdir=job["workdir"],
+            threads=threads,
+            **job["style"]
+        )
+        stage("video", editor.create_video, job["output"])
+        write_record(job, timings)
+        return timings
+    finally:
+        registry.current_job = previous_job
+        Path(job["workdir"]).mkdir(parents=True, exist_ok=True)
+        registry.to_json(Path(job["workdir"]) / "api_metrics.json", job=job["id"])
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(str(Path(job["workdir"]) / "profile.prof"))
+
+
+def print_profile(job):
+    import pstats
+
+    path = Path(job["workdir"]) / "profile.prof"
+    if path.exists():
+        print(f"\n[PROFILE] {job['id']} ({path})")
+        pstats.Stats(str(path)).sort_stats("cumulative").print_stats(15)
+
+
+def write_metrics(jobs, path):
+    """
+    Une las métricas de las APIs de cada trabajo y las guarda en JSON y en texto de Prometheus
+
+    Cada trabajo deja las suyas en <workdir>/api_metrics.json (los workers son
+    procesos aparte); el .prom se escribe junto al JSON.
+    """
+    from .GenAPI.metrics import CallMetrics
+
+    metrics = CallMetrics()
+    for job in jobs:
+        job_path = Path(job["workdir"]) / "api_metrics.json"
+        if job_path.exists():
+            with open(job_path, "r", encoding="utf-8") as f:
+                metrics.merge(json.load(f))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    metrics.to_json(path)
+    metrics.to_prometheus(path.with_suffix(".prom"))
+    for entry in metrics.snapshot()["series"]:
+        seconds = entry["seconds"]
+        print(f"[API] {entry['operation']} ({entry['model']}, {entry['endpoint']}): {entry['count']} llamadas, "
+              f"p50 {seconds['p50']:.2f}s p95 {seconds['p95']:.2f}s p99 {seconds['p99']:.2f}s, "
+              f"{entry['errors']} errores, {entry['retries']} reintentos, ${entry['cost']:.4f}")
+    print(f"Métricas de las APIs en: {path} y {path.with_suffix('.prom')}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="edittools", description="Produce videos en lote a partir de un manifiesto JSONL o CSV")
+    parser.add_argument("manifest", help="Manifiesto .jsonl o .csv")
+    parser.add_argument("--out-dir", default="Videos", help="Carpeta de salida (default: Videos)")
+    parser.add_argument("--workers", default="1", help="Trabajos en paralelo (procesos), o 'auto' para admitirlos según CPU y memoria")
+    parser.add_argument("--target-cpu", type=float, default=0.85, help="Con --workers auto: uso de CPU objetivo (0-1)")
+    parser.add_argument("--memory-ceiling", type=float, default=0.85, help="Con --workers auto: techo de memoria (fracción 0-1 o bytes)")
+    parser.add_argument("--resume", action="store_true", help="Saltar los trabajos cuyo video ya existe y está al día")
+    parser.add_argument("--dry-run", action="store_true", help="Mostrar qué se haría sin ejecutar nada")
+    parser.add_argument("--profile", action="store_true", help="Perfilar cada trabajo con cProfile e imprimir los tiempos por etapa")
+    parser.add_argument("--font", default=None, help="Fuente .ttf por defecto para los subtítulos")
+    parser.add_argument("--provider", default=None, help="Backend de las APIs: openai o local (default: EDITTOOLS_PROVIDER u openai)")
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY"), help="API key (default: OPENAI_API_KEY)")
+    parser.add_argument("--metrics", default=None, help="Guardar latencias (p50/p95/p99), reintentos, bytes, tokens y costo de las llamadas a las APIs en este JSON (y un .prom de Prometheus)")
+    args = parser.parse_args(argv)
+    if args.workers != "auto":
+        try:
+            args.workers = int(args.workers)
+        except ValueError:
+            parser.error("--workers debe ser un número o 'auto'")
+
+    try:
+        jobs = build_jobs(read_manifest(args.manifest), args.manifest, args.out_dir, font=args.font)
+    except (OSError, ValueError) as e:
+        print(f"Error en el manifiesto: {e}", file=sys.stderr)
+        return 2
+
+    pending = []
+    for job in jobs:
+        if args.resume and is_up_to_date(job):
+            print(f"[SKIP] {job['id']}: {job['output']} está al día")
+            continue
+        missing = [job[f] for f in INPUT_FIELDS if job[f] and not os.path.exists(job[f])]
+        if not job["font"]:
+            missing.append("font (usa --font o el campo 'font')")
+        if missing:
+            print(f"[ERROR] {job['id']}: faltan archivos: {', '.join(missing)}")
+            continue
+        pending.append(job)
+
+    if args.dry_run:
+        for job in pending:
+            source = "guion" if job["title"] and job["text"] else ("tema" if job["topic"] else "texto fuente")
+            print(f"[PLAN] {job['id']}: {source} -> {job['output']}")
+        print(f"{len(pending)} de {len(jobs)} trabajos por ejecutar")
+        return 0
+
+    print(f"Ejecutando {len(pending)} de {len(jobs)} trabajos con {args.workers} workers")
+    failed = []
+    results = {}
+    start = time.perf_counter()
+    options = dict(api_key=args.api_key, provider_name=args.provider, profile=args.profile)
+
+    def report(job, result, error):
+        if error is None:
+            results[job["id"]] = result
+            print(f"[OK] {job['id']}: {job['output']}")
+        else:
+            print(f"[ERROR] {job['id']}: {error}")
+            failed.append(job["id"])
+
+    if args.workers == "auto":
+        from .scheduler import RenderScheduler
+
+        scheduler = RenderScheduler(target_cpu=args.target_cpu, memory_ceiling=args.memory_ceiling)
+        scheduler.run(pending, run_job, cost=job_cost, on_done=report, **options)
+    elif args.workers <= 1:
+        for job in pending:
+            try:
+                report(job, run_job(job, **options), None)
+            except Exception as e:
+                report(job, None, e)
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = {executor.submit(run_job, job, **options): job for job in pending}
+            for future in as_completed(futures):
+                try:
+                    report(futures[future], future.result(), None)
+                except Exception as e:
+                    report(futures[future], None, e)
+
+    elapsed = time.perf_counter() - start
+    if args.profile:
+        for job in pending:
+            if job["id"] in results:
+                stages = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in results[job["id"]].items())
+                print(f"[TIMING] {job['id']}: {stages}")
+                print_profile(job)
+    if args.metrics:
+        write_metrics(pending, args.metrics)
+    print(f"{len(results)} videos en {elapsed:.1f}s, {len(failed)} fallidos")
+    if failed:
+        print(f"Fallidos: {', '.join(failed)} (vuelve a ejecutar con --resume)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import os
+import time
+import psutil
+
+class RenderScheduler:
+    def __init__(self, max_jobs=None, target_cpu=0.85, memory_ceiling=0.85, sample_interval=1.0, min_threads=1, max_threads=None, base_memory=600 * 2**20, frame_buffers=24):
+        """
+        Planificador adaptativo de renders según la telemetría del host (psutil)
+
+        En lugar de un número fijo de workers, admite un nuevo render solo si
+        el uso de CPU y la carga están por debajo del objetivo y si la memoria
+        estimada del trabajo cabe bajo el techo. Los hilos de ffmpeg de cada
+        render se reparten entre los núcleos según los renders en curso.
+
+        El costo de un trabajo se estima con su duración y resolución: la
+        memoria decide si se admite, y el trabajo (pixeles-cuadro) decide el
+        orden, del más corto al más largo, para que los resultados lleguen
+        cuanto antes. La estimación de memoria se corrige con el RSS real
+        medido de los procesos hijos mientras corren los renders.
+
+        Args:
+            max_jobs: Renders simultáneos como máximo (default: núcleos)
+            target_cpu: Uso de CPU objetivo (0-1); por encima no se admiten trabajos
+            memory_ceiling: Techo de memoria usada del host, como fracción (0-1) o en bytes
+            sample_interval: Segundos entre muestras de telemetría
+            min_threads: Hilos mínimos de ffmpeg por render
+            max_threads: Hilos máximos de ffmpeg por render (default: núcleos)
+            base_memory: Memoria fija estimada de un render (intérprete, moviepy, ffmpeg)
+            frame_buffers: Cuadros RGBA completos que un render mantiene en memoria
+        """
+        self.cpu_count = os.cpu_count() or 1
+        self.max_jobs = max_jobs or self.cpu_count
+        self.target_cpu = target_cpu
+        total = psutil.virtual_memory().total
+        self.memory_ceiling = memory_ceiling * total if memory_ceiling <= 1 else memory_ceiling
+        self.sample_interval = sample_interval
+        self.min_threads = min_threads
+        self.max_threads = max_threads or self.cpu_count
+        self.base_memory = base_memory
+        self.frame_buffers = frame_buffers
+        self.memory_scale = 1.0  # Corrección aprendida: RSS medido / RSS estimado
+        self.last_admit = 0.0
+        self.peak_rss = 0
+        psutil.cpu_percent(interval=None)  # La primera llamada solo fija la referencia
+
+    def sample(self):
+        """ Telemetría del host: CPU (0-1), carga por núcleo, memoria usada y RSS de los procesos hijos """
+        memory = psutil.virtual_memory()
+        children_rss = 0
+        for child in psutil.Process().children(recursive=True):
+            try:
+                children_rss += child.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        self.peak_rss = max(self.peak_rss, children_rss)
+        return {
+            "cpu": psutil.cpu_percent(interval=None) / 100.0,
+            "load": psutil.getloadavg()[0] / self.cpu_count,
+            "memory_used": memory.total - memory.available,
+            "memory_total": memory.total,
+            "children_rss": children_rss,
+        }
+
+    def estimate(self, duration, size=(1080, 1920), fps=24):
+        """
+        Costo estimado de un render
+
+        Returns:
+            dict con "memory" (bytes, con la corrección aprendida) y "work"
+            (pixeles-cuadro a codificar, para ordenar los trabajos)
+        """
+        width, height = size
+        memory = self.base_memory + width * height * 4 * self.frame_buffers
+        return {"memory": memory * self.memory_scale, "work": duration * fps * width * height}
+
+    def threads_for(self, running):
+        """ Hilos de ffmpeg para un render nuevo cuando habrá `running` renders en curso """
+        return max(self.min_threads, min(self.max_threads, self.cpu_count // max(1, running)))
+
+    def admit(self, estimate, running):
+        """
+        True si se puede empezar un render con este costo estimado
+
+        Siempre se admite un render si no hay ninguno en curso, para no
+        bloquear trabajos cuya estimación supera el techo por sí sola.
+        """
+        if not running:
+            return True
+        if len(running) >= self.max_jobs:
+            return False
+        # Esperar una muestra tras cada admisión: un render recién lanzado aún no usa CPU ni memoria
+        if time.monotonic() - self.last_admit < self.sample_interval:
+            return False
+
+        stats = self.sample()
+        if stats["cpu"] > self.target_cpu or stats["load"] > self.target_cpu:
+            return False
+        # Memoria que los renders en curso aún pueden pedir según su estimación
+        reserved = max(0, sum(e["memory"] for e in running.values()) - stats["children_rss"])
+        return stats["memory_used"] + reserved + estimate["memory"] <= self.memory_ceiling
+
+    def observe(self, running):
+        """ Ajusta la corrección de memoria con el RSS medido de los renders en curso """
+        if not running:
+            return
+        stats = self.sample()
+        estimated = sum(e["memory"] for e in running.values()) / self.memory_scale
+        if estimated > 0 and stats["children_rss"] > 0:
+            measured = stats["children_rss"] / estimated
+            # Solo se corrige hacia arriba mientras corren (al arrancar el RSS aún es bajo)
+            if measured > self.memory_scale:
+                self.memory_scale = 0.7 * self.memory_scale + 0.3 * measured
+
+    def run(self, jobs, function, cost, on_done=None, **kwargs):
+        """
+        Ejecuta function(job, threads=N, **kwargs) para cada trabajo en un pool de procesos
+
+        Los trabajos se admiten del de menor "work" estimado al de mayor; el
+        índice de cada trabajo en los resultados sigue siendo el de `jobs`.
+
+        Args:
+            jobs: Lista de trabajos
+            function: Función de módulo (debe poder enviarse a otro proceso)
+            cost: Función job -> dict de argumentos de estimate() (duration, size, fps)
+            on_done: Callback opcional(job, result, error) al terminar cada trabajo
+
+        Returns:
+            (results, errors): dicts {índice del trabajo: resultado o excepción}
+        """
+        # Shortest-work-first: el trabajo no cambia, la memoria se re-estima al admitir
+        queue = sorted(enumerate(jobs), key=lambda item: self.estimate(**cost(item[1]))["work"])
+        running = {}
+        futures = {}
+        results, errors = {}, {}
+
+        with ProcessPoolExecutor(max_workers=self.max_jobs) as executor:
+            while queue or futures:
+                while queue:
+                    index, job = queue[0]
+                    estimate = self.estimate(**cost(job))
+                    if not self.admit(estimate, running):
+                        break
+                    queue.pop(0)
+                    threads = self.threads_for(len(running) + 1)
+                    print(f"[DEBUG] Admitido trabajo {index} ({len(running) + 1} en curso, {threads} hilos, ~{estimate['memory'] / 2**20:.0f} MB)")
+                    future = executor.submit(function, job, threads=threads, **kwargs)
+                    futures[future] = index
+                    running[future] = estimate
+                    self.last_admit = time.monotonic()
+
+                done, _ = wait(futures, timeout=self.sample_interval, return_when=FIRST_COMPLETED)
+                self.observe(running)
+                for future in done:
+                    index = futures.pop(future)
+                    running.pop(future)
+                    try:
+                        results[index] = future.result()
+                    except Exception as e:
+                        errors[index] = e
+                    if on_done:
+                        on_done(jobs[index], results.get(index), errors.get(index))
+
+        print(f"[DEBUG] Pico de RSS de los renders: {self.peak_rss / 2**20:.0f} MB, corrección de memoria x{self.memory_scale:.2f}")
+        return results, errors
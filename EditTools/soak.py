@@ -0,0 +1,272 @@
+"""
+Prueba de resistencia (soak) de los renders en un solo proceso
+
+Ejecuta cientos de create_video sintéticos seguidos, sin red (LocalProvider),
+con fallos inyectados cada tanto, y mide después de cada trabajo el RSS, los
+descriptores de archivo abiertos, los procesos hijos (ffmpeg huérfanos) y la
+memoria de Python (tracemalloc). Falla si el crecimiento entre el inicio
+(tras el calentamiento) y el final supera los umbrales.
+
+Uso:
+    python -m EditTools.soak
+    python -m EditTools.soak --iterations 300 --fail-every 4 --max-rss-growth 64
+"""
+import argparse
+import gc
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import psutil
+
+FAILURES = ("background", "transcription", "encode")
+
+SCRIPT_TEXT = "My roommate found a weird box in the attic. Nobody believed me at first."
+
+
+def make_fixtures(directory, provider):
+    """
+    Genera las entradas sintéticas del soak: fondo apaisado corto, música y TTS
+
+    Returns:
+        dict con las rutas "background", "music" y "tts"
+    """
+    from moviepy.config import FFMPEG_BINARY
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    background = directory / "background.mp4"
+    music = directory / "music.wav"
+    tts = directory / "tts.wav"
+
+    subprocess.run([
+        FFMPEG_BINARY, "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", "testsrc2=size=320x180:rate=24:duration=2",
+        "-pix_fmt", "yuv420p", str(background),
+    ], check=True)
+    subprocess.run([
+        FFMPEG_BINARY, "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", "sine=frequency=220:duration=3",
+        str(music),
+    ], check=True)
+
+    # Con el .local.json el LocalProvider transcribe el TTS con sus tiempos exactos
+    data, known = provider.speech(SCRIPT_TEXT, response_format="wav")
+    tts.write_bytes(data)
+    with open(f"{tts}.local.json", 'w', encoding='utf-8') as f:
+        json.dump(known, f)
+
+    return {"background": str(background), "music": str(music), "tts": str(tts)}
+
+
+class FailingProvider:
+    """ Proveedor cuya transcripción siempre falla (fallo inyectado "transcription") """
+    def __init__(self, provider):
+        self.provider = provider
+
+    def client(self):
+        client = self.provider.client()
+
+        def transcribe(**kwargs):
+            raise RuntimeError("Fallo inyectado en la transcripción")
+
+        client.audio.transcriptions.create = transcribe
+        return client
+
+    def async_client(self):
+        return self.provider.async_client()
+
+
+def measure(process):
+    """ Recursos del proceso: RSS, descriptores abiertos, procesos hijos y memoria de Python """
+    children = process.children(recursive=True)
+    return {
+        "rss": process.memory_info().rss,
+        "fds": process.num_fds() if psutil.POSIX else process.num_handles(),
+        "children": len(children),
+        "zombies": sum(1 for child in children if child.status() == psutil.STATUS_ZOMBIE),
+        "traced": tracemalloc.get_traced_memory()[0],
+    }
+
+
+def run_job(fixtures, output_dir, provider, font, failure=None, threads=1):
+    """
+    Un create_video sintético, con un fallo inyectado opcional
+
+    Returns:
+        None si terminó bien, o el mensaje de la excepción
+    """
+    from .VideoEdit.video import VideoEditReddit
+    from .VideoEdit.outputs import OutputTarget
+
+    output_path = Path(output_dir) / "soak.mp4"
+    outputs = None
+    if failure == "encode":
+        # ffmpeg rechaza el codec: falla la escritura con la composición ya abierta
+        outputs = [OutputTarget(output_path, codec="codec_inexistente")]
+
+    editor = VideoEditReddit(
+        video_background=fixtures["background"] if failure != "background" else str(Path(output_dir) / "no_existe.mp4"),
+        tts_audio=fixtures["tts"],
+        font=font,
+        title="Soak",
+        music_audio=fixtures["music"],
+        provider=FailingProvider(provider) if failure == "transcription" else provider,
+        card=("reddit", "soak", "Prueba de resistencia"),
+        threads=threads,
+    )
+    try:
+        editor.create_video(output_path, outputs=outputs, export_subtitles=False)
+        return None
+    except Exception as e:
+        if failure is None:
+            raise
+        return str(e)
+
+
+def soak(iterations=200, warmup=10, fail_every=5, window=10, workdir=None, font=None, threads=1, on_sample=None):
+    """
+    Ejecuta el soak y devuelve las muestras y el crecimiento de cada recurso
+
+    Args:
+        iterations: Trabajos a ejecutar
+        warmup: Trabajos iniciales que no cuentan (caches, imports, asignadores)
+        fail_every: Cada cuántos trabajos se inyecta un fallo (0 = nunca); rota entre FAILURES
+        window: Muestras promediadas (mediana) al inicio y al final para medir el crecimiento
+        workdir: Carpeta de entradas y salidas (default: una temporal)
+        font: Fuente de los subtítulos (default: la fuente de ImageEdit)
+        threads: Hilos de ffmpeg por render
+        on_sample: Callback opcional(iteración, muestra)
+
+    Returns:
+        dict con "samples", "growth" (final - inicial por recurso), "failures"
+        (fallos inyectados que terminaron en excepción), "top" (líneas con más
+        crecimiento según tracemalloc) y "seconds"
+    """
+    from .GenAPI.providers import LocalProvider
+
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="edittools_soak_"))
+    font = font or str(Path(__file__).parent / "ImageEdit" / "Grotesk_Bold.ttf")
+    provider = LocalProvider()
+    fixtures = make_fixtures(workdir / "fixtures", provider)
+    output_dir = workdir / "out"
+    process = psutil.Process()
+
+    tracemalloc.start()
+    samples = []
+    failures = []
+    baseline_snapshot = None
+    start = time.perf_counter()
+    for i in range(iterations):
+        failure = None
+        if fail_every and (i + 1) % fail_every == 0:
+            failure = FAILURES[((i + 1) // fail_every - 1) % len(FAILURES)]
+
+        error = run_job(fixtures, output_dir, provider, font, failure, threads)
+        if failure:
+            failures.append({"iteration": i, "failure": failure, "error": error})
+        gc.collect()
+
+        sample = dict(measure(process), iteration=i, failure=failure)
+        samples.append(sample)
+        if on_sample:
+            on_sample(i, sample)
+        if i == warmup - 1:
+            baseline_snapshot = tracemalloc.take_snapshot()
+
+    top = []
+    if baseline_snapshot is not None:
+        stats = tracemalloc.take_snapshot().compare_to(baseline_snapshot, "lineno")
+        top = [str(stat) for stat in stats[:10]]
+    tracemalloc.stop()
+
+    measured = samples[warmup:] or samples
+    head, tail = measured[:window], measured[-window:]
+    growth = {
+        key: statistics.median(s[key] for s in tail) - statistics.median(s[key] for s in head)
+        for key in ("rss", "fds", "children", "zombies", "traced")
+    }
+    # Procesos hijos al final, sin mediana: uno solo ya es un ffmpeg huérfano
+    growth["children"] = max(growth["children"], samples[-1]["children"] - head[0]["children"])
+    return {
+        "samples": samples,
+        "growth": growth,
+        "failures": failures,
+        "top": top,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def check(report, max_rss_growth=64 * 2**20, max_fd_growth=4, max_children=0, max_traced_growth=16 * 2**20):
+    """
+    Compara el crecimiento con los umbrales
+
+    Returns:
+        Lista de mensajes, vacía si el soak pasó
+    """
+    growth = report["growth"]
+    limits = (
+        ("rss", max_rss_growth, lambda v: f"{v / 2**20:.1f} MB"),
+        ("fds", max_fd_growth, str),
+        ("children", max_children, str),
+        ("traced", max_traced_growth, lambda v: f"{v / 2**20:.1f} MB"),
+    )
+    return [
+        f"{key}: creció {fmt(growth[key])} (máximo {fmt(limit)})"
+        for key, limit, fmt in limits if growth[key] > limit
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de resistencia de los renders en un solo proceso")
+    parser.add_argument("--iterations", type=int, default=200, help="Trabajos a ejecutar")
+    parser.add_argument("--warmup", type=int, default=10, help="Trabajos iniciales que no cuentan")
+    parser.add_argument("--fail-every", type=int, default=5, help="Inyectar un fallo cada N trabajos (0 = nunca)")
+    parser.add_argument("--window", type=int, default=10, help="Muestras para la mediana inicial y final")
+    parser.add_argument("--workdir", help="Carpeta de entradas y salidas (default: temporal)")
+    parser.add_argument("--threads", type=int, default=1, help="Hilos de ffmpeg por render")
+    parser.add_argument("--max-rss-growth", type=float, default=64, help="Crecimiento máximo de RSS en MB")
+    parser.add_argument("--max-fd-growth", type=int, default=4, help="Crecimiento máximo de descriptores abiertos")
+    parser.add_argument("--max-children", type=int, default=0, help="Procesos hijos de más permitidos al final")
+    parser.add_argument("--max-traced-growth", type=float, default=16, help="Crecimiento máximo de tracemalloc en MB")
+    parser.add_argument("--json", help="Guardar las muestras y el resultado en este archivo")
+    args = parser.parse_args(argv)
+
+    def report_sample(i, sample):
+        print(f"[SOAK] {i + 1}/{args.iterations} rss={sample['rss'] / 2**20:.1f}MB fds={sample['fds']} "
+              f"hijos={sample['children']} traced={sample['traced'] / 2**20:.1f}MB"
+              + (f" fallo={sample['failure']}" if sample['failure'] else ""), file=sys.stderr)
+
+    report = soak(args.iterations, args.warmup, args.fail_every, args.window,
+                  workdir=args.workdir, threads=args.threads, on_sample=report_sample)
+    problems = check(report, args.max_rss_growth * 2**20, args.max_fd_growth,
+                     args.max_children, args.max_traced_growth * 2**20)
+
+    growth = report["growth"]
+    print(f"{args.iterations} trabajos en {report['seconds']:.1f}s, {len(report['failures'])} fallos inyectados")
+    print(f"Crecimiento: rss {growth['rss'] / 2**20:+.1f} MB, fds {growth['fds']:+}, hijos {growth['children']:+}, "
+          f"zombies {growth['zombies']:+}, tracemalloc {growth['traced'] / 2**20:+.1f} MB")
+    uncaught = [f for f in report["failures"] if f["error"] is None]
+    if uncaught:
+        problems.append(f"{len(uncaught)} fallos inyectados no produjeron error")
+    if problems:
+        print("Mayor crecimiento según tracemalloc:")
+        for line in report["top"]:
+            print(f"  {line}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(dict(report, problems=problems), f, indent=2, default=str)
+
+    for problem in problems:
+        print(f"[FALLO] {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
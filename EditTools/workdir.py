@@ -0,0 +1,117 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import time
+
+class JobDir:
+    MANIFEST = "stages.json"
+
+    def __init__(self, path):
+        """
+        Carpeta de trabajo de un video con un manifiesto de etapas (estilo make)
+
+        Cada etapa (guion, tarjeta, TTS, subtítulos, render) se registra en
+        stages.json con el hash del contenido de sus archivos de entrada, el
+        hash de sus parámetros y sus archivos de salida. Al volver a ejecutar,
+        una etapa se salta si sus entradas y parámetros no cambiaron y sus
+        salidas siguen intactas, así un fallo en el render no obliga a pagar
+        otra vez el guion, el TTS ni la transcripción.
+
+        Args:
+            path: Carpeta de trabajo (se crea si no existe)
+        """
+        self.root = Path(path)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.root / self.MANIFEST
+        self._digests = {}
+        self.stages = {}
+        if self.manifest_path.exists():
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    self.stages = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"[DEBUG] Manifiesto de etapas ilegible, se ignora: {e}")
+
+    def path(self, name):
+        """ Ruta de un archivo dentro de la carpeta de trabajo """
+        return self.root / name
+
+    def file_hash(self, path):
+        """ Hash del contenido del archivo, memorizado por (ruta, tamaño, mtime) """
+        path = Path(path)
+        stat = path.stat()
+        memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._digests:
+            digest = hashlib.sha1()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            self._digests[memo_key] = digest.hexdigest()
+        return self._digests[memo_key]
+
+    def key(self, inputs=None, params=None):
+        """ Clave de una etapa: hash de cada archivo de entrada y de los parámetros """
+        hashes = {}
+        for name, path in sorted((inputs or {}).items()):
+            hashes[name] = self.file_hash(path) if path and os.path.exists(path) else None
+        params = json.dumps(params or {}, sort_keys=True, default=str)
+        return {"inputs": hashes, "params": hashlib.sha1(params.encode("utf-8")).hexdigest()}
+
+    @staticmethod
+    def stamp(path):
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def is_fresh(self, stage, inputs=None, params=None):
+        """ True si la etapa ya se ejecutó con las mismas entradas y sus salidas no cambiaron """
+        record = self.stages.get(stage)
+        if not record or {k: record.get(k) for k in ("inputs", "params")} != self.key(inputs, params):
+            return False
+        for path, stamp in record.get("outputs", {}).items():
+            if not os.path.exists(path) or self.stamp(path) != stamp:
+                return False
+        return True
+
+    def record(self, stage, inputs=None, params=None, outputs=None, result=None):
+        """ Registra una etapa terminada y guarda el manifiesto (escritura atómica) """
+        self.stages[stage] = dict(
+            self.key(inputs, params),
+            outputs={str(p): self.stamp(p) for p in (outputs or []) if p and os.path.exists(p)},
+            result=result,
+            finished=time.time(),
+        )
+        temp_path = self.manifest_path.with_name(f"{self.MANIFEST}.{os.getpid()}.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.stages, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.manifest_path)
+
+    def invalidate(self, stage):
+        """ Fuerza a que la etapa se vuelva a ejecutar """
+        self.stages.pop(stage, None)
+
+    def run(self, stage, function, inputs=None, params=None, outputs=None):
+        """
+        Ejecuta function() salvo que la etapa esté al día
+
+        Args:
+            stage: Nombre de la etapa
+            function: Función sin argumentos que produce las salidas. Su resultado
+                debe ser serializable a JSON, se guarda y se devuelve al saltar la etapa
+            inputs: Dict {nombre: ruta} de archivos de entrada
+            params: Parámetros que afectan el resultado (serializables a JSON)
+            outputs: Rutas de los archivos que produce la etapa, o función que
+                recibe el resultado y devuelve esas rutas
+
+        Returns:
+            El resultado de function(), o el guardado si la etapa se saltó
+        """
+        if self.is_fresh(stage, inputs, params):
+            print(f"[DEBUG] Etapa '{stage}' al día, se reutiliza")
+            return self.stages[stage].get("result")
+
+        result = function()
+        if callable(outputs):
+            outputs = outputs(result)
+        self.record(stage, inputs, params, outputs, result)
+        return result
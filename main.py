@@ -29,8 +29,9 @@ content = json.loads(response.choices[0].message.content)
 title = content["title"]
 nickname = "chicodereddit"
 
-# Generar imagen
-EditImage(nickname, title)
+# Generar imagen (en la misma ruta que lee el editor de video)
+overlay_image = str(BASE_DIR / "imagen_editada.png")
+EditImage(nickname, title, output_path=overlay_image)
 print("Imagen generada")
 
 text = content["text"]
@@ -48,7 +49,6 @@ print("Test del editor de video")
 # Definir rutas completas para los archivos
 background_video = str(BASE_DIR / "videobackground.mp4")
 music_audio = str(BASE_DIR / "musictiktok.mp3")
-overlay_image = str(BASE_DIR / "imagen_editada.png")
 tts_audio = str(output_path)  # El audio que generó ClientTTS
 
 fontpath = str(BASE_DIR / "Arial_Bold.ttf")
@@ -82,7 +82,8 @@ video_editor = VideoEditReddit(
     image_overlay=overlay_image,
     subtitles_path=subtitles_path,
     overlay_duration=3,
-    openai_api_key=API_KEY
+    openai_api_key=API_KEY,
+    workdir=str(BASE_DIR / "work")  # Reintentos reutilizan subtítulos y render si no cambiaron
 )
 
 # Generar el video final
@@ -0,0 +1,45 @@
+"""
+Agrupación de palabras en cues y duración mínima sin superposiciones
+"""
+from EditTools.GenAPI.providers import LocalProvider
+from EditTools.VideoEdit.cues import CueList
+from EditTools.VideoEdit.subt import Subt
+
+RESPONSE = {
+    "words": [
+        {"word": "Hola", "start": 0.0, "end": 0.2},
+        {"word": "mundo.", "start": 0.2, "end": 0.4},
+        {"word": "Esto", "start": 0.5, "end": 0.7},
+        {"word": "es", "start": 0.7, "end": 0.8},
+        {"word": "una", "start": 0.8, "end": 0.9},
+        {"word": "prueba", "start": 0.9, "end": 1.2},
+        {"word": "final", "start": 3.0, "end": 3.3},
+    ]
+}
+
+
+def subt(**kwargs):
+    return Subt("test", provider=LocalProvider(), **kwargs)
+
+
+def test_min_duration_stops_at_the_next_cue():
+    cues = subt().extend_cues(subt().group_words(RESPONSE, words_per_subtitle=4), min_duration=1.5)
+
+    assert [cue["text"] for cue in cues] == ["Hola mundo.", "Esto es una prueba", "Final"]
+    for cue, following in zip(cues, cues[1:]):
+        assert cue["end"] <= following["start"]
+    # Se alarga solo hasta el siguiente cue, o hasta min_duration si hay espacio
+    assert cues[0]["end"] == cues[1]["start"]
+    assert cues[1]["end"] == cues[1]["start"] + 1.5
+    assert cues[2]["end"] == cues[2]["start"] + 1.5
+    assert all(CueList(cues).lookup(cue["start"]) == i for i, cue in enumerate(cues))
+
+
+def test_srt_matches_the_rendered_cues():
+    generator = subt(Final_screen=True, Text_final="Gracias")
+
+    srt = generator.convert_whisper_to_srt(RESPONSE, words_per_subtitle=4, min_duration=1.0)
+
+    cues = generator.extend_cues(generator.group_words(RESPONSE, words_per_subtitle=4), min_duration=1.0)
+    assert srt == CueList(cues).to_srt()
+    assert srt.rstrip().endswith("Gracias")
@@ -0,0 +1,50 @@
+"""
+Render completo en modo HLS: la playlist queda junto a sus segmentos
+"""
+from pathlib import Path
+import wave
+
+import numpy as np
+from moviepy import ColorClip
+
+from EditTools.VideoEdit.video import VideoEditReddit
+
+FONT = Path(__file__).resolve().parent.parent / "Arial_Bold.ttf"
+
+
+def make_inputs(tmp_path, seconds=3):
+    background = tmp_path / "bg.mp4"
+    ColorClip((180, 320), color=(40, 90, 160), duration=seconds).write_videofile(
+        str(background), fps=24, codec="libx264", preset="ultrafast", logger=None
+    )
+    tts = tmp_path / "tts.wav"
+    t = np.arange(int(seconds * 16000)) / 16000
+    with wave.open(str(tts), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes((0.3 * np.sin(2 * np.pi * 440 * t) * 32767).astype('<i2').tobytes())
+    return background, tts
+
+
+def test_hls_render_keeps_its_playlist(tmp_path):
+    background, tts = make_inputs(tmp_path)
+    editor = VideoEditReddit(
+        video_background=str(background),
+        tts_audio=str(tts),
+        font=str(FONT),
+        audio_cache_dir=tmp_path / "audio_cache",
+        loop_cache_dir=tmp_path / "loop_cache",
+        threads=1,
+    )
+
+    written = editor.create_video(tmp_path / "out" / "video.mp4", generate_subs=False, output_mode="hls")
+
+    playlist = tmp_path / "out" / "video.m3u8"
+    assert written == [str(playlist)]
+    assert playlist.exists()
+    lines = playlist.read_text().splitlines()
+    assert lines[-1] == "#EXT-X-ENDLIST"
+    listed = [line for line in lines if line and not line.startswith("#")]
+    segments = sorted(path.name for path in playlist.parent.glob("video_*.m4s"))
+    assert listed == segments and len(segments) >= 2
@@ -0,0 +1,74 @@
+"""
+Transcripción del LocalProvider: el texto de la narración, también en fragmentos y en otro proceso
+
+Cada prueba sintetiza con un LocalProvider y transcribe con otro, sin el
+registro en memoria del primero, como un worker de la CLI en otro proceso.
+"""
+import re
+
+from EditTools.GenAPI.GenAPI import ClientTTS
+from EditTools.GenAPI.providers import LocalProvider
+from EditTools.VideoEdit.subt import Subt
+
+TEXT = (
+    "My roommate found a weird box in the attic. Nobody believed me at first. "
+    "Then the box started humming every night at three. We finally opened it "
+    "together and inside there was a tiny radio tuned to a station that does not exist. "
+    "It kept playing the same song from our childhood, over and over again."
+)
+
+
+def expected_words(text):
+    return [word.strip('.,!?;:"') for word in text.split()]
+
+
+def transcribe(path, tmp_path, chunk_seconds=None):
+    subt = Subt("test", provider=LocalProvider(), audio_cache_dir=tmp_path / "audio_cache")
+    return subt.transcribe_audio(path, chunk_seconds=chunk_seconds, workers=2)
+
+
+def test_streamed_tts_transcribes_to_the_narration(tmp_path):
+    path = ClientTTS("test", TEXT, "alloy", provider=LocalProvider()).generateTTS(tmp_path / "tts.mp3", stream=True)
+
+    transcription = transcribe(path, tmp_path)
+
+    assert [word["word"] for word in transcription["words"]] == expected_words(TEXT)
+
+
+def test_chunked_transcription_uses_the_narration_text(tmp_path):
+    path = ClientTTS("test", TEXT, "alloy", provider=LocalProvider()).generateTTS(tmp_path / "tts.mp3", stream=True)
+    whole = transcribe(path, tmp_path)
+
+    chunked = transcribe(path, tmp_path, chunk_seconds=5)
+
+    assert [word["word"] for word in chunked["words"]] == expected_words(TEXT)
+    for word, reference in zip(chunked["words"], whole["words"]):
+        assert abs(word["start"] - reference["start"]) < 0.05
+        assert abs(word["end"] - reference["end"]) < 0.05
+    # Los fragmentos se borran, sin dejar archivos de Subt junto al audio
+    assert not [p for p in tmp_path.iterdir() if re.search(r"\.part\d+\.wav", p.name)]
+
+
+def test_chunked_tts_writes_a_joined_sidecar(tmp_path):
+    tts = ClientTTS("test", TEXT, "alloy", provider=LocalProvider())
+    path = tts.generateTTS_chunked(tmp_path / "tts.wav", max_chars=80, workers=2)
+
+    transcription = transcribe(path, tmp_path)
+
+    assert len(tts.chunks) > 1
+    assert [word["word"] for word in transcription["words"]] == expected_words(TEXT)
+    assert not list(tmp_path.glob("*_chunk*"))
+
+
+def test_registry_keeps_only_recent_narrations(tmp_path):
+    texts = ["First story.", "The second story here.", "And then a third short story."]
+    provider = LocalProvider(registry_size=2)
+    paths = [
+        ClientTTS("test", text, "alloy", provider=provider).generateTTS(tmp_path / f"tts{i}.mp3", stream=True)
+        for i, text in enumerate(texts)
+    ]
+
+    assert [narration["text"] for narration in provider.registry.values()] == texts[1:]
+    # La narración que salió del registro se sigue transcribiendo desde su sidecar
+    subt = Subt("test", provider=provider, audio_cache_dir=tmp_path / "audio_cache")
+    assert [word["word"] for word in subt.transcribe_audio(paths[0])["words"]] == ["First", "story"]
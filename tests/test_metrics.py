@@ -0,0 +1,34 @@
+"""
+CallMetrics: segundos de audio de las llamadas de TTS
+"""
+import numpy as np
+import pytest
+from moviepy import AudioArrayClip
+
+from EditTools.GenAPI.GenAPI import ClientTTS
+from EditTools.GenAPI.metrics import CallMetrics
+from EditTools.GenAPI.providers import LocalProvider
+
+TEXT = "Then the box started humming every night at three. We finally opened it together."
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_tts_records_audio_seconds(tmp_path, stream):
+    metrics = CallMetrics()
+    path = ClientTTS("test", TEXT, "alloy", provider=LocalProvider(), metrics=metrics).generateTTS(tmp_path / "tts.mp3", stream=stream)
+
+    (series,) = metrics.series.values()
+    words = LocalProvider().synthesize(TEXT)[1]
+    assert series.totals["audio_seconds"] == pytest.approx(words[-1]["end"], abs=0.5)
+    assert series.totals["bytes_received"] == path.stat().st_size
+
+
+def test_speech_reads_the_duration_of_an_mp3(tmp_path):
+    path = tmp_path / "speech.mp3"
+    AudioArrayClip(np.zeros((44100 * 2, 2)), fps=44100).write_audiofile(str(path), logger=None)
+    metrics = CallMetrics()
+
+    with metrics.call("tts", "tts-1") as call:
+        call.speech(path)
+
+    assert call.audio_seconds == pytest.approx(2.0, abs=0.1)
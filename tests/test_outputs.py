@@ -0,0 +1,16 @@
+"""
+Comando de ffmpeg de MultiOutputWriter
+"""
+from EditTools.VideoEdit.outputs import MultiOutputWriter, OutputTarget
+
+
+def test_every_output_gets_the_thread_limit(tmp_path):
+    targets = [OutputTarget(tmp_path / f"{name}.mp4", size=(320, 240)) for name in ("a", "b", "c")]
+
+    cmd = MultiOutputWriter(targets, (320, 240), 24, threads=3).build_command()
+
+    # Cada salida termina en su ruta; antes de cada una, desde la anterior, va su -threads
+    ends = [cmd.index(str(target.path)) for target in targets]
+    starts = [cmd.index("-filter_complex") + 2] + [end + 1 for end in ends[:-1]]
+    for start, end in zip(starts, ends):
+        assert cmd[start:end][:2] == ["-threads", "3"]
@@ -0,0 +1,30 @@
+"""
+RenderScheduler: orden de admisión por trabajo estimado
+"""
+from EditTools.scheduler import RenderScheduler
+
+
+def render(job, threads=1):
+    return job["name"]
+
+
+def test_jobs_run_shortest_work_first():
+    jobs = [
+        {"name": "largo", "duration": 90},
+        {"name": "corto", "duration": 10},
+        {"name": "vertical", "duration": 30, "size": (1080, 1920)},
+        {"name": "cuadrado", "duration": 30, "size": (720, 720)},
+    ]
+    finished = []
+    scheduler = RenderScheduler(max_jobs=1, sample_interval=0.01)
+
+    results, errors = scheduler.run(
+        jobs, render,
+        cost=lambda job: {"duration": job["duration"], "size": job.get("size", (1080, 1920))},
+        on_done=lambda job, result, error: finished.append(result)
+    )
+
+    assert not errors
+    assert finished == ["cuadrado", "corto", "vertical", "largo"]
+    # Los resultados siguen indexados por la posición original
+    assert results == {0: "largo", 1: "corto", 2: "vertical", 3: "cuadrado"}
@@ -0,0 +1,59 @@
+"""
+Render en streaming hacia S3Sink contra un LocalObjectStore (sin red)
+"""
+import numpy as np
+import pytest
+from moviepy import VideoClip
+
+from EditTools.VideoEdit.outputs import OutputTarget, write_outputs
+from EditTools.VideoEdit.sinks import MIN_PART_SIZE, LocalFileSink, LocalObjectStore, S3Sink
+
+SIZE = (320, 240)
+
+
+def noise_clip(duration=3):
+    """ Ruido determinista por cuadro: x264 casi no lo comprime, así el MP4 pasa de varias partes """
+    def frame_function(t):
+        rng = np.random.default_rng(int(round(t * 24)))
+        return rng.integers(0, 256, (SIZE[1], SIZE[0], 3), dtype=np.uint8)
+    return VideoClip(frame_function, duration=duration)
+
+
+def target(path, sink, **kwargs):
+    return OutputTarget(path, size=SIZE, bitrate="60000k", preset="ultrafast", sink=sink, **kwargs)
+
+
+def test_s3_upload_matches_local_file(tmp_path):
+    store = LocalObjectStore(tmp_path / "store")
+    s3 = S3Sink("videos", "render.mp4", client=store, part_size=MIN_PART_SIZE, max_concurrency=2)
+    local = LocalFileSink(tmp_path / "local.mp4")
+
+    locations = write_outputs(
+        noise_clip(),
+        [target(tmp_path / "a.mp4", s3), target(tmp_path / "b.mp4", local)],
+        threads=1, logger=None
+    )
+
+    assert locations == ["s3://videos/render.mp4", str(tmp_path / "local.mp4")]
+    parts = [call[2] for call in store.summary() if call[0] == "upload_part"]
+    assert len(parts) >= 3
+    assert all(size >= MIN_PART_SIZE for size in parts[:-1])
+    assert ("complete_multipart_upload", "render.mp4", len(parts)) in store.summary()
+
+    uploaded = store.object_path("videos", "render.mp4").read_bytes()
+    assert len(uploaded) == sum(parts) == s3.bytes_written
+    assert uploaded == (tmp_path / "local.mp4").read_bytes()
+
+
+def test_failed_encode_aborts_the_upload(tmp_path):
+    store = LocalObjectStore(tmp_path / "store")
+    s3 = S3Sink("videos", "render.mp4", client=store, part_size=MIN_PART_SIZE)
+
+    with pytest.raises(Exception):
+        write_outputs(noise_clip(1), [target(tmp_path / "a.mp4", s3, codec="codec_inexistente")], threads=1, logger=None)
+
+    calls = [call[0] for call in store.summary()]
+    assert "abort_multipart_upload" in calls
+    assert "complete_multipart_upload" not in calls
+    assert not store.object_path("videos", "render.mp4").exists()
+    assert not list((tmp_path / "store" / ".uploads").iterdir())
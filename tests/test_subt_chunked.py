@@ -0,0 +1,145 @@
+"""
+Transcripción fragmentada contra un servidor de transcripción falso (http.server)
+
+El audio tiene una ráfaga de tono por palabra, con una frecuencia distinta
+para cada una; el servidor identifica cada palabra por su frecuencia y
+devuelve tiempos relativos al fragmento, como Whisper en verbose_json.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import struct
+import threading
+import wave
+
+import numpy as np
+import pytest
+
+pytest.importorskip("openai")
+
+from EditTools.GenAPI.providers import OpenAIProvider
+from EditTools.VideoEdit.subt import Subt
+
+RATE = 16000
+WORDS = 30
+WORD_SECONDS = 0.3
+GAP_SECONDS = 0.2
+
+
+def word_frequency(index):
+    return 300 + 40 * index
+
+
+def make_narration(path):
+    """ WAV mono de 16 kHz con WORDS ráfagas separadas por silencios; devuelve los tiempos reales """
+    pieces = []
+    truth = []
+    t = 0.0
+    for i in range(WORDS):
+        samples = np.arange(int(WORD_SECONDS * RATE)) / RATE
+        pieces.append(0.5 * np.sin(2 * np.pi * word_frequency(i) * samples))
+        pieces.append(np.zeros(int(GAP_SECONDS * RATE)))
+        truth.append({"word": f"w{i}", "start": t, "end": t + WORD_SECONDS})
+        t += WORD_SECONDS + GAP_SECONDS
+    audio = (np.concatenate(pieces) * 32767).astype('<i2')
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(audio.tobytes())
+    return truth
+
+
+def detect_words(data):
+    """ Palabras del WAV subido: cada tramo con sonido, identificado por su frecuencia """
+    with wave.open(io.BytesIO(data), 'rb') as wav:
+        rate = wav.getframerate()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2').astype(np.float32)
+
+    hop = rate // 100
+    frames = len(samples) // hop
+    voiced = np.abs(samples[:frames * hop].reshape(frames, hop)).mean(axis=1) > 300
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], voiced.astype(np.int8), [0]])))
+    words = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        burst = samples[start * hop:end * hop]
+        crossings = np.count_nonzero(np.diff(np.signbit(burst)))
+        frequency = crossings / 2 / (len(burst) / rate)
+        index = int(round((frequency - word_frequency(0)) / 40))
+        words.append({"word": f"w{index}", "start": start * hop / rate, "end": end * hop / rate})
+    return words, len(samples) / rate
+
+
+class FakeWhisper(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        # El WAV dentro del multipart: RIFF + tamaño + 8 bytes de encabezado
+        start = body.index(b"RIFF")
+        size = struct.unpack('<I', body[start + 4:start + 8])[0]
+        words, duration = detect_words(body[start:start + 8 + size])
+        FakeWhisper.requests.append(duration)
+
+        payload = json.dumps({
+            "task": "transcribe",
+            "language": "english",
+            "duration": duration,
+            "text": " ".join(word["word"] for word in words),
+            "words": words,
+            "segments": [],
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def whisper_server():
+    FakeWhisper.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeWhisper)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+def test_chunks_are_stitched_at_silences(tmp_path, whisper_server):
+    audio_path = tmp_path / "narration.wav"
+    truth = make_narration(audio_path)
+    cache_dir = tmp_path / "audio_cache"
+
+    subt = Subt("test", provider=OpenAIProvider("test", base_url=whisper_server), audio_cache_dir=cache_dir)
+    transcription = subt.transcribe_audio(audio_path, chunk_seconds=4, workers=3)
+
+    # Varios fragmentos, y el audio decodificado en el cache indicado
+    assert len(FakeWhisper.requests) >= 3
+    assert list(cache_dir.glob("*.npy"))
+
+    # Cada palabra exactamente una vez, en orden, sin perder las de los bordes
+    assert [word["word"] for word in transcription["words"]] == [word["word"] for word in truth]
+    for word, expected in zip(transcription["words"], truth):
+        assert word["start"] == pytest.approx(expected["start"], abs=0.02)
+        assert word["end"] == pytest.approx(expected["end"], abs=0.02)
+    assert transcription["duration"] == pytest.approx(WORDS * (WORD_SECONDS + GAP_SECONDS), abs=0.01)
+
+
+def test_cuts_fall_in_silences(tmp_path):
+    audio_path = tmp_path / "narration.wav"
+    truth = make_narration(audio_path)
+    with wave.open(str(audio_path), 'rb') as wav:
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2').astype(np.float32)[:, None] / 32767
+
+    bounds = Subt("test", provider=OpenAIProvider("test")).split_at_silence(samples, RATE, chunk_seconds=4)
+
+    assert bounds[0][0] == 0 and bounds[-1][1] == len(samples)
+    assert all(end == next_start for (_, end), (next_start, _) in zip(bounds, bounds[1:]))
+    for _, cut in bounds[:-1]:
+        t = cut / RATE
+        assert not any(word["start"] < t < word["end"] for word in truth)
@@ -0,0 +1,54 @@
+"""
+Etapa de render de JobDir: las vistas previas sobreviven a un trabajo reanudado
+"""
+from pathlib import Path
+
+import pytest
+
+from EditTools.VideoEdit.preview import PreviewTap
+from EditTools.VideoEdit.video import VideoEditReddit
+
+
+def editor(tmp_path):
+    return VideoEditReddit(
+        video_background=str(tmp_path / "bg.mp4"),
+        tts_audio=str(tmp_path / "tts.mp3"),
+        font=str(tmp_path / "font.ttf"),
+        workdir=tmp_path / "work",
+        audio_cache_dir=tmp_path / "audio_cache",
+    )
+
+
+def fake_render(output_path, outputs=None, preview=None, sink=None, output_mode="file"):
+    """ Render falso: el video y las imágenes que dejaría el PreviewTap """
+    Path(output_path).write_bytes(b"video")
+    preview.start(output_path, size=(1080, 1920), duration=2, fps=24)
+    for path in (f"{Path(output_path).stem}_t0.50.jpg", f"{Path(output_path).stem}_sheet.jpg"):
+        (Path(output_path).parent / path).write_bytes(b"jpg")
+        preview.paths.append(str(Path(output_path).parent / path))
+    return [str(output_path)]
+
+
+def skipped_render(*args, **kwargs):
+    raise AssertionError("la etapa de render debía saltarse")
+
+
+def test_resumed_render_keeps_its_previews(tmp_path):
+    output_path = tmp_path / "out" / "video.mp4"
+    first = editor(tmp_path)
+    first.render = fake_render
+    first_preview = PreviewTap(times=(0.5,), columns=2, rows=2)
+    written = first.create_video(output_path, generate_subs=False, preview=first_preview)
+
+    resumed = editor(tmp_path)
+    resumed.render = skipped_render
+    preview = PreviewTap(times=(0.5,), columns=2, rows=2)
+    assert resumed.create_video(output_path, generate_subs=False, preview=preview) == written
+    assert preview.paths == first_preview.paths and len(preview.paths) == 2
+
+    # Una vista previa borrada es una salida faltante: el render se repite
+    Path(preview.paths[-1]).unlink()
+    rerun = editor(tmp_path)
+    rerun.render = skipped_render
+    with pytest.raises(AssertionError):
+        rerun.create_video(output_path, generate_subs=False, preview=PreviewTap(times=(0.5,), columns=2, rows=2))